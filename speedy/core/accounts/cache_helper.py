@@ -6,7 +6,6 @@ CACHE_TYPES = {
     'blocked': 'speedy-core-blocks-blocked-{entity_pk}',
     'blocking': 'speedy-core-blocks-blocking-{entity_pk}',
     'received_friendship_requests_count': 'speedy-core-friends-received-friendship-requests-count-{entity_pk}',
-    'unread_chats_count': 'speedy-core-messages-unread-chats-count-{entity_pk}',
     'matches': 'speedy-match-accounts-matches-{entity_pk}',
 }
 
@@ -15,7 +14,6 @@ BUST_CACHES = {
     'blocked': ['blocked', 'matches', 'received_friendship_requests_count'],
     'blocking': ['blocking', 'matches', 'received_friendship_requests_count'],
     'received_friendship_requests_count': ['received_friendship_requests_count'],
-    'unread_chats_count': ['unread_chats_count'],
     'matches': ['matches', 'received_friendship_requests_count'],
 }
 
@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings as django_settings
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+from django.utils import translation
+from django.utils.timezone import now
+
+from speedy.core.accounts.models import QueuedMail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to send the queued notification emails of the current site, in batches.
+
+    Each batch is claimed (see QueuedMailManager.claim) and then sent through one connection to the email server, outside of the transaction. Emails which are claimed by another worker are skipped, so more than one worker can run at the same time. Only emails which were sent are marked as sent, emails which failed are sent again by a later run (up to MAIL_QUEUE_MAX_ATTEMPTS times).
+
+    Methods:
+        add_arguments(self, parser): Adds custom arguments to the command parser.
+        handle(self, *args, **options): Main method to send the queued emails.
+    """
+
+    def add_arguments(self, parser):
+        """
+        Adds custom arguments to the command parser.
+
+        Args:
+            parser (argparse.ArgumentParser): The argument parser instance.
+        """
+        parser.add_argument("--batch-size", type=int, default=django_settings.MAIL_QUEUE_BATCH_SIZE, help="The number of emails in each batch. Default: {}.".format(django_settings.MAIL_QUEUE_BATCH_SIZE))
+
+    def handle(self, *args, **options):
+        """
+        Sends all the queued emails of the current site.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Arbitrary keyword arguments.
+        """
+        batch_size = max([options["batch_size"], 1])
+        number_of_mails = 0
+        while True:
+            number_of_mails_in_batch = self.send_batch(batch_size=batch_size)
+            number_of_mails += number_of_mails_in_batch
+            if (number_of_mails_in_batch < batch_size):
+                break
+        logger.debug("send_queued_mails::number_of_mails={number_of_mails}".format(number_of_mails=number_of_mails))
+
+    def send_batch(self, batch_size):
+        queued_mails = QueuedMail.objects.claim(batch_size=batch_size)
+        done_queued_mails_pks = []
+        if (len(queued_mails) > 0):
+            with get_connection() as connection:
+                for queued_mail in queued_mails:
+                    context = queued_mail.get_context()
+                    # Don't send emails about objects which were deleted since they were queued.
+                    if (any((value is None) for value in context.values())):
+                        done_queued_mails_pks.append(queued_mail.pk)
+                        continue
+                    with translation.override(queued_mail.language_code):
+                        result = queued_mail.user.mail_user(template_name_prefix=queued_mail.template_name_prefix, context=context, connection=connection)
+                    # send_mail returns None if sending failed. mail_user returns False if the user has no confirmed email address, then there is nothing to send.
+                    if (result is None):
+                        logger.error("send_queued_mails::sending failed, queued_mail={queued_mail}, number_of_attempts={number_of_attempts}".format(
+                            queued_mail=queued_mail.pk,
+                            number_of_attempts=queued_mail.number_of_attempts,
+                        ))
+                    else:
+                        done_queued_mails_pks.append(queued_mail.pk)
+            QueuedMail.objects.filter(pk__in=done_queued_mails_pks).update(date_sent=now())
+        return len(queued_mails)
+
+
@@ -1,7 +1,11 @@
 import logging
+from datetime import timedelta
 
-from django.db.models import Q
+from django.conf import settings as django_settings
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils.timezone import now
+from django.utils.translation import get_language
 
 from speedy.core.base.managers import BaseManager, BaseUserManager
 from speedy.core.base.utils import normalize_username
@@ -124,3 +128,50 @@ class UserManager(BaseUserManager):
         ))
 
 
+class QueuedMailManager(BaseManager):
+    def queue(self, user, template_name_prefix, context=None, coalesce_key=''):
+        """
+        Queue an email to the user, in the current transaction. If an email with the same template and coalesce_key is already queued to the user since less than MAIL_QUEUE_COALESCE_WINDOW seconds, it's updated with the new context instead.
+
+        :param context: A dict of model instances and JSON serializable values.
+        :return: The queued mail.
+        """
+        with transaction.atomic():
+            queued_mail = self.filter(
+                site_id=django_settings.SITE_ID,
+                user=user,
+                template_name_prefix=template_name_prefix,
+                coalesce_key=coalesce_key,
+                date_sent=None,
+                # Don't add notifications to an email which is being sent.
+                date_claimed=None,
+                date_created__gte=now() - timedelta(seconds=django_settings.MAIL_QUEUE_COALESCE_WINDOW),
+            ).select_for_update().order_by('-date_created').first()
+            if (queued_mail is None):
+                queued_mail = self.model(site_id=django_settings.SITE_ID, user=user, template_name_prefix=template_name_prefix, coalesce_key=coalesce_key)
+            else:
+                queued_mail.number_of_notifications += 1
+            queued_mail.language_code = get_language() or 'en'
+            queued_mail.set_context(context=context)
+            queued_mail.save()
+        return queued_mail
+
+    def pending(self):
+        return self.filter(site_id=django_settings.SITE_ID, date_sent=None, number_of_attempts__lt=django_settings.MAIL_QUEUE_MAX_ATTEMPTS)
+
+    def claim(self, batch_size):
+        """
+        Claim a batch of pending emails of the current site, which are not claimed by another worker (or which were claimed more than MAIL_QUEUE_CLAIM_TIMEOUT seconds ago and not sent). The rows are locked only while they are claimed, not while the emails are sent.
+
+        :return: A list of the claimed emails.
+        """
+        with transaction.atomic():
+            queued_mails = list(self.pending().filter(
+                Q(date_claimed=None) | Q(date_claimed__lt=now() - timedelta(seconds=django_settings.MAIL_QUEUE_CLAIM_TIMEOUT)),
+            ).select_for_update(skip_locked=True, of=('self',)).select_related('user').order_by('date_created')[:batch_size])
+            self.filter(pk__in=[queued_mail.pk for queued_mail in queued_mails]).update(date_claimed=now(), number_of_attempts=F('number_of_attempts') + 1)
+        for queued_mail in queued_mails:
+            queued_mail.number_of_attempts += 1
+        return queued_mails
+
+
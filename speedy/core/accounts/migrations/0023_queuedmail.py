@@ -0,0 +1,39 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('accounts', '0022_user_city_ar_user_city_bg_user_city_bn_user_city_ca_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedMail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('template_name_prefix', models.CharField(max_length=255, verbose_name='template name prefix')),
+                ('language_code', models.CharField(max_length=10, verbose_name='language code')),
+                ('context', models.JSONField(default=dict, verbose_name='context')),
+                ('coalesce_key', models.CharField(blank=True, max_length=255, verbose_name='coalesce key')),
+                ('number_of_notifications', models.PositiveIntegerField(default=1, verbose_name='number of notifications')),
+                ('date_claimed', models.DateTimeField(blank=True, null=True, verbose_name='date claimed')),
+                ('number_of_attempts', models.PositiveSmallIntegerField(default=0, verbose_name='number of attempts')),
+                ('date_sent', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='date sent')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sites.site', verbose_name='site')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'queued mail',
+                'verbose_name_plural': 'queued mails',
+                'ordering': ('date_created',),
+            },
+        ),
+    ]
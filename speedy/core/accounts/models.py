@@ -1,3 +1,4 @@
+import copy
 import logging
 import warnings
 import random
@@ -19,6 +20,7 @@ from django.utils.timezone import now
 from django.utils.html import avoid_wrapping
 from django.utils.functional import classproperty, cached_property
 from django.utils.translation import get_language, gettext_lazy as _, pgettext_lazy
+from django.apps import apps
 from django.contrib.sites.models import Site
 
 from translated_fields import TranslatedField
@@ -30,9 +32,10 @@ from speedy.core.base.fields import SmallUDIDField, RegularUDIDField
 from speedy.core.base.utils import normalize_slug, normalize_username, generate_confirmation_token, get_age, string_is_not_none, to_attribute, get_all_field_names, convert_to_set, timesince
 from speedy.core.friends.managers import FriendshipRequestManager
 from speedy.core.uploads.fields import PhotoField
-from .managers import EntityManager, UserManager
+from .managers import EntityManager, UserManager, QueuedMailManager
 from .fields import UserAccessField
 from .utils import get_site_profile_model, normalize_email
+from .write_behind import visits_buffer
 from . import validators as speedy_core_accounts_validators
 
 if (TYPE_CHECKING):
@@ -137,8 +140,11 @@ class OptimisticLockingModelMixin:
         if filters:
             filtered = base_qs.filter(**filters)
             updated = super()._do_update(base_qs=filtered, using=using, pk_val=pk_val, values=values, update_fields=update_fields, forced_update=forced_update, returning_fields=returning_fields)
-            if ((not updated) and (base_qs.filter(pk=pk_val).exists())):
-                if forced_update:
+            # Patch: If no field of the current model is updated (because of update_fields), check optimistic locking fields anyway.
+            not_updated = ((not updated) or ((not (values)) and (not (filtered.filter(pk=pk_val).exists()))))
+            if ((not_updated) and (base_qs.filter(pk=pk_val).exists())):
+                # forced_update is also true when only the modified fields are updated (update_fields).
+                if ((forced_update) and (not (update_fields))):
                     raise ConcurrencyError("Forced update did not affect any rows.")
                 else:
                     raise ConcurrencyError("Update did not affect any rows.")
@@ -149,6 +155,91 @@ class OptimisticLockingModelMixin:
 
         return updated
 
+    def _check_optimistic_locking(self, using=None):
+        """
+        Raise ConcurrencyError if an optimistic locking field was changed in the database, without updating the model (used when the model is not saved since it was not modified).
+        """
+        filters = {name: getattr(self, name) for name in self._optimistic_locking_fields if name not in self._modified}
+        if filters:
+            base_qs = self.__class__._base_manager.using(using)
+            if ((not (base_qs.filter(pk=self.pk, **filters).exists())) and (base_qs.filter(pk=self.pk).exists())):
+                raise ConcurrencyError("Update did not affect any rows.")
+
+
+class DirtyFieldsModelMixin:
+    """
+    Mixin class to save only the modified fields of Django models.
+
+    The values of the fields are saved when the model is loaded from the database (and after each save), and compared to the current values on save. Only the modified fields (and fields with auto_now) are updated in the database.
+
+    Attributes:
+        _save_only_if_modified (bool): If True, the model is not saved at all if no field was modified. Set only by save_if_modified.
+        _saved_values (dict): The values of the fields as they are in the database.
+
+    Methods:
+        from_db(cls, db, field_names, values): Override to save the values of the fields.
+        refresh_from_db(self, *args, **kwargs): Override to save the values of the refreshed fields.
+        save_base(self, *args, **kwargs): Override to update only the modified fields.
+        save_if_modified(self, *args, **kwargs): Save the model only if a field was modified.
+        get_dirty_fields(self): Return the names of the modified fields.
+    """
+    _save_only_if_modified = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._set_saved_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._set_saved_values(update=True)
+
+    def save_base(self, *args, **kwargs):
+        if ((kwargs.get("update_fields") is None) and (not (kwargs.get("raw"))) and (not (self._state.adding)) and (hasattr(self, '_saved_values'))):
+            dirty_fields = self.get_dirty_fields()
+            if ((len(dirty_fields) == 0) and (self._save_only_if_modified)):
+                if (isinstance(self, OptimisticLockingModelMixin)):
+                    self._check_optimistic_locking(using=kwargs.get("using"))
+                return
+            kwargs["update_fields"] = dirty_fields | {f.name for f in self._meta.concrete_fields if (getattr(f, 'auto_now', False))}
+        super().save_base(*args, **kwargs)
+        self._set_saved_values()
+
+    def save_if_modified(self, *args, **kwargs):
+        """
+        Save the model only if a field was modified. If not, the model is not saved and post_save receivers are not called, so use it only where the receivers are called anyway (such as in User.save_user_and_profile, which saves the user first).
+        """
+        self._save_only_if_modified = True
+        try:
+            return self.save(*args, **kwargs)
+        finally:
+            self._save_only_if_modified = False
+
+    def get_dirty_fields(self):
+        """
+        Return the names of the fields which were modified since the model was loaded from the database or saved.
+
+        :return: A set of field names.
+        """
+        deferred_fields = self.get_deferred_fields()
+        return {f.name for f in self._meta.concrete_fields if ((not (f.primary_key)) and (f.attname not in deferred_fields) and ((f.attname not in self._saved_values) or (getattr(self, f.attname) != self._saved_values[f.attname])))}
+
+    def _set_saved_values(self, update=False):
+        deferred_fields = self.get_deferred_fields()
+        saved_values = {f.attname: self._copy_value(value=getattr(self, f.attname)) for f in self._meta.concrete_fields if (f.attname not in deferred_fields)}
+        if ((update) and (hasattr(self, '_saved_values'))):
+            self._saved_values.update(saved_values)
+        else:
+            self._saved_values = saved_values
+
+    @staticmethod
+    def _copy_value(value):
+        # Mutable values (such as JSON and array fields) may be changed in place, so we keep a copy of them.
+        if (isinstance(value, (dict, list))):
+            return copy.deepcopy(value)
+        return value
+
 
 class Entity(CleanAndValidateAllFieldsMixin, TimeStampedModel):
     """
@@ -164,8 +255,9 @@ class Entity(CleanAndValidateAllFieldsMixin, TimeStampedModel):
     Methods:
         settings(cls): Returns the entity settings.
         validators(cls): Returns the validators for the entity.
-        blocked_entities_ids(self): Returns a list of blocked entities ids.
-        blocking_entities_ids(self): Returns a list of blocking entities ids.
+        block_neighborhood(self): Returns the ids of blocked and blocking entities.
+        blocked_entities_ids(self): Returns a set of blocked entities ids.
+        blocking_entities_ids(self): Returns a set of blocking entities ids.
         clean_all_fields(self, exclude=None): Cleans all fields of the entity.
         normalize_slug_and_username(self): Normalizes the slug and username.
         validate_slug(self): Validates the slug.
@@ -198,24 +290,32 @@ class Entity(CleanAndValidateAllFieldsMixin, TimeStampedModel):
         return validators
 
     @cached_property
-    def blocked_entities_ids(self):
+    def block_neighborhood(self):
         """
-        Return a list of blocked entities ids.
+        Return the ids of the entities which this entity blocked, and of the entities which blocked this entity.
 
-        :return: A list of blocked entities ids.
+        :return: A BlockNeighborhood.
         """
         from speedy.core.blocks.models import Block
-        return Block.objects.get_blocked_entities_ids(blocker=self)
+        return Block.objects.get_block_neighborhood(entity=self)
 
-    @cached_property
+    @property
+    def blocked_entities_ids(self):
+        """
+        Return a set of blocked entities ids.
+
+        :return: A frozenset of blocked entities ids.
+        """
+        return self.block_neighborhood.blocked_entities_ids
+
+    @property
     def blocking_entities_ids(self):
         """
-        Return a list of blocking entities ids.
+        Return a set of blocking entities ids.
 
-        :return: A list of blocking entities ids.
+        :return: A frozenset of blocking entities ids.
         """
-        from speedy.core.blocks.models import Block
-        return Block.objects.get_blocking_entities_ids(blocked=self)
+        return self.block_neighborhood.blocking_entities_ids
 
     class Meta:
         verbose_name = _('entity')
@@ -365,7 +465,7 @@ class ReservedUsername(Entity):
         return super().clean_fields(exclude=exclude)
 
 
-class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUser):
+class User(PermissionsMixin, OptimisticLockingModelMixin, DirtyFieldsModelMixin, Entity, AbstractBaseUser):
     """
     Represents a user in the system.
 
@@ -433,6 +533,7 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
         clean_localizable_field: Clean a localizable field.
         get_absolute_url: Get the absolute URL of the user.
         mail_user: Send an email to the user.
+        queue_mail: Queue an email to the user, to be sent by the send_queued_mails command.
         get_full_name: Get the full name of the user.
         get_first_name: Get the first name of the user.
         get_short_name: Get the short name of the user.
@@ -453,6 +554,7 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
         get_smoking_status_choices: Get smoking status choices.
         get_relationship_status_choices: Get relationship status choices.
         update_last_ip_address_used: Update the last IP address used by the user.
+        record_last_ip_address_used: Update the last IP address used by the user, and write it to the database later.
         display_ads: Determine if the user should see ads.
     """
     LOCALIZABLE_FIELDS = ('first_name', 'last_name', 'city')
@@ -954,7 +1056,10 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
     def get_absolute_url(self):
         return reverse('profiles:user', kwargs={'slug': self.slug})
 
-    def mail_user(self, template_name_prefix, context=None, send_to_unconfirmed=False):
+    def queue_mail(self, template_name_prefix, context=None, coalesce_key=''):
+        return QueuedMail.objects.queue(user=self, template_name_prefix=template_name_prefix, context=context, coalesce_key=coalesce_key)
+
+    def mail_user(self, template_name_prefix, context=None, send_to_unconfirmed=False, **kwargs):
         site = Site.objects.get_current()
         context = context or {}
         addresses = self.email_addresses.filter(is_primary=True)
@@ -972,7 +1077,7 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
                 registered_days_ago=(now() - self.date_created).days,
             ))
         if (addresses):
-            return addresses[0].mail(template_name_prefix=template_name_prefix, context=context)
+            return addresses[0].mail(template_name_prefix=template_name_prefix, context=context, **kwargs)
         return False
 
     def get_full_name(self):
@@ -1164,15 +1269,16 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
     def save_user_and_profile(self):
         """
         Save the user and profile.
+        Only the modified fields are saved, and profiles which were not modified are not saved.
 
         :return: None
         """
         with transaction.atomic():
             self.save()
-            self.profile.save()
+            self.profile.save_if_modified()
             if (django_settings.LOGIN_ENABLED):
-                self.speedy_net_profile.save()
-                self.speedy_match_profile.save()
+                self.speedy_net_profile.save_if_modified()
+                self.speedy_match_profile.save_if_modified()
 
     def get_gender(self):
         return self.__class__.GENDERS_DICT.get(self.gender)
@@ -1228,6 +1334,20 @@ class User(PermissionsMixin, OptimisticLockingModelMixin, Entity, AbstractBaseUs
                 self.last_ip_address_used_ipapi_time = None
                 self.save_user_and_profile()
 
+    def record_last_ip_address_used(self, request):
+        """
+        Same as update_last_ip_address_used, but the IP address is written to the database later, by the visits write-behind buffer (if enabled).
+        """
+        if (not (django_settings.VISITS_WRITE_BEHIND)):
+            return self.update_last_ip_address_used(request=request)
+        ip_address_used = request.META.get('REMOTE_ADDR')
+        if ip_address_used:
+            if (not (self.last_ip_address_used == ip_address_used)):
+                self.last_ip_address_used = ip_address_used
+                self.last_ip_address_used_date_updated = now()
+                self.last_ip_address_used_ipapi_time = None
+                visits_buffer.record_last_ip_address_used(user=self, ip_address=self.last_ip_address_used, date_updated=self.last_ip_address_used_date_updated)
+
     def display_ads(self):
         """
         This method determines if the user should see ads or not.
@@ -1320,7 +1440,7 @@ class UserEmailAddress(CleanAndValidateAllFieldsMixin, TimeStampedModel):
     def validate_email_unique(self):
         speedy_core_accounts_validators.validate_email_unique(email=self.email, user_email_address_pk=self.pk)
 
-    def mail(self, template_name_prefix, context=None):
+    def mail(self, template_name_prefix, context=None, **kwargs):
         site = Site.objects.get_current()
         context = context or {}
         context.update({
@@ -1328,7 +1448,7 @@ class UserEmailAddress(CleanAndValidateAllFieldsMixin, TimeStampedModel):
             'user': self.user,
             'email_address': self,
         })
-        return send_mail(to=[self.email], template_name_prefix=template_name_prefix, context=context)
+        return send_mail(to=[self.email], template_name_prefix=template_name_prefix, context=context, **kwargs)
 
     def send_confirmation_email(self):
         if (self.user.has_confirmed_email):
@@ -1354,7 +1474,67 @@ class UserEmailAddress(CleanAndValidateAllFieldsMixin, TimeStampedModel):
         self.save()
 
 
-class SiteProfileBase(TimeStampedModel):
+class QueuedMail(TimeStampedModel):
+    """
+    An email to a user, which is queued in the transaction which caused it (such as sending a message) and sent later in a batch by the send_queued_mails command, so that sending emails doesn't delay the request.
+
+    Attributes:
+        site (ForeignKey): The site the email is sent from.
+        user (ForeignKey): The user the email is sent to.
+        template_name_prefix (CharField): The prefix of the templates of the email.
+        language_code (CharField): The language of the email.
+        context (JSONField): The context of the templates. Model instances are saved by their model and pk, and loaded again when the email is sent.
+        coalesce_key (CharField): Emails with the same template and coalesce key to the same user are combined into one email.
+        number_of_notifications (PositiveIntegerField): The number of notifications which were combined into this email.
+        date_claimed (DateTimeField): The date the email was last claimed by a worker to send it, or None if it was not claimed yet.
+        number_of_attempts (PositiveSmallIntegerField): The number of times the email was claimed to send it.
+        date_sent (DateTimeField): The date the email was sent, or None if it was not sent yet.
+    """
+    site = models.ForeignKey(to=Site, verbose_name=_('site'), on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(to=User, verbose_name=_('user'), on_delete=models.CASCADE, related_name='+')
+    template_name_prefix = models.CharField(verbose_name=_('template name prefix'), max_length=255)
+    language_code = models.CharField(verbose_name=_('language code'), max_length=10)
+    context = models.JSONField(verbose_name=_('context'), default=dict)
+    coalesce_key = models.CharField(verbose_name=_('coalesce key'), max_length=255, blank=True)
+    number_of_notifications = models.PositiveIntegerField(verbose_name=_('number of notifications'), default=1)
+    date_claimed = models.DateTimeField(verbose_name=_('date claimed'), blank=True, null=True)
+    number_of_attempts = models.PositiveSmallIntegerField(verbose_name=_('number of attempts'), default=0)
+    date_sent = models.DateTimeField(verbose_name=_('date sent'), blank=True, null=True, db_index=True)
+
+    objects = QueuedMailManager()
+
+    class Meta:
+        verbose_name = _('queued mail')
+        verbose_name_plural = _('queued mails')
+        ordering = ('date_created',)
+
+    def __str__(self):
+        return '{} {}'.format(self.user_id, self.template_name_prefix)
+
+    def set_context(self, context):
+        serialized_context = {}
+        for key, value in (context or {}).items():
+            if (isinstance(value, models.Model)):
+                serialized_context[key] = {'model': value._meta.label_lower, 'pk': value.pk}
+            else:
+                serialized_context[key] = {'value': value}
+        self.context = serialized_context
+
+    def get_context(self):
+        """
+        :return: The context, with model instances loaded from the database (None if they were deleted).
+        """
+        context = {}
+        for key, value in self.context.items():
+            if ('model' in value):
+                context[key] = apps.get_model(value['model'])._default_manager.filter(pk=value['pk']).first()
+            else:
+                context[key] = value['value']
+        context['number_of_notifications'] = self.number_of_notifications
+        return context
+
+
+class SiteProfileBase(DirtyFieldsModelMixin, TimeStampedModel):
     """
     Base class for site-specific user profiles.
 
@@ -1368,6 +1548,7 @@ class SiteProfileBase(TimeStampedModel):
         last_visit_str(self): Get the last visit time as a string.
         save(self, *args, **kwargs): Save the profile.
         update_last_visit(self): Update the last visit time of the user.
+        record_last_visit(self): Update the last visit time of the user, and write it to the database later.
         activate(self): Activate the profile.
         deactivate(self): Deactivate the profile.
         get_name(self): Get the name of the profile.
@@ -1429,6 +1610,18 @@ class SiteProfileBase(TimeStampedModel):
             self.user.save_user_and_profile()
             del self._in_update_last_visit
 
+    def record_last_visit(self):
+        """
+        Same as update_last_visit, but the last visit is written to the database later, by the visits write-behind buffer (if enabled).
+        """
+        if (not (django_settings.VISITS_WRITE_BEHIND)):
+            return self.update_last_visit()
+        if (not (self.user.is_deleted)):
+            self.last_visit = now()
+            if ("last_visit_str" in self.__dict__):
+                del self.last_visit_str
+            visits_buffer.record_last_visit(profile=self, last_visit=self.last_visit)
+
     def activate(self):
         raise NotImplementedError("activate is not implemented in this user's profile model class.")
 
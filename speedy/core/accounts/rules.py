@@ -3,7 +3,7 @@ from django.conf import settings as django_settings
 from rules import predicate, add_perm, always_deny
 
 from speedy.core.accounts.base_rules import is_self, is_active
-from speedy.core.friends.rules import are_friends
+from speedy.core.friends.rules import are_friends, are_friends_of_friends
 from speedy.core.blocks.rules import there_is_block
 from .fields import UserAccessField
 from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
@@ -18,7 +18,7 @@ def _has_access_perm_for_obj(user, other_user, access):
         if (access == UserAccessField.ACCESS_FRIENDS):
             return ((is_self(user=user, other_user=other_user)) or (are_friends(user=user, other_user=other_user)))
         if (access == UserAccessField.ACCESS_FRIENDS_AND_FRIENDS_OF_FRIENDS):
-            return ((is_self(user=user, other_user=other_user)) or (are_friends(user=user, other_user=other_user)))
+            return ((is_self(user=user, other_user=other_user)) or (are_friends(user=user, other_user=other_user)) or (are_friends_of_friends(user=user, other_user=other_user)))
     return False
 
 
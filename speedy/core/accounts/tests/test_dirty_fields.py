@@ -0,0 +1,79 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from speedy.core.base.test.models import SiteTestCase
+        from speedy.core.base.test.decorators import only_on_speedy_match
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.core.accounts.cache_helper import cache_key
+        from speedy.core.accounts.models import User
+        from speedy.core.base import cache_manager
+        from speedy.net.accounts.models import SiteProfile as SpeedyNetSiteProfile
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+
+        class DirtyFieldsOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                user = ActiveUserFactory()
+                self.user = User.objects.get(pk=user.pk)
+
+            def get_update_queries(self, queries, model):
+                return [query['sql'] for query in queries if (query['sql'].startswith('UPDATE "{}"'.format(model._meta.db_table)))]
+
+            def test_no_dirty_fields_after_load(self):
+                self.assertSetEqual(set1=self.user.get_dirty_fields(), set2=set())
+                self.assertSetEqual(set1=self.user.speedy_match_profile.get_dirty_fields(), set2=set())
+                self.user.first_name_en = "Jennifer"
+                self.assertSetEqual(set1=self.user.get_dirty_fields(), set2={'first_name_en'})
+                self.user.save()
+                self.assertSetEqual(set1=self.user.get_dirty_fields(), set2=set())
+                self.assertEqual(first=User.objects.get(pk=self.user.pk).first_name_en, second="Jennifer")
+
+            def test_save_user_and_profile_doesnt_update_profiles_which_were_not_modified(self):
+                self.user.first_name_en = "Jennifer"
+                with CaptureQueriesContext(connection=connection) as queries:
+                    self.user.save_user_and_profile()
+                self.assertEqual(first=len(self.get_update_queries(queries=queries, model=User)), second=1)
+                self.assertEqual(first=len(self.get_update_queries(queries=queries, model=SpeedyNetSiteProfile)), second=0)
+                self.assertEqual(first=len(self.get_update_queries(queries=queries, model=SpeedyMatchSiteProfile)), second=0)
+                self.assertNotIn(member='"diet"', container=self.get_update_queries(queries=queries, model=User)[0])
+                self.assertEqual(first=User.objects.get(pk=self.user.pk).first_name_en, second="Jennifer")
+
+            @only_on_speedy_match
+            def test_json_field_modified_in_place_is_saved(self):
+                self.user.speedy_match_profile.diet_match[str(User.DIET_CARNIST)] = SpeedyMatchSiteProfile.RANK_0
+                self.assertSetEqual(set1=self.user.speedy_match_profile.get_dirty_fields(), set2={'diet_match'})
+                with CaptureQueriesContext(connection=connection) as queries:
+                    self.user.save_user_and_profile()
+                self.assertEqual(first=len(self.get_update_queries(queries=queries, model=SpeedyMatchSiteProfile)), second=1)
+                self.assertEqual(first=User.objects.get(pk=self.user.pk).speedy_match_profile.diet_match[str(User.DIET_CARNIST)], second=SpeedyMatchSiteProfile.RANK_0)
+
+            def test_concurrent_update_of_saved_values_is_not_overwritten(self):
+                user_instance_2 = User.objects.get(pk=self.user.pk)
+                user_instance_2.last_name_en = "Connelly"
+                user_instance_2.save()
+                self.user.first_name_en = "Jennifer"
+                self.user.save()
+                user = User.objects.get(pk=self.user.pk)
+                self.assertEqual(first=user.first_name_en, second="Jennifer")
+                self.assertEqual(first=user.last_name_en, second="Connelly")
+
+            @only_on_speedy_match
+            def test_profile_save_without_modified_fields_invalidates_matches(self):
+                # Like the Speedy Match profile form, which saves the user and then the profile, when only user fields were modified.
+                matches_key = cache_key(cache_type='matches', entity_pk=self.user.pk)
+                self.user.diet = User.DIET_VEGETARIAN if (not (self.user.diet == User.DIET_VEGETARIAN)) else User.DIET_VEGAN
+                self.user.save()
+                self.assertIsNone(obj=cache_manager.cache_get(key=matches_key))
+                cache_manager.cache_set(key=matches_key, value=[], timeout=60)
+                self.assertSetEqual(set1=self.user.speedy_match_profile.get_dirty_fields(), set2=set())
+                self.user.speedy_match_profile.save()
+                self.assertIsNone(obj=cache_manager.cache_get(key=matches_key))
+
+
@@ -0,0 +1,73 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from datetime import timedelta
+        from unittest import mock
+
+        from django.test import override_settings
+        from django.test.client import RequestFactory
+
+        from speedy.core.base.test.models import SiteTestCase
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.core.accounts.models import User
+        from speedy.core.accounts import write_behind
+        from speedy.core.accounts.write_behind import visits_buffer
+
+
+        class VisitsBufferOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user = ActiveUserFactory()
+                self.user.profile.last_visit -= timedelta(days=30)
+                self.user.save_user_and_profile()
+                self.user = User.objects.get(pk=self.user.pk)
+                self.old_last_visit = self.user.profile.last_visit
+
+            def tear_down(self):
+                visits_buffer.flush()
+                super().tear_down()
+
+            def test_last_visit_is_written_on_flush(self):
+                with override_settings(VISITS_WRITE_BEHIND_MAX_STALENESS=60 * 60):
+                    self.user.profile.record_last_visit()
+                    self.assertGreater(a=self.user.profile.last_visit, b=self.old_last_visit)
+                    self.assertEqual(first=User.objects.get(pk=self.user.pk).profile.last_visit, second=self.old_last_visit)
+                    old_date_updated = User.objects.get(pk=self.user.pk).profile.date_updated
+                    visits_buffer.flush()
+                    profile = User.objects.get(pk=self.user.pk).profile
+                    self.assertEqual(first=profile.last_visit, second=self.user.profile.last_visit)
+                    self.assertGreater(a=profile.date_updated, b=old_date_updated)
+
+            def test_last_ip_address_used_is_written_on_flush(self):
+                request = RequestFactory().get('/', REMOTE_ADDR='192.0.2.10')
+                with override_settings(VISITS_WRITE_BEHIND_MAX_STALENESS=60 * 60):
+                    self.user.record_last_ip_address_used(request=request)
+                    self.assertEqual(first=self.user.last_ip_address_used, second='192.0.2.10')
+                    self.assertNotEqual(first=User.objects.get(pk=self.user.pk).last_ip_address_used, second='192.0.2.10')
+                    visits_buffer.flush()
+                    user = User.objects.get(pk=self.user.pk)
+                    self.assertEqual(first=user.last_ip_address_used, second='192.0.2.10')
+                    self.assertIsNotNone(obj=user.last_ip_address_used_date_updated)
+                    self.assertIsNone(obj=user.last_ip_address_used_ipapi_time)
+                    self.assertGreater(a=user.date_updated, b=self.user.date_updated)
+
+            def test_visits_are_written_immediately_if_max_staleness_is_0(self):
+                with override_settings(VISITS_WRITE_BEHIND_MAX_STALENESS=0):
+                    self.user.profile.record_last_visit()
+                    self.assertEqual(first=len(visits_buffer), second=0)
+                    self.assertEqual(first=User.objects.get(pk=self.user.pk).profile.last_visit, second=self.user.profile.last_visit)
+
+            def test_visits_are_flushed_periodically_without_requests(self):
+                with override_settings(VISITS_WRITE_BEHIND_MAX_STALENESS=60 * 60):
+                    self.user.profile.record_last_visit()
+                self.assertEqual(first=User.objects.get(pk=self.user.pk).profile.last_visit, second=self.old_last_visit)
+                # Run one iteration of the background thread's loop in this thread (the second sleep raises StopIteration).
+                with override_settings(VISITS_WRITE_BEHIND_MAX_STALENESS=0), mock.patch.object(target=write_behind.time, attribute='sleep', side_effect=[None]), mock.patch.object(target=write_behind, attribute='connections'):
+                    with self.assertRaises(StopIteration):
+                        visits_buffer._flush_periodically()
+                self.assertEqual(first=User.objects.get(pk=self.user.pk).profile.last_visit, second=self.user.profile.last_visit)
+
+
@@ -5,7 +5,6 @@ from urllib.parse import urlparse
 from django.conf import settings as django_settings
 from django.contrib import messages
 from django.contrib.auth import login as django_auth_login, logout as django_auth_logout, views as django_auth_views, update_session_auth_hash
-from django.contrib.sites.models import Site
 from django.urls import reverse, reverse_lazy
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
@@ -17,6 +16,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic.detail import SingleObjectMixin
 from rules.contrib.views import LoginRequiredMixin, PermissionRequiredMixin
 
+from speedy.core.base.sites import site_registry
 from speedy.core.base.views import FormValidMessageMixin
 from speedy.core.profiles.views import SelfUserMixin
 from speedy.core.base.utils import reflection_import
@@ -38,7 +38,7 @@ def set_session(request):
     netloc = urlparse(origin).netloc
     if isinstance(netloc, bytes):
         netloc = netloc.decode()
-    valid_origin = any(netloc.endswith('.' + site.domain) for site in Site.objects.all().order_by("pk"))
+    valid_origin = any(netloc.endswith('.' + site.domain) for site in site_registry.get_sites())
     if (not (valid_origin)):
         return response
     if (request.method == 'POST'):
@@ -105,7 +105,7 @@ class RegistrationView(generic.CreateView):
         user = form.instance
         email_addresses = user.email_addresses.all()
         if (not (len(email_addresses) == 1)):
-            site = Site.objects.get_current()
+            site = site_registry.get_current_site()
             language_code = get_language()
             logger.error("RegistrationView::form_valid::User has {len_email_addresses} email addresses, site_name={site_name}, user={user} (registered {registered_days_ago} days ago), language_code={language_code}.".format(
                 len_email_addresses=len(email_addresses),
@@ -250,7 +250,7 @@ class DeactivateSiteProfileView(LoginRequiredMixin, SelfUserMixin, PermissionReq
     def form_valid(self, form):
         user = self.request.user
         user.profile.deactivate()
-        site = Site.objects.get_current()
+        site = site_registry.get_current_site()
         if (django_settings.SITE_ID == django_settings.SPEEDY_NET_SITE_ID):
             message = pgettext_lazy(context=self.request.user.get_gender(), message='Your Speedy Net and Speedy Match accounts have been deactivated. You can reactivate them any time.')
         else:
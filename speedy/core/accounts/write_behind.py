@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.db import connections, models
+from django.db.models import Case, When, Value
+from django.utils.timezone import now
+
+logger = logging.getLogger(__name__)
+
+FLUSH_CHUNK_SIZE = 500
+
+
+class VisitsBuffer(object):
+    """
+    A per-process write-behind buffer for the last visits and the last IP addresses used of users.
+
+    Visits are recorded in memory, and written to the database in batched UPDATE queries of only the relevant columns, instead of saving the user and all the profiles on every request. The buffer is flushed when its oldest record is older than VISITS_WRITE_BEHIND_MAX_STALENESS seconds, when it has more than VISITS_WRITE_BEHIND_MAX_BUFFER_SIZE records, and when the process exits.
+
+    date_updated is updated too (like when the user or the profile is saved), so that incremental readers such as the Speedy Match candidate index see the new values.
+
+    The staleness is checked on every record, and by a background thread every VISITS_WRITE_BEHIND_MAX_STALENESS seconds (if VISITS_WRITE_BEHIND_FLUSH_IN_BACKGROUND), so that visits are written also when the process stops getting requests. Visits which were not written yet are lost if the process is killed without running its exit handlers - by SIGKILL, or when uWSGI kills a worker after its harakiri timeout. Since these are only last visits and last IP addresses used, losing up to VISITS_WRITE_BEHIND_MAX_STALENESS seconds of them is acceptable.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_visits = {}
+        self._last_ip_addresses_used = {}
+        self._oldest_record_time = None
+        self._flush_thread = None
+
+    def __len__(self):
+        return sum([len(last_visits) for last_visits in self._last_visits.values()]) + len(self._last_ip_addresses_used)
+
+    def record_last_visit(self, profile, last_visit):
+        """
+        :param profile: The site profile of the user (Speedy Net or Speedy Match).
+        :param last_visit: The date and time of the visit.
+        """
+        with self._lock:
+            self._last_visits.setdefault(profile.__class__, {})[profile.pk] = last_visit
+            if (self._oldest_record_time is None):
+                self._oldest_record_time = time.time()
+            self._start_flush_thread()
+        self.flush_if_needed()
+
+    def record_last_ip_address_used(self, user, ip_address, date_updated):
+        """
+        :param user: The user.
+        :param ip_address: The IP address used.
+        :param date_updated: The date and time the IP address was used.
+        """
+        with self._lock:
+            self._last_ip_addresses_used[user.pk] = (ip_address, date_updated)
+            if (self._oldest_record_time is None):
+                self._oldest_record_time = time.time()
+            self._start_flush_thread()
+        self.flush_if_needed()
+
+    def flush_if_needed(self):
+        oldest_record_time = self._oldest_record_time
+        if (oldest_record_time is None):
+            return
+        if ((time.time() - oldest_record_time >= django_settings.VISITS_WRITE_BEHIND_MAX_STALENESS) or (len(self) >= django_settings.VISITS_WRITE_BEHIND_MAX_BUFFER_SIZE)):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all the buffered visits to the database.
+        """
+        from speedy.core.accounts.models import User
+        date_updated = now()
+        with self._lock:
+            last_visits, self._last_visits = self._last_visits, {}
+            last_ip_addresses_used, self._last_ip_addresses_used = self._last_ip_addresses_used, {}
+            self._oldest_record_time = None
+        for model, model_last_visits in last_visits.items():
+            for pks in self._get_chunks(pks=list(model_last_visits.keys())):
+                model.objects.filter(pk__in=pks).update(
+                    last_visit=Case(*[When(pk=pk, then=Value(model_last_visits[pk])) for pk in pks], output_field=models.DateTimeField()),
+                    date_updated=date_updated,
+                )
+        for pks in self._get_chunks(pks=list(last_ip_addresses_used.keys())):
+            User.objects.filter(pk__in=pks).update(
+                last_ip_address_used=Case(*[When(pk=pk, then=Value(last_ip_addresses_used[pk][0])) for pk in pks], output_field=models.GenericIPAddressField()),
+                last_ip_address_used_date_updated=Case(*[When(pk=pk, then=Value(last_ip_addresses_used[pk][1])) for pk in pks], output_field=models.DateTimeField()),
+                last_ip_address_used_ipapi_time=None,
+                date_updated=date_updated,
+            )
+
+    def _start_flush_thread(self):
+        # The thread is started by the first record in each process (threads are not copied when uWSGI forks its workers).
+        if ((django_settings.VISITS_WRITE_BEHIND_FLUSH_IN_BACKGROUND) and ((self._flush_thread is None) or (not (self._flush_thread.is_alive())))):
+            self._flush_thread = threading.Thread(target=self._flush_periodically, name='speedy-visits-write-behind', daemon=True)
+            self._flush_thread.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(max([django_settings.VISITS_WRITE_BEHIND_MAX_STALENESS, 1]))
+            try:
+                self.flush_if_needed()
+            except Exception as e:
+                logger.error("VisitsBuffer::_flush_periodically:Exception={e}".format(
+                    e=str(e),
+                ))
+            finally:
+                connections.close_all()
+
+    def _get_chunks(self, pks):
+        return [pks[i:i + FLUSH_CHUNK_SIZE] for i in range(0, len(pks), FLUSH_CHUNK_SIZE)]
+
+
+def _flush_at_exit():
+    try:
+        visits_buffer.flush()
+    except Exception as e:
+        logger.error("write_behind::_flush_at_exit:Exception={e}".format(
+            e=str(e),
+        ))
+
+
+visits_buffer = VisitsBuffer()
+
+atexit.register(_flush_at_exit)
+
+
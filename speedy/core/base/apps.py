@@ -5,6 +5,7 @@ from speedy.core.patches import auth_patches
 from speedy.core.patches import friendship_patches
 from speedy.core.patches import locale_patches
 from speedy.core.patches import session_patches
+from speedy.core.base import sites  # noqa: F401 - connect the site registry signal receivers.
 
 
 class SpeedyCoreBaseAppConfig(AppConfig):
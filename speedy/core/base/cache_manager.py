@@ -1,21 +1,39 @@
+import logging
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings as django_settings
 from django.core.cache import cache
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connections
+from django.utils import translation
 from django.utils.translation import get_language
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_VALUE = object()
 
+LEASE_POLL_INTERVAL = 0.1
+
+REVALIDATE_LEASE_TIMEOUT = 5 * 60  # 5 minutes
+
+_revalidate_executor = None
+_revalidate_executor_lock = threading.Lock()
+
 USE_CACHE = True
 
 
-def cache_get(key, default=None, version=None, sliding_timeout=None):
+def cache_get(key, default=None, version=None, sliding_timeout=None, revalidate=None):
     """
+    If revalidate is given and the value is stale (it was set with a stale_timeout, and its timeout passed), the stale value is returned and revalidate(generation=...) is called in the background to set a fresh value. revalidate should pass the generation to cache_set, so that the fresh value is not set if the stale value was deleted or replaced in the meantime.
+
     :type key: str
     :type default: object
     :type version: int
     :type sliding_timeout: int
+    :type revalidate: callable
     """
     if (not (USE_CACHE)):
         return None
@@ -35,9 +53,78 @@ def cache_get(key, default=None, version=None, sliding_timeout=None):
         if (ttl < sliding_timeout):
             cache_set(key, wrapped_value['value'], timeout=sliding_timeout, version=version)
 
+    if ((revalidate is not None) and (wrapped_value.get('stale_time') is not None) and (wrapped_value['stale_time'] < time.time())):
+        _revalidate(key=key, revalidate=revalidate, generation=wrapped_value.get('generation'), version=version)
+
+    return wrapped_value['value']
+
+
+def cache_get_fresh(key, default=None, version=None):
+    """
+    Like cache_get, but a stale value (see cache_set) is considered missing, and default is returned.
+
+    :type key: str
+    :type default: object
+    :type version: int
+    """
+    if (not (USE_CACHE)):
+        return None
+
+    wrapped_value = cache.get(key=key, default=DEFAULT_VALUE, version=version)
+    if (wrapped_value is DEFAULT_VALUE):
+        return default
+
+    if ((wrapped_value.get('site_id') != django_settings.SITE_ID) or (wrapped_value.get('language') != get_language())):
+        return default
+
+    if ((wrapped_value.get('stale_time') is not None) and (wrapped_value['stale_time'] < time.time())):
+        return default
+
     return wrapped_value['value']
 
 
+def cache_get_many(keys, version=None):
+    """
+    Get the values of many keys in one round-trip.
+
+    :type keys: list[str]
+    :type version: int
+    :return: A dict of the values of the keys which exist (and were set in the current site and language).
+    """
+    if (not (USE_CACHE)):
+        return {}
+
+    values = {}
+    for key, wrapped_value in cache.get_many(keys=keys, version=version).items():
+        if ((wrapped_value.get('site_id') == django_settings.SITE_ID) and (wrapped_value.get('language') == get_language())):
+            values[key] = wrapped_value['value']
+    return values
+
+
+def cache_get_or_revalidate(key, calculate, timeout=DEFAULT_TIMEOUT, stale_timeout=None, version=None):
+    """
+    Stale-while-revalidate. If the value is missing, calculate() is called and its result is cached and returned. If the value is older than timeout, it is still returned (for up to stale_timeout more seconds), and calculate() is called in the background to refresh it.
+
+    :type key: str
+    :type calculate: callable
+    :type timeout: int
+    :type stale_timeout: int
+    :type version: int
+    """
+    if (not (USE_CACHE)):
+        return calculate()
+
+    def refresh(generation=None):
+        value = calculate()
+        cache_set(key=key, value=value, timeout=timeout, version=version, stale_timeout=stale_timeout, generation=generation)
+        return value
+
+    value = cache_get(key=key, default=DEFAULT_VALUE, version=version, revalidate=refresh)
+    if (value is DEFAULT_VALUE):
+        value = refresh()
+    return value
+
+
 def cache_get_or_set(key, default, timeout=DEFAULT_TIMEOUT, version=None):
     """
     :type key: str
@@ -53,20 +140,129 @@ def cache_get_or_set(key, default, timeout=DEFAULT_TIMEOUT, version=None):
     return wrapped_value['value']
 
 
-def cache_set(key, value, timeout=DEFAULT_TIMEOUT, version=None):
+def cache_set(key, value, timeout=DEFAULT_TIMEOUT, version=None, stale_timeout=None, generation=None):
     """
+    If stale_timeout is given, the value is kept in the cache for stale_timeout more seconds after timeout, and considered stale during this time (see cache_get).
+
+    If generation is given, the value is set only if the current value of key is still of this generation - it was not deleted (for example by bust_cache) or replaced since it was read. This is used to refresh stale values. The check is not atomic (the cache has no compare-and-set), so a value which is deleted between the check and the set is still overwritten. This window is much shorter than the time it takes to calculate the value, and the value is refreshed again when its timeout passes.
+
     :type key: str
     :type value: object
     :type timeout: int
     :type version: int
+    :type stale_timeout: int
+    :type generation: str
     """
     if (not (USE_CACHE)):
         return
 
+    if (generation is not None):
+        current_wrapped_value = cache.get(key=key, default=DEFAULT_VALUE, version=version)
+        if ((current_wrapped_value is DEFAULT_VALUE) or (current_wrapped_value.get('generation') != generation)):
+            logger.debug("cache_manager::cache_set:value was deleted or replaced, not setting it, key={key}".format(
+                key=key,
+            ))
+            return False
+
+    stale_time = None
+    if ((stale_timeout) and (timeout is not None)):
+        if (timeout == DEFAULT_TIMEOUT):
+            timeout = cache.default_timeout
+        stale_time = time.time() + timeout
+        timeout += stale_timeout
     wrapped_value = _wrap(value=value, timeout=timeout)
+    if (stale_time is not None):
+        wrapped_value['stale_time'] = stale_time
+        wrapped_value['generation'] = uuid.uuid4().hex
     return cache.set(key=key, value=wrapped_value, timeout=timeout, version=version)
 
 
+def cache_acquire_lease(key, lease_timeout, version=None):
+    """
+    Try to acquire a lease for calculating the value of key, so that only one worker calculates it at a time.
+
+    :type key: str
+    :type lease_timeout: int
+    :type version: int
+    :return: True if the lease was acquired (the caller should calculate the value and then call cache_release_lease), False if another worker holds it.
+    """
+    if (not (USE_CACHE)):
+        return True
+
+    return cache.add(key=_lease_key(key=key), value=time.time(), timeout=lease_timeout, version=version)
+
+
+def cache_release_lease(key, version=None):
+    """
+    :type key: str
+    :type version: int
+    """
+    if (not (USE_CACHE)):
+        return
+
+    cache.delete(key=_lease_key(key=key), version=version)
+
+
+def cache_wait_for_value(key, wait_timeout, default=None, version=None, poll_interval=LEASE_POLL_INTERVAL):
+    """
+    Wait until another worker which holds the lease of key sets its value, or until wait_timeout seconds passed.
+
+    :type key: str
+    :type wait_timeout: float
+    :type default: object
+    :type version: int
+    :type poll_interval: float
+    :return: The value, or default if it was not set in time (or if the lease was released without setting it).
+    """
+    if (not (USE_CACHE)):
+        return default
+
+    deadline = time.time() + wait_timeout
+    while (time.time() < deadline):
+        time.sleep(poll_interval)
+        value = cache_get(key=key, default=DEFAULT_VALUE, version=version)
+        if (value is not DEFAULT_VALUE):
+            return value
+        if (cache.get(key=_lease_key(key=key), default=DEFAULT_VALUE, version=version) is DEFAULT_VALUE):
+            return default
+    return default
+
+
+def cache_incr(key, timeout=DEFAULT_TIMEOUT, version=None):
+    """
+    Atomically increment a counter, which is created with the value 1 if it doesn't exist. The timeout is set only when the counter is created.
+
+    Counters are not wrapped like values which are set by cache_set, read them with cache_get_counters.
+
+    :type key: str
+    :type timeout: int
+    :type version: int
+    :return: The new value of the counter.
+    """
+    if (not (USE_CACHE)):
+        return 1
+
+    try:
+        return cache.incr(key=key, version=version)
+    except ValueError:
+        if (cache.add(key=key, value=1, timeout=timeout, version=version)):
+            return 1
+        # Another worker created the counter in the meantime.
+        return cache.incr(key=key, version=version)
+
+
+def cache_get_counters(keys, version=None):
+    """
+    :type keys: list[str]
+    :type version: int
+    :return: A dict of the values of the counters which exist.
+    """
+    if (not (USE_CACHE)):
+        return {}
+
+    return cache.get_many(keys=keys, version=version)
+
+
 def cache_delete_many(keys, version=None):
     """
     :type keys: list[str]
@@ -92,3 +288,48 @@ def _wrap(value, timeout):
     return wrapped_value
 
 
+def _lease_key(key):
+    return '{}-lease'.format(key)
+
+
+def _revalidate_lease_key(key):
+    # Not the same key as the lease of cache_acquire_lease, so that a long revalidation doesn't make requests with a missing value wait for it.
+    return '{}-revalidate-lease'.format(key)
+
+
+def _get_revalidate_executor():
+    global _revalidate_executor
+    with _revalidate_executor_lock:
+        if (_revalidate_executor is None):
+            _revalidate_executor = ThreadPoolExecutor(max_workers=django_settings.CACHE_REVALIDATE_MAX_WORKERS, thread_name_prefix='speedy-cache-revalidate')
+    return _revalidate_executor
+
+
+def _revalidate(key, revalidate, generation, version=None):
+    if (not (cache.add(key=_revalidate_lease_key(key=key), value=time.time(), timeout=REVALIDATE_LEASE_TIMEOUT, version=version))):
+        # Another worker is already calculating a fresh value.
+        return
+    language_code = get_language()
+
+    def run():
+        try:
+            with translation.override(language_code):
+                revalidate(generation=generation)
+        except Exception as e:
+            logger.error("cache_manager::_revalidate:revalidate raised an exception, key={key}, Exception={e}".format(
+                key=key,
+                e=str(e),
+            ))
+        finally:
+            cache.delete(key=_revalidate_lease_key(key=key), version=version)
+
+    def run_in_background():
+        try:
+            run()
+        finally:
+            connections.close_all()
+
+    if (django_settings.CACHE_REVALIDATE_IN_BACKGROUND):
+        _get_revalidate_executor().submit(run_in_background)
+    else:
+        run()
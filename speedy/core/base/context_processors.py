@@ -2,7 +2,8 @@ from datetime import date
 
 from django.utils.translation import get_language, gettext_lazy as _
 from django.conf import settings as django_settings
-from django.contrib.sites.models import Site
+
+from .sites import site_registry
 
 
 def active_url_name(request):
@@ -28,7 +29,7 @@ def settings(request):
 
 
 def sites(request):
-    site = Site.objects.get_current()
+    site = site_registry.get_current_site()
     # Speedy Net and Speedy Match are in alpha (except Speedy Match in English).
     if (hasattr(django_settings, 'SITE_TITLE')):
         site_title = django_settings.SITE_TITLE
@@ -42,19 +43,19 @@ def sites(request):
         'site': site,
         'site_name': _(site.name),
         'site_title': site_title,
-        'sites': Site.objects.filter(pk__in=django_settings.TEMPLATES_TOP_SITES).order_by('pk'),
+        'sites': [_site for _site in site_registry.get_sites() if (_site.id in django_settings.TEMPLATES_TOP_SITES)],
     }
 
 
 def speedy_net_domain(request):
-    SPEEDY_NET_DOMAIN = Site.objects.get(pk=django_settings.SPEEDY_NET_SITE_ID).domain
+    SPEEDY_NET_DOMAIN = site_registry.get_domain(site_id=django_settings.SPEEDY_NET_SITE_ID)
     return {
         'SPEEDY_NET_DOMAIN': SPEEDY_NET_DOMAIN,
     }
 
 
 def speedy_match_domain(request):
-    SPEEDY_MATCH_DOMAIN = Site.objects.get(pk=django_settings.SPEEDY_MATCH_SITE_ID).domain
+    SPEEDY_MATCH_DOMAIN = site_registry.get_domain(site_id=django_settings.SPEEDY_MATCH_SITE_ID)
     return {
         'SPEEDY_MATCH_DOMAIN': SPEEDY_MATCH_DOMAIN,
     }
@@ -6,21 +6,24 @@ from django.utils import log
 from speedy.core.base import cache_manager
 
 CACHE_TYPES = {
-    'mail_admins': 'speedy-core-base-log-mail-admins-{subject}',
+    'mail_admins_cooldown': 'speedy-core-base-log-mail-admins-cooldown-{subject}',
+    'mail_admins_count': 'speedy-core-base-log-mail-admins-count-{subject}-{minute}',
 }
 
 MAIL_ADMINS_COOLDOWN_PERIOD = 3600  # 1 hour
+MAIL_ADMINS_COUNT_BUCKET_PERIOD = 60  # 1 minute
 
 
-def cache_key(cache_type, subject):
+def cache_key(cache_type, subject, minute=None):
     """
     Build the cache key for a particular type of cached value.
 
     :param cache_type: Required. One of the keys of CACHE_TYPES.
     :param subject: Required. The subject of the log message.
+    :param minute: The number of the minute (since the epoch) of the counter, for 'mail_admins_count'.
     :return: A cache key.
     """
-    return CACHE_TYPES[cache_type].format(subject=murmur3_32(data=subject))
+    return CACHE_TYPES[cache_type].format(subject=murmur3_32(data=subject), minute=minute)
 
 
 class AdminEmailHandler(log.AdminEmailHandler):
@@ -49,31 +52,15 @@ class AdminEmailHandler(log.AdminEmailHandler):
             return True, 1
 
         try:
-            mail_admins_key = cache_key(cache_type='mail_admins', subject=subject)
-            now = time.time()
-            value = {
-                'cooldown_start_time': now,
-                'cooldown_count': 0,
-                'cooldown_timestamps': [],
-            }
-            cached_value = cache_manager.cache_get_or_set(key=mail_admins_key, default=value, timeout=MAIL_ADMINS_COOLDOWN_PERIOD)
-            # count = cached_value['cooldown_count'] + 1
-            count_last_hour = sum(1 for timestamp in cached_value['cooldown_timestamps'] if (now - timestamp < MAIL_ADMINS_COOLDOWN_PERIOD)) + 1
-            if (cached_value == value):
-                # Not in cooldown period
-                should_send_mail = True
-            else:
-                # Consider adding lock
-                if (now - cached_value['cooldown_start_time'] >= MAIL_ADMINS_COOLDOWN_PERIOD):
-                    # Cooldown period passed, reset cooldown period
-                    should_send_mail = True
-                    cache_manager.cache_set(key=mail_admins_key, value=value, timeout=MAIL_ADMINS_COOLDOWN_PERIOD)
-                else:
-                    # Still in cooldown period, update cooldown count
-                    should_send_mail = False
-                    cached_value['cooldown_count'] += 1
-                    cached_value['cooldown_timestamps'].append(now)
-                    cache_manager.cache_set(key=mail_admins_key, value=cached_value, timeout=MAIL_ADMINS_COOLDOWN_PERIOD)
+            # Each log message increments a counter of the current minute, and a counter of the cooldown period, which expires after the cooldown period. The first message of a cooldown period is sent by mail.
+            minute = int(time.time() // MAIL_ADMINS_COUNT_BUCKET_PERIOD)
+            cache_manager.cache_incr(key=cache_key(cache_type='mail_admins_count', subject=subject, minute=minute), timeout=MAIL_ADMINS_COOLDOWN_PERIOD + MAIL_ADMINS_COUNT_BUCKET_PERIOD)
+            should_send_mail = (cache_manager.cache_incr(key=cache_key(cache_type='mail_admins_cooldown', subject=subject), timeout=MAIL_ADMINS_COOLDOWN_PERIOD) == 1)
+            count_last_hour = 1
+            if (should_send_mail):
+                number_of_buckets = MAIL_ADMINS_COOLDOWN_PERIOD // MAIL_ADMINS_COUNT_BUCKET_PERIOD
+                counts = cache_manager.cache_get_counters(keys=[cache_key(cache_type='mail_admins_count', subject=subject, minute=minute - i) for i in range(number_of_buckets)])
+                count_last_hour = max([sum(counts.values()), 1])
             return should_send_mail, count_last_hour
         except Exception:
             return True, 1
@@ -1,70 +1,105 @@
+import functools
 import logging
 from collections import namedtuple
 
 from django.conf import settings as django_settings
-from django.contrib.sites.models import Site
 from django.core.mail import EmailMultiAlternatives
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.template.exceptions import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.utils import translation
 from django.utils.translation import get_language, gettext_lazy as _
 
+from .sites import site_registry
+
 logger = logging.getLogger(__name__)
 
 RenderedMail = namedtuple('RenderedMail', 'subject body_plain body_html')
+MailTemplates = namedtuple('MailTemplates', 'subject plain html plain_base_template_name html_base_template_name')
 
 
-def render_mail(template_name_prefix, context=None, base_template_name_prefix='email/base'):
-    subject_template_name = '{}_subject.txt'.format(template_name_prefix)
-    plain_template_name = '{}_body.txt'.format(template_name_prefix)
-    html_template_name = '{}_body.html'.format(template_name_prefix)
+@functools.lru_cache(maxsize=None)
+def get_mail_templates(template_name_prefix, base_template_name_prefix='email/base'):
+    """
+    Load the templates of an email once per process. If the email doesn't have an html template, the base html template is used instead (this is also cached, so missing templates are not looked up again).
 
+    Templates don't depend on the language (the language is used only when they are rendered), so they are cached by their names only.
+
+    :return: MailTemplates.
+    """
     plain_base_template_name = '{}_body.txt'.format(base_template_name_prefix)
     html_base_template_name = '{}_body.html'.format(base_template_name_prefix)
-
-    context = context or {}
-    site = Site.objects.get_current()
-    params = {
-        'protocol': 'https' if (django_settings.USE_HTTPS) else 'http',
-        'language_code': translation.get_language() or 'en',  # ~~~~ TODO: find solution in order find language in management commands (None is this case).
-        'domain': site.domain,
-    }
-    context.update({
-        'SITE_URL': '{protocol}://{language_code}.{domain}'.format(**params),
-        'SITE_MAIN_URL': '{protocol}://www.{domain}'.format(**params),
-    })
-
-    # render subject
-    subject = render_to_string(template_name=subject_template_name, context=context)
-
-    # render plain text
-    context.update({
-        'subject': subject,
-        'base_template': plain_base_template_name,
-    })
-    body_plain = render_to_string(template_name=plain_template_name, context=context)
-
-    # render html
-    context.update({
-        'plain_content': body_plain,
-        'base_template': html_base_template_name,
-    })
     try:
-        body_html = render_to_string(template_name=html_template_name, context=context)
+        html_template = get_template(template_name='{}_body.html'.format(template_name_prefix))
     except TemplateDoesNotExist:
-        body_html = render_to_string(template_name=html_base_template_name, context=context)
-
-    return RenderedMail(
-        subject=' '.join(subject.splitlines(keepends=False)).strip(),
-        body_plain=body_plain.strip(),
-        body_html=body_html.strip(),
+        html_template = get_template(template_name=html_base_template_name)
+    return MailTemplates(
+        subject=get_template(template_name='{}_subject.txt'.format(template_name_prefix)),
+        plain=get_template(template_name='{}_body.txt'.format(template_name_prefix)),
+        html=html_template,
+        plain_base_template_name=plain_base_template_name,
+        html_base_template_name=html_base_template_name,
     )
 
 
+@receiver(signal=setting_changed)
+def clear_mail_templates_cache(setting, **kwargs):
+    if (setting == 'TEMPLATES'):
+        get_mail_templates.cache_clear()
+
+
+def render_mails(template_name_prefix, contexts, base_template_name_prefix='email/base'):
+    """
+    Render an email to many recipients. The templates are loaded and the site urls are calculated once for all the emails.
+
+    :param contexts: A list of contexts, one per email.
+    :return: A list of RenderedMail, in the same order as contexts.
+    """
+    templates = get_mail_templates(template_name_prefix=template_name_prefix, base_template_name_prefix=base_template_name_prefix)
+    language_code = translation.get_language() or 'en'  # ~~~~ TODO: find solution in order find language in management commands (None is this case).
+    site_urls = {
+        'SITE_URL': site_registry.get_site_url(site_id=django_settings.SITE_ID, language_code=language_code),
+        'SITE_MAIN_URL': site_registry.get_site_main_url(site_id=django_settings.SITE_ID),
+    }
+    rendered_mails = []
+    for context in contexts:
+        context = context or {}
+        context.update(site_urls)
+
+        # render subject
+        subject = templates.subject.render(context=context)
+
+        # render plain text
+        context.update({
+            'subject': subject,
+            'base_template': templates.plain_base_template_name,
+        })
+        body_plain = templates.plain.render(context=context)
+
+        # render html
+        context.update({
+            'plain_content': body_plain,
+            'base_template': templates.html_base_template_name,
+        })
+        body_html = templates.html.render(context=context)
+
+        rendered_mails.append(RenderedMail(
+            subject=' '.join(subject.splitlines(keepends=False)).strip(),
+            body_plain=body_plain.strip(),
+            body_html=body_html.strip(),
+        ))
+    return rendered_mails
+
+
+def render_mail(template_name_prefix, context=None, base_template_name_prefix='email/base'):
+    return render_mails(template_name_prefix=template_name_prefix, contexts=[context], base_template_name_prefix=base_template_name_prefix)[0]
+
+
 def send_mail(to, template_name_prefix, context=None, **kwargs):
     # Sending mail may fail. If it fails, log the error and continue.
     try:
-        site = Site.objects.get_current()
+        site = site_registry.get_current_site()
         language_code = get_language()
         context = context or {}
         context.update({
@@ -9,6 +9,8 @@ from django.urls import NoReverseMatch
 from django.urls import reverse
 from django.utils import translation
 
+from .sites import site_registry
+
 
 def redirect_to_www(site: Site) -> HttpResponseBase:
     url = '//www.{domain}{path}'.format(
@@ -24,6 +26,74 @@ def show_www_template(request: HttpRequest) -> HttpResponseBase:
     return render(request=request, template_name='www/welcome.html')
 
 
+class HostRoutingTable(object):
+    """
+    Routing table of hosts for LocaleDomainMiddleware.
+
+    Built once per process (for the current site) from the site registry, and rebuilt when the sites are reloaded. Each host is routed to a language, to the www page of this site, to a redirect to the same host without hyphens, or to a redirect to the www page of a site.
+    """
+    ROUTE_LANGUAGE = 'language'
+    ROUTE_WWW = 'www'
+    ROUTE_REDIRECT_WITHOUT_HYPHENS = 'redirect_without_hyphens'
+    ROUTE_REDIRECT_TO_WWW = 'redirect_to_www'
+
+    # Other hosts are routed by the Host header of the request, so we keep only a limited number of them.
+    MAX_NUMBER_OF_OTHER_HOSTS = 1000
+
+    def __init__(self, site: Site, sites: list):
+        self.site = site
+        self.sites = sites
+        self.routes = {}
+        for language_code, language_name in django_settings.LANGUAGES:
+            self.routes["{language_code}.{domain}".format(language_code=language_code, domain=site.domain)] = (self.__class__.ROUTE_LANGUAGE, language_code)
+        self.routes["www.{domain}".format(domain=site.domain)] = (self.__class__.ROUTE_WWW, site)
+        self.other_routes = {}
+
+    def get_route(self, domain: str) -> tuple:
+        route = self.routes.get(domain)
+        if (route is None):
+            route = self.other_routes.get(domain)
+            if (route is None):
+                route = self._get_other_route(domain=domain)
+                if (len(self.other_routes) < self.__class__.MAX_NUMBER_OF_OTHER_HOSTS):
+                    self.other_routes[domain] = route
+        return route
+
+    def _get_other_route(self, domain: str) -> tuple:
+        if ((not (domain == domain.replace("-", ""))) and (self.site.domain == self.site.domain.replace("-", ""))):
+            route = self.routes.get(domain.replace("-", ""))
+            if ((route is not None) and (route[0] == self.__class__.ROUTE_LANGUAGE)):
+                return (self.__class__.ROUTE_REDIRECT_WITHOUT_HYPHENS, None)
+        for _site in self.sites:
+            if (_site.domain in domain):
+                return (self.__class__.ROUTE_REDIRECT_TO_WWW, _site)
+        if ("match" in domain):
+            other_site_id = django_settings.SPEEDY_MATCH_SITE_ID
+        elif ("composer" in domain):
+            other_site_id = django_settings.SPEEDY_COMPOSER_SITE_ID
+        elif ("mail" in domain):
+            other_site_id = django_settings.SPEEDY_MAIL_SOFTWARE_SITE_ID
+        else:
+            other_site_id = django_settings.SPEEDY_NET_SITE_ID
+        for _site in self.sites:
+            if (_site.id == other_site_id):
+                return (self.__class__.ROUTE_REDIRECT_TO_WWW, _site)
+        raise Exception("Unexpected: other_site_id={}".format(other_site_id))
+
+
+_host_routing_tables = {}
+
+
+def get_host_routing_table() -> HostRoutingTable:
+    sites = site_registry.get_sites()
+    site = site_registry.get_current_site()
+    host_routing_table = _host_routing_tables.get(site.id)
+    if ((host_routing_table is None) or (not (host_routing_table.sites is sites))):
+        host_routing_table = HostRoutingTable(site=site, sites=sites)
+        _host_routing_tables[site.id] = host_routing_table
+    return host_routing_table
+
+
 class LocaleDomainMiddleware(object):
     def __init__(self, get_response):
         self.get_response = get_response
@@ -38,22 +108,20 @@ class LocaleDomainMiddleware(object):
             )
             return redirect(to=url, permanent=(not (django_settings.DEBUG)))
 
-        site = Site.objects.get_current()
+        host_routing_table = get_host_routing_table()
+        route, value = host_routing_table.get_route(domain=domain)
 
-        for language_code, language_name in django_settings.LANGUAGES:
-            if (domain == "{language_code}.{domain}".format(language_code=language_code, domain=site.domain)):
-                translation.activate(language=language_code)
-                request.LANGUAGE_CODE = translation.get_language()
-                return self.get_response(request=request)
+        if (route == HostRoutingTable.ROUTE_LANGUAGE):
+            translation.activate(language=value)
+            request.LANGUAGE_CODE = translation.get_language()
+            return self.get_response(request=request)
 
-        if ((not (domain == domain.replace("-", ""))) and (site.domain == site.domain.replace("-", ""))):
-            for language_code, language_name in django_settings.LANGUAGES:
-                if (domain.replace("-", "") == "{language_code}.{domain}".format(language_code=language_code, domain=site.domain)):
-                    url = '//{domain}{path}'.format(
-                        domain=domain.replace("-", ""),
-                        path=request.get_full_path(),
-                    )
-                    return redirect(to=url, permanent=(not (django_settings.DEBUG)))
+        if (route == HostRoutingTable.ROUTE_REDIRECT_WITHOUT_HYPHENS):
+            url = '//{domain}{path}'.format(
+                domain=domain.replace("-", ""),
+                path=request.get_full_path(),
+            )
+            return redirect(to=url, permanent=(not (django_settings.DEBUG)))
 
         try:
             if (request.path == reverse('accounts:set_session')):
@@ -61,27 +129,11 @@ class LocaleDomainMiddleware(object):
         except NoReverseMatch:
             pass
 
-        if (not (domain == "www.{domain}".format(domain=site.domain))):
-            for _site in Site.objects.all().order_by("pk"):
-                if (_site.domain in domain):
-                    other_site = _site
-                    return redirect_to_www(site=other_site)
-            other_site = None
-            if ("match" in domain):
-                other_site = Site.objects.get(pk=django_settings.SPEEDY_MATCH_SITE_ID)
-            elif ("composer" in domain):
-                other_site = Site.objects.get(pk=django_settings.SPEEDY_COMPOSER_SITE_ID)
-            elif ("mail" in domain):
-                other_site = Site.objects.get(pk=django_settings.SPEEDY_MAIL_SOFTWARE_SITE_ID)
-            else:
-                other_site = Site.objects.get(pk=django_settings.SPEEDY_NET_SITE_ID)
-            if ((other_site is not None) and (other_site.id in [_site.id for _site in Site.objects.all().order_by("pk")])):
-                return redirect_to_www(site=other_site)
-            else:
-                raise Exception("Unexpected: other_site={}".format(other_site))
+        if (route == HostRoutingTable.ROUTE_REDIRECT_TO_WWW):
+            return redirect_to_www(site=value)
 
         if (not (request.get_full_path() == '/')):
-            return redirect_to_www(site=site)
+            return redirect_to_www(site=host_routing_table.site)
 
         return show_www_template(request=request)
 
@@ -89,14 +141,14 @@ class LocaleDomainMiddleware(object):
 class SessionCookieDomainMiddleware(object):
     """
     Cross-domain auth.
-    Overrides SESSION_COOKIE_DOMAIN setting with Site.objects.get_current().domain.
+    Overrides SESSION_COOKIE_DOMAIN setting with the domain of the current site.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponseBase:
-        site = Site.objects.get_current()
+        site = site_registry.get_current_site()
         response = self.get_response(request=request)
         if (django_settings.SESSION_COOKIE_NAME in response.cookies):
             response.cookies[django_settings.SESSION_COOKIE_NAME]['domain'] = '.' + site.domain.split(':')[0]
@@ -0,0 +1,138 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class KeysetPage(Sequence):
+    """
+    A page of a KeysetPaginator. Has the same interface as Django's Page (without start_index and end_index), so that it can be used in the same templates.
+
+    The page number is only displayed, it is passed in the url together with the cursor.
+    """
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Page {}>'.format(self.number)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return ((self.has_next()) or (self.has_previous()))
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_cursor(self):
+        return self.paginator.get_cursor(obj=self.object_list[-1]) if (self.has_next()) else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.get_cursor(obj=self.object_list[0]) if (self.has_previous()) else None
+
+
+class KeysetPaginator(object):
+    """
+    Paginates a queryset by the values of keyset_fields, in descending order, instead of by an offset. The next page contains the objects after the last object of the current page (the cursor), so every page costs the same and the objects are not counted.
+
+    The last field in keyset_fields must be unique (usually the id), to break ties.
+    """
+    def __init__(self, queryset, per_page, keyset_fields):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keyset_fields = keyset_fields
+
+    def page(self, after=None, before=None, number=1):
+        """
+        Return the page after the cursor after, or the page before the cursor before, or the first page.
+
+        :param after: A cursor of the last object of the previous page.
+        :param before: A cursor of the first object of the next page.
+        :param number: The number of the page, only for displaying.
+        :return: A KeysetPage.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage("That page number is not an integer.")
+        descending_order = ['-{}'.format(field_name) for field_name in self.keyset_fields]
+        if (after):
+            queryset = self.queryset.filter(self._get_cursor_filter(cursor=after, lookup='lt')).order_by(*descending_order)
+            object_list = list(queryset[:self.per_page + 1])
+            has_next, has_previous = (len(object_list) > self.per_page), True
+            object_list = object_list[:self.per_page]
+        elif (before):
+            queryset = self.queryset.filter(self._get_cursor_filter(cursor=before, lookup='gt')).order_by(*self.keyset_fields)
+            object_list = list(queryset[:self.per_page + 1])
+            has_next, has_previous = True, (len(object_list) > self.per_page)
+            object_list = list(reversed(object_list[:self.per_page]))
+        else:
+            object_list = list(self.queryset.order_by(*descending_order)[:self.per_page + 1])
+            has_next, has_previous = (len(object_list) > self.per_page), False
+            object_list = object_list[:self.per_page]
+        if (not (has_previous)):
+            number = 1
+        return KeysetPage(object_list=object_list, number=max([number, 1]), paginator=self, has_next=has_next, has_previous=has_previous)
+
+    def get_cursor(self, obj):
+        values = [self.queryset.model._meta.get_field(field_name).value_to_string(obj) for field_name in self.keyset_fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def _get_cursor_filter(self, cursor, lookup):
+        """
+        Return the filter of the objects after (lookup='lt') or before (lookup='gt') the cursor.
+
+        :raise InvalidPage: If the cursor is invalid (cursors come from the url, so they may be anything).
+        """
+        try:
+            return self._get_filter(values=self._decode_cursor(cursor=cursor), lookup=lookup)
+        except (binascii.Error, UnicodeError, TypeError, ValueError, ValidationError):
+            raise InvalidPage("Invalid cursor.")
+
+    def _decode_cursor(self, cursor):
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if (not ((isinstance(values, list)) and (len(values) == len(self.keyset_fields)))):
+            raise ValueError("Wrong number of values.")
+        # get_cursor encodes all the values as strings.
+        if (not (all((isinstance(value, str)) for value in values))):
+            raise ValueError("Values must be strings.")
+        values = [self.queryset.model._meta.get_field(field_name).to_python(value) for field_name, value in zip(self.keyset_fields, values)]
+        if (any((value is None) for value in values)):
+            raise ValueError("Values must not be null.")
+        return values
+
+    def _get_filter(self, values, lookup):
+        """
+        (f1, f2, f3) < (v1, v2, v3) is (f1 < v1) or (f1 = v1 and f2 < v2) or (f1 = v1 and f2 = v2 and f3 < v3).
+        """
+        q = Q()
+        for i, field_name in enumerate(self.keyset_fields):
+            conditions = {self.keyset_fields[j]: values[j] for j in range(i)}
+            conditions['{}__{}'.format(field_name, lookup)] = values[i]
+            q |= Q(**conditions)
+        return q
+
+
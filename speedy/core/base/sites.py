@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings as django_settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import models
+from django.dispatch import receiver
+
+SITES_VERSION_CACHE_KEY = 'speedy-core-base-sites-version'
+
+
+class SiteRegistry(object):
+    """
+    A process-wide registry of all the sites, loaded once from the database.
+
+    The sites are reloaded when a site is saved or deleted. Other processes are notified through a version in the cache, which is checked at most every SITE_REGISTRY_VERSION_CHECK_INTERVAL seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # A (sites, sites_dict) tuple, replaced as a whole so that threads which don't hold the lock never see a partially loaded registry.
+        self._loaded_sites = None
+        self._version = None
+        self._version_check_time = None
+
+    def get_sites(self) -> list:
+        """
+        :return: All the sites, ordered by pk.
+        """
+        sites, sites_dict = self._load_if_needed()
+        return sites
+
+    def get_site(self, site_id) -> Site:
+        sites, sites_dict = self._load_if_needed()
+        try:
+            return sites_dict[site_id]
+        except KeyError:
+            raise Site.DoesNotExist("Site matching query does not exist.")
+
+    def get_current_site(self) -> Site:
+        return self.get_site(site_id=django_settings.SITE_ID)
+
+    def get_domain(self, site_id) -> str:
+        return self.get_site(site_id=site_id).domain
+
+    def get_name(self, site_id) -> str:
+        return self.get_site(site_id=site_id).name
+
+    def get_site_url(self, site_id, language_code) -> str:
+        return '{protocol}://{language_code}.{domain}'.format(
+            protocol='https' if (django_settings.USE_HTTPS) else 'http',
+            language_code=language_code,
+            domain=self.get_domain(site_id=site_id),
+        )
+
+    def get_site_main_url(self, site_id) -> str:
+        return '{protocol}://www.{domain}'.format(
+            protocol='https' if (django_settings.USE_HTTPS) else 'http',
+            domain=self.get_domain(site_id=site_id),
+        )
+
+    def clear(self):
+        """
+        Reload the sites in this process, and notify other processes to reload them.
+        """
+        with self._lock:
+            self._loaded_sites = None
+        cache.set(SITES_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+    def _load_if_needed(self) -> tuple:
+        """
+        :return: A (sites, sites_dict) tuple.
+        """
+        # Read each attribute once without the lock - another thread may replace them in the meantime.
+        loaded_sites = self._loaded_sites
+        version_check_time = self._version_check_time
+        if ((loaded_sites is not None) and (version_check_time is not None) and (time.monotonic() - version_check_time < django_settings.SITE_REGISTRY_VERSION_CHECK_INTERVAL)):
+            return loaded_sites
+        with self._lock:
+            version = cache.get(SITES_VERSION_CACHE_KEY)
+            if (version is None):
+                version = uuid.uuid4().hex
+                cache.set(SITES_VERSION_CACHE_KEY, version, timeout=None)
+            if ((self._loaded_sites is None) or (not (version == self._version))):
+                sites = list(Site.objects.all().order_by("pk"))
+                self._version = version
+                self._loaded_sites = (sites, {site.id: site for site in sites})
+            self._version_check_time = time.monotonic()
+            return self._loaded_sites
+
+
+site_registry = SiteRegistry()
+
+
+@receiver(signal=models.signals.post_save, sender=Site)
+@receiver(signal=models.signals.post_delete, sender=Site)
+def clear_site_registry(sender, **kwargs):
+    site_registry.clear()
+
+
@@ -16,7 +16,10 @@ def set_request_params(context, **params):
     if (request):
         query_dict = request.GET.copy()
         for k, v in params.items():
-            query_dict[k] = v
+            if (v is None):
+                query_dict.pop(k, None)
+            else:
+                query_dict[k] = v
         if ("page" in query_dict):
             if (str(query_dict["page"]) == str(1)):
                 del query_dict["page"]
@@ -49,6 +52,14 @@ def pagination(context):
     return context
 
 
+@register.inclusion_tag(filename='core/keyset_pagination.html', takes_context=True)
+def keyset_pagination(context):
+    """
+    Previous and next links of a KeysetPaginator page (the pages are not counted, so there are no links to other pages).
+    """
+    return context
+
+
 @register.filter
 def convert_en_to_www(value):
     if (value == "en"):
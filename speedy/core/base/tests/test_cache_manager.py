@@ -0,0 +1,125 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    import time
+
+    from django.core.cache import cache
+
+    from speedy.core.base.test.models import SiteTestCase
+
+    from speedy.core.base import cache_manager, log
+
+
+    class CacheLeaseOnlyEnglishTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.key = 'speedy-core-base-tests-cache-lease'
+            cache.delete_many(keys=[self.key, '{}-lease'.format(self.key)])
+
+        def tear_down(self):
+            cache.delete_many(keys=[self.key, '{}-lease'.format(self.key)])
+            super().tear_down()
+
+        def test_only_one_worker_acquires_lease(self):
+            self.assertIs(expr1=cache_manager.cache_acquire_lease(key=self.key, lease_timeout=60), expr2=True)
+            self.assertIs(expr1=cache_manager.cache_acquire_lease(key=self.key, lease_timeout=60), expr2=False)
+            cache_manager.cache_release_lease(key=self.key)
+            self.assertIs(expr1=cache_manager.cache_acquire_lease(key=self.key, lease_timeout=60), expr2=True)
+            cache_manager.cache_release_lease(key=self.key)
+
+        def test_wait_for_value_returns_value(self):
+            self.assertIs(expr1=cache_manager.cache_acquire_lease(key=self.key, lease_timeout=60), expr2=True)
+            cache_manager.cache_set(key=self.key, value=[1, 2, 3], timeout=60)
+            self.assertListEqual(list1=cache_manager.cache_wait_for_value(key=self.key, wait_timeout=1), list2=[1, 2, 3])
+            cache_manager.cache_release_lease(key=self.key)
+
+        def test_wait_for_value_returns_default_if_lease_is_released(self):
+            self.assertIsNone(obj=cache_manager.cache_wait_for_value(key=self.key, wait_timeout=1))
+            self.assertEqual(first=cache_manager.cache_wait_for_value(key=self.key, wait_timeout=1, default=5), second=5)
+
+
+    class CacheStaleWhileRevalidateOnlyEnglishTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.key = 'speedy-core-base-tests-cache-stale-while-revalidate'
+            cache.delete_many(keys=[self.key, '{}-lease'.format(self.key), '{}-revalidate-lease'.format(self.key)])
+            self.number_of_calculations = 0
+
+        def tear_down(self):
+            cache.delete_many(keys=[self.key, '{}-lease'.format(self.key), '{}-revalidate-lease'.format(self.key)])
+            super().tear_down()
+
+        def calculate(self):
+            self.number_of_calculations += 1
+            return self.number_of_calculations
+
+        def test_missing_value_is_calculated(self):
+            self.assertEqual(first=cache_manager.cache_get_or_revalidate(key=self.key, calculate=self.calculate, timeout=60, stale_timeout=60), second=1)
+            self.assertEqual(first=cache_manager.cache_get_or_revalidate(key=self.key, calculate=self.calculate, timeout=60, stale_timeout=60), second=1)
+            self.assertEqual(first=self.number_of_calculations, second=1)
+
+        def test_stale_value_is_returned_and_revalidated(self):
+            cache_manager.cache_set(key=self.key, value=0, timeout=0, stale_timeout=60)
+            self.assertEqual(first=cache_manager.cache_get_or_revalidate(key=self.key, calculate=self.calculate, timeout=60, stale_timeout=60), second=0)
+            self.assertEqual(first=self.number_of_calculations, second=1)
+            self.assertEqual(first=cache_manager.cache_get_or_revalidate(key=self.key, calculate=self.calculate, timeout=60, stale_timeout=60), second=1)
+            self.assertEqual(first=self.number_of_calculations, second=1)
+
+        def test_value_without_stale_timeout_is_not_revalidated(self):
+            cache_manager.cache_set(key=self.key, value=0, timeout=60)
+            self.assertEqual(first=cache_manager.cache_get(key=self.key, revalidate=self.calculate), second=0)
+            self.assertEqual(first=self.number_of_calculations, second=0)
+
+        def test_revalidation_does_not_hold_the_lease(self):
+            def revalidate(generation):
+                self.assertIs(expr1=cache_manager.cache_acquire_lease(key=self.key, lease_timeout=60), expr2=True)
+                cache_manager.cache_release_lease(key=self.key)
+                self.calculate()
+
+            cache_manager.cache_set(key=self.key, value=0, timeout=0, stale_timeout=60)
+            self.assertEqual(first=cache_manager.cache_get(key=self.key, revalidate=revalidate), second=0)
+            self.assertEqual(first=self.number_of_calculations, second=1)
+
+        def test_revalidated_value_is_not_set_if_value_was_deleted(self):
+            def revalidate(generation):
+                cache_manager.cache_delete_many(keys=[self.key])
+                self.assertIs(expr1=cache_manager.cache_set(key=self.key, value=self.calculate(), timeout=60, stale_timeout=60, generation=generation), expr2=False)
+
+            cache_manager.cache_set(key=self.key, value=0, timeout=0, stale_timeout=60)
+            self.assertEqual(first=cache_manager.cache_get(key=self.key, revalidate=revalidate), second=0)
+            self.assertEqual(first=self.number_of_calculations, second=1)
+            self.assertIsNone(obj=cache_manager.cache_get(key=self.key))
+
+
+    class CacheCounterOnlyEnglishTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.keys = ['speedy-core-base-tests-cache-counter-1', 'speedy-core-base-tests-cache-counter-2']
+            cache.delete_many(keys=self.keys)
+
+        def tear_down(self):
+            cache.delete_many(keys=self.keys)
+            super().tear_down()
+
+        def test_incr_creates_and_increments_counter(self):
+            self.assertEqual(first=cache_manager.cache_incr(key=self.keys[0], timeout=60), second=1)
+            self.assertEqual(first=cache_manager.cache_incr(key=self.keys[0], timeout=60), second=2)
+            self.assertEqual(first=cache_manager.cache_incr(key=self.keys[0], timeout=60), second=3)
+            self.assertDictEqual(d1=cache_manager.cache_get_counters(keys=self.keys), d2={self.keys[0]: 3})
+
+        def test_admin_email_handler_sends_mail_once_per_cooldown_period(self):
+            subject = 'WARNING: speedy-core-base-tests-cache-counter'
+            keys = [log.cache_key(cache_type='mail_admins_cooldown', subject=subject)] + [log.cache_key(cache_type='mail_admins_count', subject=subject, minute=int(time.time() // log.MAIL_ADMINS_COUNT_BUCKET_PERIOD) - i) for i in range(2)]
+            self.keys.extend(keys)
+            cache.delete_many(keys=keys)
+            handler = log.AdminEmailHandler()
+            self.assertTupleEqual(tuple1=handler._should_send_mail(subject=subject), tuple2=(True, 1))
+            self.assertTupleEqual(tuple1=handler._should_send_mail(subject=subject), tuple2=(False, 1))
+            self.assertTupleEqual(tuple1=handler._should_send_mail(subject=subject), tuple2=(False, 1))
+            # The cooldown period passed.
+            cache.delete(key=keys[0])
+            should_send_mail, count_last_hour = handler._should_send_mail(subject=subject)
+            self.assertIs(expr1=should_send_mail, expr2=True)
+            self.assertEqual(first=count_last_hour, second=4)
+
+
@@ -0,0 +1,41 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    from unittest import mock
+
+    from speedy.core.base.test.models import SiteTestCase
+
+    from speedy.core.base import mail
+
+
+    class RenderMailOnlyEnglishTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            mail.get_mail_templates.cache_clear()
+
+        def get_context(self, text):
+            return {
+                'site_name': "Speedy",
+                'feedback': {'sender_name': "Jennifer", 'sender_email': 'jennifer@example.com', 'text': text},
+            }
+
+        def test_templates_are_loaded_once(self):
+            with mock.patch.object(target=mail, attribute='get_template', wraps=mail.get_template) as mocked_get_template:
+                mail.render_mail(template_name_prefix='email/contact_by_form/admin_feedback', context=self.get_context(text="Hello"))
+                self.assertGreater(a=mocked_get_template.call_count, b=0)
+                call_count = mocked_get_template.call_count
+                mail.render_mail(template_name_prefix='email/contact_by_form/admin_feedback', context=self.get_context(text="Hello"))
+                self.assertEqual(first=mocked_get_template.call_count, second=call_count)
+
+        def test_missing_html_template_uses_base_template(self):
+            templates = mail.get_mail_templates(template_name_prefix='email/contact_by_form/admin_feedback')
+            self.assertEqual(first=templates.html.template.name, second='email/base_body.html')
+
+        def test_render_mails(self):
+            rendered_mails = mail.render_mails(template_name_prefix='email/contact_by_form/admin_feedback', contexts=[self.get_context(text="Hello"), self.get_context(text="Goodbye")])
+            self.assertEqual(first=len(rendered_mails), second=2)
+            self.assertIn(member="Hello", container=rendered_mails[0].body_plain)
+            self.assertIn(member="Goodbye", container=rendered_mails[1].body_plain)
+            self.assertEqual(first=rendered_mails[0], second=mail.render_mail(template_name_prefix='email/contact_by_form/admin_feedback', context=self.get_context(text="Hello")))
+
+
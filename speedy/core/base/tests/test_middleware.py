@@ -1,9 +1,11 @@
 from django.conf import settings as django_settings
 
 if (django_settings.TESTS):
+    from django.contrib.sites.models import Site
+
     from speedy.core.base.test.models import SiteTestCase
 
-    from speedy.core.base.middleware import RemoveExtraSlashesMiddleware
+    from speedy.core.base.middleware import RemoveExtraSlashesMiddleware, HostRoutingTable, get_host_routing_table
 
 
     class RemoveExtraSlashesMiddlewareOnlyEnglishTestCase(SiteTestCase):
@@ -28,3 +30,28 @@ if (django_settings.TESTS):
             self.assertRedirects(response=r, expected_url='/about/', status_code=301, target_status_code=200)
 
 
+    class HostRoutingTableOnlyEnglishTestCase(SiteTestCase):
+        def test_get_route(self):
+            host_routing_table = get_host_routing_table()
+            for language_code in self.all_language_codes:
+                self.assertTupleEqual(tuple1=host_routing_table.get_route(domain="{language_code}.{domain}".format(language_code=language_code, domain=self.site.domain)), tuple2=(HostRoutingTable.ROUTE_LANGUAGE, language_code))
+            self.assertTupleEqual(tuple1=host_routing_table.get_route(domain="www.{domain}".format(domain=self.site.domain)), tuple2=(HostRoutingTable.ROUTE_WWW, self.site))
+            self.assertTupleEqual(tuple1=host_routing_table.get_route(domain="{domain}".format(domain=self.site.domain)), tuple2=(HostRoutingTable.ROUTE_REDIRECT_TO_WWW, self.site))
+            if (self.site.domain == self.site.domain.replace("-", "")):
+                self.assertTupleEqual(tuple1=host_routing_table.get_route(domain="e-n.{domain}".format(domain=self.site.domain)), tuple2=(HostRoutingTable.ROUTE_REDIRECT_WITHOUT_HYPHENS, None))
+            self.assertIs(expr1=get_host_routing_table(), expr2=host_routing_table)
+
+        def test_routing_table_is_cleared_when_site_is_saved(self):
+            host_routing_table = get_host_routing_table()
+            self.site.save()
+            self.assertIsNot(expr1=get_host_routing_table(), expr2=host_routing_table)
+
+        def test_www_redirects(self):
+            r = self.client.get(path='/', HTTP_HOST=self.site.domain)
+            self.assertRedirects(response=r, expected_url='//www.{domain}/'.format(domain=self.site.domain), status_code=301, fetch_redirect_response=False)
+            r = self.client.get(path='/', HTTP_HOST="www.{domain}".format(domain=self.site.domain))
+            self.assertEqual(first=r.status_code, second=200)
+            r = self.client.get(path='/about/', HTTP_HOST="www.{domain}".format(domain=self.site.domain))
+            self.assertRedirects(response=r, expected_url='//www.{domain}/'.format(domain=self.site.domain), status_code=301, fetch_redirect_response=False)
+
+
@@ -0,0 +1,42 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    from django.contrib.sites.models import Site
+
+    from speedy.core.base.test.models import SiteTestCase
+
+    from speedy.core.base.sites import site_registry
+
+
+    class SiteRegistryOnlyEnglishTestCase(SiteTestCase):
+        def test_get_sites(self):
+            self.assertListEqual(list1=[site.id for site in site_registry.get_sites()], list2=[site.id for site in Site.objects.all().order_by("pk")])
+            self.assertEqual(first=site_registry.get_current_site().id, second=self.site.id)
+            self.assertEqual(first=site_registry.get_domain(site_id=django_settings.SPEEDY_NET_SITE_ID), second=Site.objects.get(pk=django_settings.SPEEDY_NET_SITE_ID).domain)
+            self.assertEqual(first=site_registry.get_name(site_id=django_settings.SPEEDY_MATCH_SITE_ID), second=Site.objects.get(pk=django_settings.SPEEDY_MATCH_SITE_ID).name)
+            with self.assertRaises(Site.DoesNotExist):
+                site_registry.get_site(site_id=-1)
+
+        def test_sites_are_loaded_once(self):
+            site_registry.get_sites()
+            with self.assertNumQueries(num=0):
+                site_registry.get_current_site()
+                site_registry.get_domain(site_id=django_settings.SPEEDY_NET_SITE_ID)
+
+        def test_get_site_url(self):
+            self.assertEqual(first=site_registry.get_site_url(site_id=self.site.id, language_code='en'), second='https://en.{domain}'.format(domain=self.site.domain))
+            self.assertEqual(first=site_registry.get_site_main_url(site_id=self.site.id), second='https://www.{domain}'.format(domain=self.site.domain))
+
+        def test_sites_are_reloaded_when_site_is_saved(self):
+            sites = site_registry.get_sites()
+            Site.objects.get(pk=self.site.pk).save()
+            self.assertIsNot(expr1=site_registry.get_sites(), expr2=sites)
+
+        def test_sites_are_checked_if_version_check_time_is_not_set(self):
+            sites = site_registry.get_sites()
+            # As seen by a thread which reads the registry while another thread loads it.
+            site_registry._version_check_time = None
+            self.assertListEqual(list1=[site.id for site in site_registry.get_sites()], list2=[site.id for site in sites])
+            self.assertIsNotNone(obj=site_registry._version_check_time)
+
+
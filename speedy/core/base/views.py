@@ -1,8 +1,12 @@
 from django.contrib import messages
+from django.db.models import QuerySet
+from django.http import Http404
 from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
 from django.views import generic
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger, InvalidPage
+
+from .paginator import KeysetPaginator
 
 
 class StaticBaseView(generic.TemplateView):
@@ -91,3 +95,20 @@ class PaginationMixin(object):
         return cd
 
 
+class KeysetPaginationMixin(object):
+    """
+    Paginate a ListView with a KeysetPaginator, by the cursors in the "after" and "before" request parameters. Use with the keyset_pagination template tag.
+    """
+    keyset_fields = None
+
+    def paginate_queryset(self, queryset, page_size):
+        if (not (isinstance(queryset, QuerySet))):
+            return super().paginate_queryset(queryset=queryset, page_size=page_size)
+        paginator = KeysetPaginator(queryset=queryset, per_page=page_size, keyset_fields=self.keyset_fields)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'), number=self.request.GET.get('page', 1))
+        except InvalidPage:
+            raise Http404()
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
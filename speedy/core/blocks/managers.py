@@ -3,6 +3,7 @@ import logging
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings as django_settings
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 
 from speedy.core.accounts.cache_helper import bust_cache_by_keys, cache_key, get_keys_for_bust_cache
 from speedy.core.base import cache_manager
@@ -12,6 +13,21 @@ from speedy.core.accounts.models import Entity, User
 logger = logging.getLogger(__name__)
 
 
+class BlockNeighborhood(object):
+    """
+    The ids of the entities which an entity blocked, and of the entities which blocked it.
+    """
+    __slots__ = ('blocked_entities_ids', 'blocking_entities_ids', 'entities_ids')
+
+    def __init__(self, blocked_entities_ids, blocking_entities_ids):
+        self.blocked_entities_ids = frozenset(blocked_entities_ids)
+        self.blocking_entities_ids = frozenset(blocking_entities_ids)
+        self.entities_ids = self.blocked_entities_ids | self.blocking_entities_ids
+
+    def there_is_block(self, entity_pk):
+        return (entity_pk in self.entities_ids)
+
+
 class BlockManager(BaseManager):
     def _update_caches(self, blocker, blocked):
         """
@@ -20,10 +36,9 @@ class BlockManager(BaseManager):
         keys1 = get_keys_for_bust_cache(cache_type='blocked', entities_pks=[blocker.pk])
         keys2 = get_keys_for_bust_cache(cache_type='blocking', entities_pks=[blocked.pk])
         bust_cache_by_keys(cache_keys=keys1 + keys2)
-        if ('blocked_entities_ids' in blocker.__dict__):
-            del blocker.blocked_entities_ids
-        if ('blocking_entities_ids' in blocked.__dict__):
-            del blocked.blocking_entities_ids
+        for entity in {blocker, blocked}:
+            if ('block_neighborhood' in entity.__dict__):
+                del entity.block_neighborhood
 
     def block(self, blocker, blocked):
         if (blocker == blocked):
@@ -51,56 +66,54 @@ class BlockManager(BaseManager):
     def has_blocked(self, blocker, blocked):
         if ((not (isinstance(blocker, Entity))) or (not (isinstance(blocked, Entity)))):
             return False
-        if ('blocked_entities_ids' in blocker.__dict__):
-            return (blocked.pk in blocker.blocked_entities_ids)
-        if ('blocking_entities_ids' in blocked.__dict__):
-            return (blocker.pk in blocked.blocking_entities_ids)
-        return (blocked.pk in blocker.blocked_entities_ids)
+        # Use the block neighborhood which is already loaded, if any.
+        if (('block_neighborhood' in blocked.__dict__) and (not ('block_neighborhood' in blocker.__dict__))):
+            return (blocker.pk in blocked.block_neighborhood.blocking_entities_ids)
+        return (blocked.pk in blocker.block_neighborhood.blocked_entities_ids)
 
     def there_is_block(self, entity_1, entity_2):
-        return self.has_blocked(blocker=entity_1, blocked=entity_2) or self.has_blocked(blocker=entity_2, blocked=entity_1)
+        if ((not (isinstance(entity_1, Entity))) or (not (isinstance(entity_2, Entity)))):
+            return False
+        # Use the block neighborhood which is already loaded, if any.
+        if (('block_neighborhood' in entity_2.__dict__) and (not ('block_neighborhood' in entity_1.__dict__))):
+            return entity_2.block_neighborhood.there_is_block(entity_pk=entity_1.pk)
+        return entity_1.block_neighborhood.there_is_block(entity_pk=entity_2.pk)
 
-    def get_blocked_entities_ids(self, blocker):
-        blocked_key = cache_key(cache_type='blocked', entity_pk=blocker.pk)
-        try:
-            blocked_entities_ids = cache_manager.cache_get(key=blocked_key, sliding_timeout=django_settings.CACHE_GET_BLOCKED_ENTITIES_IDS_SLIDING_TIMEOUT)
-        except Exception as e:
-            logger.warning("BlockManager::get_blocked_entities_ids:cache_manager.cache_get raised an exception, blocker={blocker}, Exception={e}".format(
-                blocker=blocker,
-                e=str(e),
-            ))
-            blocked_entities_ids = None
-        if (blocked_entities_ids is None):
-            blocked_entities_ids = list(self.filter(blocker=blocker).values_list('blocked_id', flat=True))
-            try:
-                cache_manager.cache_set(key=blocked_key, value=blocked_entities_ids, timeout=django_settings.CACHE_SET_BLOCKED_ENTITIES_IDS_TIMEOUT)
-            except Exception as e:
-                logger.warning("BlockManager::get_blocked_entities_ids:cache_manager.cache_set raised an exception, blocker={blocker}, Exception={e}".format(
-                    blocker=blocker,
-                    e=str(e),
-                ))
-        return blocked_entities_ids
+    def get_block_neighborhood(self, entity):
+        """
+        Return the entities which entity blocked and the entities which blocked entity. Both are cached, and are loaded from the cache in one round-trip, or from the database in one query.
 
-    def get_blocking_entities_ids(self, blocked):
-        blocking_key = cache_key(cache_type='blocking', entity_pk=blocked.pk)
+        :type entity: speedy.core.accounts.models.Entity
+        :return: A BlockNeighborhood.
+        """
+        blocked_key = cache_key(cache_type='blocked', entity_pk=entity.pk)
+        blocking_key = cache_key(cache_type='blocking', entity_pk=entity.pk)
         try:
-            blocking_entities_ids = cache_manager.cache_get(key=blocking_key, sliding_timeout=django_settings.CACHE_GET_BLOCKING_ENTITIES_IDS_SLIDING_TIMEOUT)
+            cached_values = cache_manager.cache_get_many(keys=[blocked_key, blocking_key])
         except Exception as e:
-            logger.warning("BlockManager::get_blocking_entities_ids:cache_manager.cache_get raised an exception, blocked={blocked}, Exception={e}".format(
-                blocked=blocked,
+            logger.warning("BlockManager::get_block_neighborhood:cache_manager.cache_get_many raised an exception, entity={entity}, Exception={e}".format(
+                entity=entity,
                 e=str(e),
             ))
-            blocking_entities_ids = None
-        if (blocking_entities_ids is None):
-            blocking_entities_ids = list(self.filter(blocked=blocked).values_list('blocker_id', flat=True))
+            cached_values = {}
+        blocked_entities_ids = cached_values.get(blocked_key)
+        blocking_entities_ids = cached_values.get(blocking_key)
+        if ((blocked_entities_ids is None) or (blocking_entities_ids is None)):
+            blocked_entities_ids, blocking_entities_ids = [], []
+            for blocker_id, blocked_id in self.filter(Q(blocker=entity) | Q(blocked=entity)).values_list('blocker_id', 'blocked_id'):
+                if (blocker_id == entity.pk):
+                    blocked_entities_ids.append(blocked_id)
+                else:
+                    blocking_entities_ids.append(blocker_id)
             try:
+                cache_manager.cache_set(key=blocked_key, value=blocked_entities_ids, timeout=django_settings.CACHE_SET_BLOCKED_ENTITIES_IDS_TIMEOUT)
                 cache_manager.cache_set(key=blocking_key, value=blocking_entities_ids, timeout=django_settings.CACHE_SET_BLOCKING_ENTITIES_IDS_TIMEOUT)
             except Exception as e:
-                logger.warning("BlockManager::get_blocking_entities_ids:cache_manager.cache_set raised an exception, blocked={blocked}, Exception={e}".format(
-                    blocked=blocked,
+                logger.warning("BlockManager::get_block_neighborhood:cache_manager.cache_set raised an exception, entity={entity}, Exception={e}".format(
+                    entity=entity,
                     e=str(e),
                 ))
-        return blocking_entities_ids
+        return BlockNeighborhood(blocked_entities_ids=blocked_entities_ids, blocking_entities_ids=blocking_entities_ids)
 
     def get_blocked_list_to_queryset(self, blocker):
         from speedy.net.accounts.models import SiteProfile as SpeedyNetSiteProfile
@@ -9,6 +9,7 @@ if (django_settings.TESTS):
 
         from speedy.core.accounts.test.user_factories import ActiveUserFactory
 
+        from speedy.core.accounts.models import User
         from speedy.core.blocks.models import Block
 
 
@@ -48,6 +49,27 @@ if (django_settings.TESTS):
             def test_has_blocked_false(self):
                 self.assertIs(expr1=Block.objects.has_blocked(blocker=self.user, blocked=self.other_user), expr2=False)
 
+            def test_there_is_block(self):
+                Block.objects.block(blocker=self.other_user, blocked=self.user)
+                self.assertIs(expr1=Block.objects.there_is_block(entity_1=self.user, entity_2=self.other_user), expr2=True)
+                self.assertIs(expr1=Block.objects.there_is_block(entity_1=self.other_user, entity_2=self.user), expr2=True)
+                self.assertIs(expr1=Block.objects.there_is_block(entity_1=self.user, entity_2=ActiveUserFactory()), expr2=False)
+                Block.objects.unblock(blocker=self.other_user, blocked=self.user)
+                self.assertIs(expr1=Block.objects.there_is_block(entity_1=self.user, entity_2=self.other_user), expr2=False)
+
+            def test_block_neighborhood(self):
+                third_user = ActiveUserFactory()
+                Block.objects.block(blocker=self.user, blocked=self.other_user)
+                Block.objects.block(blocker=third_user, blocked=self.user)
+                user = User.objects.get(pk=self.user.pk)
+                self.assertSetEqual(set1=user.blocked_entities_ids, set2={self.other_user.pk})
+                self.assertSetEqual(set1=user.blocking_entities_ids, set2={third_user.pk})
+                # Both directions are cached, so the block neighborhood is loaded without queries.
+                user = User.objects.get(pk=self.user.pk)
+                with self.assertNumQueries(num=0):
+                    self.assertSetEqual(set1=user.block_neighborhood.entities_ids, set2={self.other_user.pk, third_user.pk})
+                    self.assertIs(expr1=Block.objects.there_is_block(entity_1=user, entity_2=third_user), expr2=True)
+
             def test_user_blocks_himself_raises_an_exception(self):
                 with self.assertRaises(ValidationError) as cm:
                     Block.objects.block(blocker=self.user, blocked=self.user)
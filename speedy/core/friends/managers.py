@@ -1,5 +1,5 @@
 from django.conf import settings as django_settings
-from friendship.models import Friend, FriendshipRequest, cache as friendship_cache, cache_key as friendship_cache_key
+from friendship.models import Friend, cache as friendship_cache, cache_key as friendship_cache_key
 
 from speedy.core.accounts.cache_helper import cache_key
 from speedy.core.base import cache_manager
@@ -27,6 +27,23 @@ class FriendManager:
 
         return friends_count
 
+    @classmethod
+    def are_friends_of_friends(cls, user, other_user):
+        """
+        Return whether user and other_user have a common friend.
+        Uses the cached ids of the friends of both users (see speedy.core.patches.friendship_patches), so there are no queries if they are cached.
+
+        :type user: speedy.core.accounts.models.User
+        :type other_user: speedy.core.accounts.models.User
+        :return: Whether user and other_user have a common friend.
+        """
+        friends_ids = Friend.objects.friends_ids(user=user)
+        other_user_friends_ids = Friend.objects.friends_ids(user=other_user)
+        if (len(friends_ids) > len(other_user_friends_ids)):
+            friends_ids, other_user_friends_ids = other_user_friends_ids, friends_ids
+        # Build a set of the shorter list, and look up the ids of the longer list in it.
+        return (not (set(friends_ids).isdisjoint(other_user_friends_ids)))
+
 
 class FriendshipRequestManager:
 
@@ -36,21 +53,19 @@ class FriendshipRequestManager:
         Return the number of received friendship requests in the current site.
         In Speedy Net, only active users.
         In Speedy Match, only active users who match the current user and is dependent on language.
-        Invalidate based on raw requests count.
+        Cache invalidated by signals in speedy.core.friends.models, when a friendship request is created, updated or deleted, and when the user or a user who sent them a friendship request is updated.
 
         :type user: speedy.core.accounts.models.User
         :return: The number of received friendship requests in the current site.
         """
         key = cache_key(cache_type='received_friendship_requests_count', entity_pk=user.pk)
         cached_value = cache_manager.cache_get(key=key, sliding_timeout=django_settings.CACHE_GET_RECEIVED_FRIENDSHIP_REQUESTS_COUNT_SLIDING_TIMEOUT)
-        raw_count = FriendshipRequest.objects.filter(to_user=user).count()
-        if ((cached_value is not None) and (cached_value['raw_count'] == raw_count)):
+        if (cached_value is not None):
             count = cached_value['count']
         else:
             count = len(user.get_received_friendship_requests())
             value = {
                 'count': count,
-                'raw_count': raw_count,
             }
             cache_manager.cache_set(key=key, value=value, timeout=django_settings.CACHE_SET_RECEIVED_FRIENDSHIP_REQUESTS_COUNT_TIMEOUT)
         return count
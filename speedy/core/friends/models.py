@@ -2,7 +2,17 @@ from django.db import models
 from django.dispatch import receiver
 from friendship.models import Friend, FriendshipRequest
 
-from speedy.core.accounts.cache_helper import bust_cache
+from speedy.core.accounts.cache_helper import bust_cache, bust_cache_by_keys, cache_key
+from speedy.core.accounts.models import User, SiteProfileBase
+
+
+def invalidate_received_friendship_requests_count_of_users_requested_by(user):
+    """
+    Invalidate the received friendship requests count of the users who received a friendship request from user, since it depends on whether user is active (and in Speedy Match, whether user matches them).
+    """
+    to_users_pks = list(FriendshipRequest.objects.filter(from_user=user).values_list('to_user_id', flat=True))
+    if (len(to_users_pks) > 0):
+        bust_cache_by_keys(cache_keys=[cache_key(cache_type='received_friendship_requests_count', entity_pk=to_user_pk) for to_user_pk in to_users_pks])
 
 
 @receiver(signal=models.signals.post_save, sender=Friend)
@@ -32,3 +42,16 @@ def invalidate_received_friendship_requests_count_after_friendship_request_delet
     bust_cache(cache_type='received_friendship_requests_count', entities_pks=[instance.from_user.pk, instance.to_user.pk])
 
 
+@receiver(signal=models.signals.post_save, sender=User)
+def invalidate_received_friendship_requests_count_after_update_user(sender, instance: User, **kwargs):
+    if (not (getattr(instance.profile, '_in_update_last_visit', None))):
+        invalidate_received_friendship_requests_count_of_users_requested_by(user=instance)
+
+
+@receiver(signal=models.signals.post_save)
+def invalidate_received_friendship_requests_count_after_update_site_profile(sender, instance, **kwargs):
+    if ((isinstance(instance, SiteProfileBase)) and (not (getattr(instance, '_in_update_last_visit', None)))):
+        bust_cache(cache_type='received_friendship_requests_count', entities_pks=[instance.user.pk])
+        invalidate_received_friendship_requests_count_of_users_requested_by(user=instance.user)
+
+
@@ -1,24 +1,30 @@
-from friendship.models import Friend, FriendshipRequest
 from rules import predicate, add_perm, is_authenticated
 from django.conf import settings as django_settings
 
 from speedy.core.accounts.base_rules import is_self
 from speedy.core.blocks.rules import there_is_block
+from speedy.core.profiles.relationships import get_relationship
+from .managers import FriendManager
 
 
 @predicate
 def friendship_request_sent(user, other_user):
-    return FriendshipRequest.objects.filter(from_user=user, to_user=other_user).exists()
+    return get_relationship(user=user, other_user=other_user).friendship_request_sent
 
 
 @predicate
 def friendship_request_received(user, other_user):
-    return FriendshipRequest.objects.filter(from_user=other_user, to_user=user).exists()
+    return get_relationship(user=user, other_user=other_user).friendship_request_received
 
 
 @predicate
 def are_friends(user, other_user):
-    return Friend.objects.are_friends(user1=user, user2=other_user)
+    return get_relationship(user=user, other_user=other_user).are_friends
+
+
+@predicate
+def are_friends_of_friends(user, other_user):
+    return FriendManager.are_friends_of_friends(user=user, other_user=other_user)
 
 
 @predicate
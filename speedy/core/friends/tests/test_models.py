@@ -4,7 +4,7 @@ if (django_settings.TESTS):
     if (django_settings.LOGIN_ENABLED):
         from time import sleep
 
-        from friendship.models import Friend, FriendshipRequest
+        from friendship.models import Friend, FriendshipRequest, cache as friendship_cache, cache_key as friendship_cache_key
 
         from speedy.core.base.test.models import SiteTestCase
         from speedy.core.base.test.decorators import only_on_sites_with_login
@@ -14,7 +14,7 @@ if (django_settings.TESTS):
         from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
         from speedy.core.accounts.models import User
         from speedy.core.blocks.models import Block
-        from speedy.core.friends.managers import FriendManager
+        from speedy.core.friends.managers import FriendManager, FriendshipRequestManager
 
 
         @only_on_sites_with_login
@@ -109,6 +109,75 @@ if (django_settings.TESTS):
                 self.assert_counters(user=self.user_2, received_friendship_requests=0, sent_friendship_requests=0, friends=0)
 
 
+        @only_on_sites_with_login
+        class FriendIdsCacheOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user = ActiveUserFactory()
+                self.friends = [ActiveUserFactory() for i in range(4)]
+                for friend in self.friends:
+                    Friend.objects.add_friend(from_user=self.user, to_user=friend).accept()
+                self.other_user = ActiveUserFactory()
+                Friend.objects.add_friend(from_user=self.other_user, to_user=self.user)
+
+            def test_only_ids_are_cached(self):
+                self.assertSetEqual(set1=set(Friend.objects.friends_ids(user=self.user)), set2={friend.pk for friend in self.friends})
+                with self.assertNumQueries(num=0):
+                    friends_ids = Friend.objects.friends_ids(user=self.user)
+                self.assertListEqual(list1=friends_ids, list2=friendship_cache.get(friendship_cache_key(type='friends_ids', user_pk=self.user.pk)))
+                self.assertEqual(first=len(Friend.objects.requests_ids(user=self.user)), second=1)
+                self.assertEqual(first=len(Friend.objects.sent_requests_ids(user=self.other_user)), second=1)
+
+            def test_friends_are_loaded_in_one_query(self):
+                friends_ids = Friend.objects.friends_ids(user=self.user)
+                with self.assertNumQueries(num=1):
+                    friends = Friend.objects.friends(user=self.user)
+                self.assertListEqual(list1=[friend.pk for friend in friends], list2=friends_ids)
+                with self.assertNumQueries(num=0):
+                    self.assertIs(expr1=Friend.objects.are_friends(user1=self.user, user2=self.friends[0]), expr2=True)
+
+            def test_are_friends(self):
+                self.assertIs(expr1=Friend.objects.are_friends(user1=self.user, user2=self.friends[0]), expr2=True)
+                self.assertIs(expr1=Friend.objects.are_friends(user1=self.friends[0], user2=self.user), expr2=True)
+                self.assertIs(expr1=Friend.objects.are_friends(user1=self.user, user2=self.other_user), expr2=False)
+                Friend.objects.remove_friend(from_user=self.user, to_user=self.friends[0])
+                self.assertIs(expr1=Friend.objects.are_friends(user1=self.user, user2=self.friends[0]), expr2=False)
+                self.assertEqual(first=len(Friend.objects.friends(user=self.user)), second=3)
+
+
+        @only_on_sites_with_login
+        class ReceivedFriendshipRequestsCountOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory()
+                self.user_2 = ActiveUserFactory()
+                self.user_3 = ActiveUserFactory()
+                Friend.objects.add_friend(from_user=self.user_2, to_user=self.user_1)
+                Friend.objects.add_friend(from_user=self.user_3, to_user=self.user_1)
+
+            def get_received_friendship_requests_count(self):
+                return FriendshipRequestManager.get_received_friendship_requests_count(user=User.objects.get(pk=self.user_1.pk))
+
+            def test_count_is_cached(self):
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=2)
+                user = User.objects.get(pk=self.user_1.pk)
+                with self.assertNumQueries(num=0):
+                    self.assertEqual(first=FriendshipRequestManager.get_received_friendship_requests_count(user=user), second=2)
+
+            def test_count_is_updated_when_request_is_created_or_deleted(self):
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=2)
+                Friend.objects.add_friend(from_user=ActiveUserFactory(), to_user=self.user_1)
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=3)
+                FriendshipRequest.objects.get(from_user=self.user_2, to_user=self.user_1).cancel()
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=2)
+
+            def test_count_is_updated_when_sender_is_deactivated(self):
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=2)
+                user_2 = User.objects.get(pk=self.user_2.pk)
+                user_2.profile.deactivate()
+                self.assertEqual(first=self.get_received_friendship_requests_count(), second=1)
+
+
         @only_on_sites_with_login
         class FriendListsOnlyEnglishTestCase(SiteTestCase):
             def set_up(self):
@@ -12,7 +12,7 @@ if (django_settings.TESTS):
 
         from speedy.core.blocks.models import Block
 
-        from speedy.core.friends.rules import friendship_request_sent, friendship_request_received, are_friends
+        from speedy.core.friends.rules import friendship_request_sent, friendship_request_received, are_friends, are_friends_of_friends
 
 
         @only_on_sites_with_login
@@ -125,4 +125,20 @@ if (django_settings.TESTS):
                 self.assertIs(expr1=are_friends(user=self.user, other_user=self.other_user), expr2=True)
                 self.assertIs(expr1=are_friends(user=self.other_user, other_user=self.user), expr2=True)
 
+            def test_are_friends_of_friends_false(self):
+                Friend.objects.add_friend(from_user=self.user, to_user=ActiveUserFactory()).accept()
+                Friend.objects.add_friend(from_user=self.other_user, to_user=ActiveUserFactory()).accept()
+                self.assertIs(expr1=are_friends_of_friends(user=self.user, other_user=self.other_user), expr2=False)
+                self.assertIs(expr1=are_friends_of_friends(user=self.other_user, other_user=self.user), expr2=False)
+
+            def test_are_friends_of_friends_true(self):
+                friend = ActiveUserFactory()
+                Friend.objects.add_friend(from_user=self.user, to_user=friend).accept()
+                Friend.objects.add_friend(from_user=friend, to_user=self.other_user).accept()
+                self.assertIs(expr1=are_friends_of_friends(user=self.user, other_user=self.other_user), expr2=True)
+                self.assertIs(expr1=are_friends_of_friends(user=self.other_user, other_user=self.user), expr2=True)
+                self.assertIs(expr1=are_friends(user=self.user, other_user=self.other_user), expr2=False)
+                Friend.objects.remove_friend(from_user=friend, to_user=self.other_user)
+                self.assertIs(expr1=are_friends_of_friends(user=self.user, other_user=self.other_user), expr2=False)
+
 
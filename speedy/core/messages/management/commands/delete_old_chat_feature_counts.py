@@ -0,0 +1,29 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from speedy.core.messages.models import ChatFeatureCount
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to delete the counts of chats with only one sender by feature, of hours which are too old to be used (see ChatFeatureCount). Should run periodically, for example once a day.
+
+    Methods:
+        handle(self, *args, **options): Main method to delete the old counts.
+    """
+
+    def handle(self, *args, **options):
+        """
+        Deletes the old counts, in all sites.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Arbitrary keyword arguments.
+        """
+        number_of_deleted_counts = ChatFeatureCount.objects.delete_old_counts()
+        logger.debug("delete_old_chat_feature_counts::number_of_deleted_counts={number_of_deleted_counts}".format(number_of_deleted_counts=number_of_deleted_counts))
+
+
@@ -0,0 +1,96 @@
+import logging
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from speedy.core.messages.models import Chat, Message, ReadMark, ChatFeatureCount
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to calculate the statistics of existing chats (the number of messages, the number of messages by sender, the first and last senders) and the counts of chats with only one sender by feature, from their messages. It also calculates the dates of the last messages, the text hashes of messages which don't have them, and which chats are unread by each participant.
+
+    New messages update the statistics of their chat when they are sent, and the statistics of chats which existed before were calculated by the migrations. This command is needed only to fix them.
+
+    Methods:
+        add_arguments(self, parser): Adds custom arguments to the command parser.
+        handle(self, *args, **options): Main method to update the statistics of the chats.
+    """
+
+    def add_arguments(self, parser):
+        """
+        Adds custom arguments to the command parser.
+
+        Args:
+            parser (argparse.ArgumentParser): The argument parser instance.
+        """
+        parser.add_argument("--batch-size", type=int, default=500, help="The number of chats in each batch. Default: 500.")
+
+    def handle(self, *args, **options):
+        """
+        Updates the statistics of all the chats, in all sites.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Arbitrary keyword arguments.
+        """
+        batch_size = max([options["batch_size"], 1])
+        chats_ids = list(Chat.all_sites_objects.order_by('pk').values_list('pk', flat=True))
+        for i in range(0, len(chats_ids), batch_size):
+            self.update_chats_statistics(chats_ids=chats_ids[i:i + batch_size])
+        number_of_deleted_counts = ChatFeatureCount.objects.delete_old_counts()
+        logger.debug("update_chats_statistics::number_of_chats={number_of_chats}, number_of_deleted_counts={number_of_deleted_counts}".format(number_of_chats=len(chats_ids), number_of_deleted_counts=number_of_deleted_counts))
+
+    def update_chats_statistics(self, chats_ids):
+        with transaction.atomic():
+            chats = list(Chat.all_sites_objects.filter(pk__in=chats_ids).select_for_update().order_by('pk'))
+            for chat in chats:
+                # Remove the chat from the features counts, it will be counted again below.
+                if (chat.only_one_sender):
+                    for feature, hour in chat.features_hours.items():
+                        ChatFeatureCount.objects.add(site_id=chat.site_id, entity_id=chat.first_sender_id, feature=feature, hour=hour, count=-1)
+                chat.number_of_messages, chat.number_of_messages_by_sender, chat.first_sender_id, chat.last_sender_id, chat.only_one_sender, chat.features_hours = 0, {}, None, None, False, {}
+            chats_dict = {chat.id: chat for chat in chats}
+            for chat in chats:
+                chat.last_message_date = chat.date_created
+            for message_id, chat_id, sender_id, text, text_hash, date_created in Message.objects.filter(chat_id__in=chats_ids).order_by('date_created', 'pk').values_list('pk', 'chat_id', 'sender_id', 'text', 'text_hash', 'date_created'):
+                if (not (text_hash == Message.get_text_hash(text=text))):
+                    Message.objects.filter(pk=message_id).update(text_hash=Message.get_text_hash(text=text))
+                chat = chats_dict[chat_id]
+                chat.last_message_date = date_created
+                message = Message(chat_id=chat_id, sender_id=sender_id, text=text, date_created=date_created)
+                only_one_sender_before = chat.only_one_sender
+                chat.update_statistics(message=message)
+                chat.update_features_counts(message=message, only_one_sender_before=only_one_sender_before)
+            for chat in chats:
+                # Update only the statistics, don't call save() which updates date_updated and invalidates caches.
+                Chat.all_sites_objects.filter(pk=chat.pk).update(
+                    number_of_messages=chat.number_of_messages,
+                    number_of_messages_by_sender=chat.number_of_messages_by_sender,
+                    first_sender_id=chat.first_sender_id,
+                    last_sender_id=chat.last_sender_id,
+                    only_one_sender=chat.only_one_sender,
+                    features_hours=chat.features_hours,
+                    last_message_date=chat.last_message_date,
+                )
+            for chat in chats:
+                self.update_read_marks(chat=chat)
+
+    def update_read_marks(self, chat):
+        if (chat.last_message_id is None):
+            return
+        last_message = Message.objects.get(pk=chat.last_message_id)
+        read_marks = {read_mark.entity_id: read_mark for read_mark in ReadMark.objects.filter(chat=chat)}
+        for entity in chat.participants:
+            if (entity is None):
+                continue
+            read_mark = read_marks.get(entity.id)
+            if (read_mark is None):
+                if (not (entity.id == last_message.sender_id)):
+                    ReadMark.objects.mark_unread(chat=chat, entities=[entity])
+            else:
+                ReadMark.objects.filter(pk=read_mark.pk).update(is_unread=(last_message.date_created > read_mark.date_updated))
+
+
@@ -1,21 +1,24 @@
-from collections import defaultdict
-
-from django.conf import settings as django_settings
 from django.contrib.sites.models import Site
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import Length
 
-from speedy.core.accounts.cache_helper import cache_key
-from speedy.core.base import cache_manager
 from speedy.core.base.managers import BaseManager
 
 
 class ChatManager(BaseManager):
     def get_queryset(self):
-        return super().get_queryset().filter(site=Site.objects.get_current()).prefetch_related('messages', 'messages__sender', 'messages__sender__user')
+        return super().get_queryset().filter(site=Site.objects.get_current())
 
     def chats(self, entity):
         return self.filter(Q(group__in=[entity]) | Q(ent1_id=entity.id) | Q(ent2_id=entity.id))
 
+    def chats_with_only_one_sender(self, entity):
+        """
+        Chats where entity sent messages, and no other participant did.
+        """
+        return self.chats(entity=entity).filter(only_one_sender=True, first_sender_id=entity.id)
+
     def chat_with(self, ent1, ent2, create=True):
         chats = self.filter(Q(ent1=ent1, ent2=ent2) | Q(ent1=ent2, ent2=ent1))
         if (len(chats) == 1):
@@ -33,66 +36,132 @@ class ChatManager(BaseManager):
         return chat
 
     def count_chats_with_string_in_messages_and_only_one_sender(self, entity, string_in_messages, created_after):
-        chats = self.chats(entity=entity).filter(messages__text__icontains=string_in_messages, messages__date_created__gte=created_after).distinct()
-        return len({chat.id for chat in chats if (chat.senders_ids == {entity.id})})
+        from .models import Message
+        chats_ids = Message.objects.filter(chat__in=self.chats_with_only_one_sender(entity=entity), text__icontains=string_in_messages, date_created__gte=created_after).values('chat_id')
+        return self.filter(id__in=chats_ids).count()
 
     def count_chats_with_strings_in_messages_and_only_one_sender(self, entity, strings_in_messages, created_after):
+        from .models import Message, ChatFeatureCount
+        if (set(strings_in_messages) <= set(Message.FEATURES)):
+            return ChatFeatureCount.objects.count_chats(entity=entity, features=strings_in_messages, created_after=created_after)
         return max([self.count_chats_with_string_in_messages_and_only_one_sender(entity=entity, string_in_messages=string_in_messages, created_after=created_after) for string_in_messages in strings_in_messages])
 
     def count_identical_messages_in_chats_with_only_one_sender(self, entity):
-        d = defaultdict(int)
-        chats = self.chats(entity=entity).distinct()
-        for chat in chats:
-            if (chat.senders_ids == {entity.id}):
-                for message in chat.messages.all():
-                    if (len(message.text) >= 25):
-                        d[message.text] += 1
-        l1 = sorted([(d[k], k) for k in d.keys()] + [(0, "")], reverse=True)
-        return l1[0]
+        from .models import Message
+        identical_messages = Message.objects.filter(
+            chat__in=self.chats_with_only_one_sender(entity=entity),
+            sender_id=entity.id,
+        ).exclude(
+            # Messages without a text hash are not identical to each other.
+            text_hash='',
+        ).annotate(text_length=Length('text')).filter(text_length__gte=25).values('text_hash').annotate(
+            messages_count=Count('id'),
+            sample_text=Min('text'),
+        ).order_by('-messages_count', '-sample_text').values_list('messages_count', 'sample_text')[:1]
+        return max([(0, "")] + list(identical_messages))
 
     def count_unread_chats(self, entity):
         from .models import ReadMark
-        unread_chats_count_cache_key = cache_key(cache_type='unread_chats_count', entity_pk=entity.pk)
-        unread_chats_count = cache_manager.cache_get(key=unread_chats_count_cache_key, sliding_timeout=django_settings.CACHE_GET_UNREAD_CHATS_COUNT_SLIDING_TIMEOUT)
-        if (unread_chats_count is None):
-            chat_list = self.chats(entity=entity)
-            ReadMark.objects.annotate_chats_with_read_marks(chat_list=chat_list, entity=entity)
-            unread_chats_count = len([c for c in chat_list if (c.is_unread)])
-            cache_manager.cache_set(key=unread_chats_count_cache_key, value=unread_chats_count, timeout=django_settings.CACHE_SET_UNREAD_CHATS_COUNT_TIMEOUT)
-        return unread_chats_count
+        return ReadMark.objects.filter(entity_id=entity.id, is_unread=True, chat__site=Site.objects.get_current()).count()
 
 
 class MessageManager(BaseManager):
+    def messages_with_identical_text(self, text):
+        """
+        All the messages with the same text as text, ignoring case and whitespace differences.
+        """
+        return self.filter(text_hash=self.model.get_text_hash(text=text))
+
     def send_message(self, from_entity, to_entity=None, chat=None, text=None):
-        from .models import Chat
+        from .models import Chat, ReadMark
         assert bool(from_entity and to_entity) != bool(from_entity and chat)
         assert text
-        if (not (chat)):
-            chat = Chat.objects.chat_with(ent1=from_entity, ent2=to_entity)
-        chat.last_message = self.create(chat=chat, sender=from_entity, text=text)
-        chat.date_updated = chat.last_message.date_created
-        chat.save()
+        with transaction.atomic():
+            if (not (chat)):
+                chat = Chat.objects.chat_with(ent1=from_entity, ent2=to_entity)
+            # Lock the chat, so that concurrent messages don't overwrite its statistics.
+            chat.refresh_statistics_from_db(lock=True)
+            chat.last_message = self.create(chat=chat, sender=from_entity, text=text)
+            chat.date_updated = chat.last_message.date_created
+            chat.last_message_date = chat.last_message.date_created
+            only_one_sender_before = chat.only_one_sender
+            chat.update_statistics(message=chat.last_message)
+            chat.update_features_counts(message=chat.last_message, only_one_sender_before=only_one_sender_before)
+            chat.save()
+            ReadMark.objects.mark_unread(chat=chat, entities=chat.get_other_participants(entity=from_entity))
+            transaction.on_commit(chat.set_version)
         chat.mark_read(entity=from_entity)
         return chat.last_message
 
 
+class ChatFeatureCountManager(BaseManager):
+    def add(self, site_id, entity_id, feature, hour, count):
+        if (hour < self.model.get_min_hour()):
+            # Counts of old hours are not used (and were deleted by delete_old_counts).
+            return
+        updated = self.filter(site_id=site_id, entity_id=entity_id, feature=feature, hour=hour).update(count=F('count') + count)
+        if (not (updated)):
+            chat_feature_count, created = self.get_or_create(site_id=site_id, entity_id=entity_id, feature=feature, hour=hour, defaults={'count': count})
+            if (not (created)):
+                self.filter(pk=chat_feature_count.pk).update(count=F('count') + count)
+
+    def count_chats(self, entity, features, created_after):
+        """
+        Count the chats with only one sender in which entity sent messages with each feature since created_after (rounded down to the hour).
+
+        Returns:
+            int: The maximal count of all the features.
+        """
+        counts = self.filter(
+            site=Site.objects.get_current(),
+            entity_id=entity.id,
+            feature__in=features,
+            hour__gte=self.model.get_hour(date=created_after),
+        ).values('feature').annotate(chats_count=Sum('count')).values_list('chats_count', flat=True)
+        return max([0] + list(counts))
+
+    def delete_old_counts(self):
+        """
+        Delete the counts of hours which are older than ChatFeatureCount.MAX_AGE_IN_HOURS, in all sites.
+
+        Returns:
+            int: The number of deleted counts.
+        """
+        deleted, deleted_per_model = self.filter(hour__lt=self.model.get_min_hour()).delete()
+        return deleted
+
+
 class ReadMarkManager(BaseManager):
     def annotate_chats_with_read_marks(self, chat_list, entity):
         read_marks = {read_mark.chat_id: read_mark for read_mark in self.filter(chat__in=chat_list, entity=entity)}
         for chat in chat_list:
             read_mark = read_marks.get(chat.id)
-            if (chat.last_message is None):
+            if (chat.last_message_id is None):
                 chat.is_unread = False
             elif (read_mark is None):
-                chat.is_unread = True
+                chat.is_unread = False
             else:
-                chat.is_unread = chat.last_message.date_created > read_mark.date_updated
+                chat.is_unread = read_mark.is_unread
         return ''
 
     def mark(self, chat, entity):
         read_mark, created = self.get_or_create(chat=chat, entity=entity)
         if (not (created)):
+            read_mark.is_unread = False
             read_mark.save()
         return read_mark
 
+    def mark_unread(self, chat, entities):
+        """
+        Mark the chat as unread by entities, after a new message.
+        """
+        for entity in entities:
+            if (not (self.filter(chat=chat, entity=entity).update(is_unread=True))):
+                read_mark, created = self.get_or_create(chat=chat, entity=entity, defaults={'is_unread': True})
+                if (created):
+                    # The entity never read the chat, all the messages are unread (see annotate_messages_with_read_marks).
+                    self.filter(pk=read_mark.pk).update(date_updated=chat.date_created)
+                else:
+                    self.filter(pk=read_mark.pk).update(is_unread=True)
+
 
@@ -0,0 +1,69 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def calculate_chats_statistics(apps, schema_editor):
+    """
+    Calculate the statistics of existing chats from their messages (see Chat.update_statistics).
+    """
+    Chat = apps.get_model('core_messages', 'Chat')
+    Message = apps.get_model('core_messages', 'Message')
+    db_alias = schema_editor.connection.alias
+    chats_ids = list(Chat.objects.using(db_alias).order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(chats_ids), BATCH_SIZE):
+        chats_dict = {chat.pk: chat for chat in Chat.objects.using(db_alias).filter(pk__in=chats_ids[i:i + BATCH_SIZE])}
+        for chat_id, sender_id in Message.objects.using(db_alias).filter(chat_id__in=chats_dict.keys()).order_by('date_created', 'pk').values_list('chat_id', 'sender_id'):
+            chat = chats_dict[chat_id]
+            chat.number_of_messages += 1
+            if (sender_id is not None):
+                chat.number_of_messages_by_sender[sender_id] = chat.number_of_messages_by_sender.get(sender_id, 0) + 1
+                if (chat.first_sender_id is None):
+                    chat.first_sender_id = sender_id
+                chat.last_sender_id = sender_id
+        for chat in chats_dict.values():
+            chat.only_one_sender = (len(chat.number_of_messages_by_sender) == 1)
+        Chat.objects.using(db_alias).bulk_update(objs=chats_dict.values(), fields=['number_of_messages', 'number_of_messages_by_sender', 'first_sender', 'last_sender', 'only_one_sender'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('core_messages', '0007_alter_readmark_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='number_of_messages',
+            field=models.PositiveIntegerField(default=0, verbose_name='number of messages'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='number_of_messages_by_sender',
+            field=models.JSONField(default=dict, verbose_name='number of messages by sender'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='first_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.entity', verbose_name='first sender'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.entity', verbose_name='last sender'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='only_one_sender',
+            field=models.BooleanField(default=False, verbose_name='only one sender'),
+        ),
+        migrations.RunPython(
+            code=calculate_chats_statistics,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.timezone import now
+
+BATCH_SIZE = 500
+
+# The same as Message.FEATURES and ChatFeatureCount.MAX_AGE_IN_HOURS.
+FEATURES = ("@", "http://", "https://", "discord")
+MAX_AGE_IN_HOURS = 7 * 24
+
+
+def get_hour(date):
+    return int(date.timestamp() // (60 * 60))
+
+
+def calculate_chats_features_counts(apps, schema_editor):
+    """
+    Calculate the hours of the features of existing chats with only one sender, and count them (see Chat.update_features_counts).
+    """
+    Chat = apps.get_model('core_messages', 'Chat')
+    Message = apps.get_model('core_messages', 'Message')
+    ChatFeatureCount = apps.get_model('core_messages', 'ChatFeatureCount')
+    db_alias = schema_editor.connection.alias
+    min_hour = get_hour(date=now()) - MAX_AGE_IN_HOURS
+    counts = {}
+    chats_ids = list(Chat.objects.using(db_alias).filter(only_one_sender=True).order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(chats_ids), BATCH_SIZE):
+        chats_dict = {chat.pk: chat for chat in Chat.objects.using(db_alias).filter(pk__in=chats_ids[i:i + BATCH_SIZE])}
+        for chat_id, text, date_created in Message.objects.using(db_alias).filter(chat_id__in=chats_dict.keys(), sender__isnull=False).order_by('date_created', 'pk').values_list('chat_id', 'text', 'date_created'):
+            text = text.lower()
+            for feature in FEATURES:
+                if (feature in text):
+                    chats_dict[chat_id].features_hours[feature] = get_hour(date=date_created)
+        for chat in chats_dict.values():
+            for feature, hour in chat.features_hours.items():
+                # Counts of old hours are not used.
+                if (hour >= min_hour):
+                    key = (chat.site_id, chat.first_sender_id, feature, hour)
+                    counts[key] = counts.get(key, 0) + 1
+        Chat.objects.using(db_alias).bulk_update(objs=chats_dict.values(), fields=['features_hours'])
+    ChatFeatureCount.objects.using(db_alias).bulk_create(objs=[ChatFeatureCount(site_id=site_id, entity_id=entity_id, feature=feature, hour=hour, count=count) for ((site_id, entity_id, feature, hour), count) in counts.items()], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('sites', '0002_alter_domain_unique'),
+        ('core_messages', '0008_chat_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='features_hours',
+            field=models.JSONField(default=dict, verbose_name='features hours'),
+        ),
+        migrations.CreateModel(
+            name='ChatFeatureCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('feature', models.CharField(max_length=50, verbose_name='feature')),
+                ('hour', models.PositiveIntegerField(verbose_name='hour')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.entity', verbose_name='entity')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sites.site', verbose_name='site')),
+            ],
+            options={
+                'verbose_name': 'chat feature count',
+                'verbose_name_plural': 'chat feature counts',
+                'unique_together': {('site', 'entity', 'feature', 'hour')},
+            },
+        ),
+        migrations.RunPython(
+            code=calculate_chats_features_counts,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
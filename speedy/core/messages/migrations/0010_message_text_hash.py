@@ -0,0 +1,49 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def get_text_hash(text):
+    # The same as Message.get_text_hash.
+    normalized_text = " ".join(text.split()).casefold()
+    return hashlib.sha1(normalized_text.encode('utf-8')).hexdigest()
+
+
+def calculate_messages_text_hashes(apps, schema_editor):
+    """
+    Calculate the text hashes of existing messages.
+    """
+    Message = apps.get_model('core_messages', 'Message')
+    db_alias = schema_editor.connection.alias
+    while True:
+        messages = [Message(pk=message_id, text_hash=get_text_hash(text=text)) for message_id, text in Message.objects.using(db_alias).filter(text_hash='').order_by('pk').values_list('pk', 'text')[:BATCH_SIZE]]
+        if (len(messages) == 0):
+            break
+        Message.objects.using(db_alias).bulk_update(objs=messages, fields=['text_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_messages', '0009_chatfeaturecount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='text_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=40, verbose_name='text hash'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'text_hash'], name='core_messag_sender__text_hash'),
+        ),
+        migrations.RunPython(
+            code=calculate_messages_text_hashes,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+BATCH_SIZE = 500
+
+
+def calculate_read_marks_unread(apps, schema_editor):
+    """
+    Mark the chats which have messages that were not read yet as unread, like before is_unread was added - if the last message was sent after the read mark was updated, or if the participant has no read mark.
+    """
+    Chat = apps.get_model('core_messages', 'Chat')
+    ReadMark = apps.get_model('core_messages', 'ReadMark')
+    db_alias = schema_editor.connection.alias
+    ReadMark.objects.using(db_alias).filter(chat__last_message__date_created__gt=F('date_updated')).update(is_unread=True)
+    chats = list(Chat.objects.using(db_alias).filter(last_message__isnull=False).order_by('pk').values_list('pk', 'is_group', 'ent1_id', 'ent2_id'))
+    for i in range(0, len(chats), BATCH_SIZE):
+        participants_ids = {chat_id: {ent1_id, ent2_id} for (chat_id, is_group, ent1_id, ent2_id) in chats[i:i + BATCH_SIZE] if (not (is_group))}
+        groups_chats_ids = [chat_id for (chat_id, is_group, ent1_id, ent2_id) in chats[i:i + BATCH_SIZE] if (is_group)]
+        for chat_id, entity_id in Chat.group.through.objects.using(db_alias).filter(chat_id__in=groups_chats_ids).values_list('chat_id', 'entity_id'):
+            participants_ids.setdefault(chat_id, set()).add(entity_id)
+        for chat_id, entity_id in ReadMark.objects.using(db_alias).filter(chat_id__in=participants_ids.keys()).values_list('chat_id', 'entity_id'):
+            participants_ids[chat_id].discard(entity_id)
+        read_marks = ReadMark.objects.using(db_alias).bulk_create(objs=[ReadMark(chat_id=chat_id, entity_id=entity_id, is_unread=True) for chat_id, entities_ids in participants_ids.items() for entity_id in entities_ids if (entity_id is not None)])
+        # The entity never read the chat, all the messages are unread (see ReadMarkManager.mark_unread).
+        ReadMark.objects.using(db_alias).filter(pk__in=[read_mark.pk for read_mark in read_marks]).update(date_updated=Subquery(Chat.objects.using(db_alias).filter(pk=OuterRef('chat_id')).values('date_created')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_messages', '0010_message_text_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readmark',
+            name='is_unread',
+            field=models.BooleanField(default=False, verbose_name='is unread'),
+        ),
+        migrations.AddIndex(
+            model_name='readmark',
+            index=models.Index(fields=['entity', 'is_unread'], name='core_messag_entity_is_unread'),
+        ),
+        migrations.RunPython(
+            code=calculate_read_marks_unread,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
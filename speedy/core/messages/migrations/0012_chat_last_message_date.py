@@ -0,0 +1,43 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def calculate_chats_last_message_date(apps, schema_editor):
+    """
+    Set the last message date of existing chats to the date of their last message, or to the date they were created if they have no messages.
+    """
+    Chat = apps.get_model('core_messages', 'Chat')
+    Message = apps.get_model('core_messages', 'Message')
+    db_alias = schema_editor.connection.alias
+    Chat.objects.using(db_alias).update(last_message_date=Coalesce(Subquery(Message.objects.using(db_alias).filter(pk=OuterRef('last_message_id')).values('date_created')[:1]), F('date_created')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_messages', '0011_readmark_is_unread'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chat',
+            options={'ordering': ('-last_message_date', '-id'), 'verbose_name': 'chat', 'verbose_name_plural': 'chats'},
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='last message date'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'date_created', 'id'], name='core_messag_chat_date_id'),
+        ),
+        migrations.RunPython(
+            code=calculate_chats_last_message_date,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
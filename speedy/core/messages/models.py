@@ -1,15 +1,19 @@
+import hashlib
+
+from django.conf import settings as django_settings
 from django.contrib.sites.models import Site
 from django.db import models
 from django.dispatch import receiver
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MaxLengthValidator
 
+from speedy.core.base import cache_manager
 from speedy.core.base.managers import BaseManager
 from speedy.core.base.models import TimeStampedModel
 from speedy.core.base.fields import RegularUDIDField
-from speedy.core.accounts.cache_helper import bust_cache
 from speedy.core.accounts.models import Entity, User
-from .managers import ChatManager, MessageManager, ReadMarkManager
+from .managers import ChatManager, MessageManager, ReadMarkManager, ChatFeatureCountManager
 
 
 class Chat(TimeStampedModel):
@@ -24,6 +28,13 @@ class Chat(TimeStampedModel):
         group (ManyToManyField): The participants in a group chat.
         is_group (BooleanField): Indicates if the chat is a group chat.
         last_message (ForeignKey): The last message in the chat.
+        last_message_date (DateTimeField): The date of the last message in the chat, or the date the chat was created if it has no messages.
+        number_of_messages (PositiveIntegerField): The number of messages in the chat.
+        number_of_messages_by_sender (JSONField): The number of messages in the chat, by the id of the sender.
+        first_sender (ForeignKey): The sender of the first message in the chat.
+        last_sender (ForeignKey): The sender of the last message in the chat.
+        only_one_sender (BooleanField): Indicates if all the messages in the chat were sent by one sender.
+        features_hours (JSONField): The hour of the last message with each feature, while the chat has only one sender.
     """
     id = RegularUDIDField()
     site = models.ForeignKey(to=Site, verbose_name=_('site'), on_delete=models.PROTECT)
@@ -32,6 +43,13 @@ class Chat(TimeStampedModel):
     group = models.ManyToManyField(to=Entity, verbose_name=_('participants'))
     is_group = models.BooleanField(verbose_name=_('is group chat'), default=False)
     last_message = models.ForeignKey(to='Message', verbose_name=_('last message'), on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    last_message_date = models.DateTimeField(verbose_name=_('last message date'), default=now, db_index=True)
+    number_of_messages = models.PositiveIntegerField(verbose_name=_('number of messages'), default=0)
+    number_of_messages_by_sender = models.JSONField(verbose_name=_('number of messages by sender'), default=dict)
+    first_sender = models.ForeignKey(to=Entity, verbose_name=_('first sender'), on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    last_sender = models.ForeignKey(to=Entity, verbose_name=_('last sender'), on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    only_one_sender = models.BooleanField(verbose_name=_('only one sender'), default=False)
+    features_hours = models.JSONField(verbose_name=_('features hours'), default=dict)
 
     objects = ChatManager()
     all_sites_objects = BaseManager()
@@ -49,7 +67,10 @@ class Chat(TimeStampedModel):
 
     @property
     def participants_count(self):
-        return len(self.participants)
+        if (self.is_private):
+            return 2
+        else:
+            return self.group.count()
 
     @property
     def messages_queryset(self):
@@ -57,16 +78,16 @@ class Chat(TimeStampedModel):
 
     @property
     def messages_count(self):
-        return len(self.messages_queryset)
+        return self.number_of_messages
 
     @property
     def senders_ids(self):
-        return {message.sender.id for message in self.messages_queryset if (message.sender)}
+        return set(self.number_of_messages_by_sender.keys())
 
     class Meta:
         verbose_name = _('chat')
         verbose_name_plural = _('chats')
-        ordering = ('-last_message__date_created', '-date_updated')
+        ordering = ('-last_message_date', '-id')
 
     def __str__(self):
         participants = ', '.join(str(ent.user.name) if ent else str(_("Unknown")) for ent in self.participants)
@@ -128,6 +149,104 @@ class Chat(TimeStampedModel):
         assert (entity.id in [p.id for p in self.participants])
         return [p for p in self.participants if (not (p.id == entity.id))]
 
+    @staticmethod
+    def get_version_cache_key(chat_id):
+        return 'speedy-core-messages-chat-version-{chat_id}'.format(chat_id=chat_id)
+
+    @classmethod
+    def get_version(cls, chat_id):
+        """
+        Return the cached version of the chat (see set_version), or None.
+        """
+        return cache_manager.cache_get(key=cls.get_version_cache_key(chat_id=chat_id))
+
+    def set_version(self):
+        """
+        Cache the time of the last message in the chat and the ids of the participants, so that polling for new messages doesn't query the database if there are no new messages.
+
+        The time of the last message is read from the database, since this instance may be older than the last message (set_version is called on commit, and transactions may be committed in a different order). A cached version with a later last message is not replaced.
+        """
+        values = self.__class__.all_sites_objects.filter(pk=self.pk).values('last_message_id', 'last_message_date').first()
+        if (values is None):
+            return
+        if (values['last_message_id'] is not None):
+            last_message_timestamp = values['last_message_date'].timestamp()
+        else:
+            last_message_timestamp = 0
+        chat_version = self.get_version(chat_id=self.id)
+        if ((chat_version is not None) and (chat_version['last_message_timestamp'] > last_message_timestamp)):
+            return
+        if (self.is_private):
+            participants_ids = [self.ent1_id, self.ent2_id]
+        else:
+            participants_ids = list(self.group.values_list('id', flat=True))
+        cache_manager.cache_set(
+            key=self.get_version_cache_key(chat_id=self.id),
+            value={'last_message_timestamp': last_message_timestamp, 'participants_ids': participants_ids},
+            timeout=django_settings.CACHE_SET_CHAT_VERSION_TIMEOUT,
+        )
+
+    def refresh_statistics_from_db(self, lock=False):
+        """
+        Reload the statistics of the chat from the database.
+
+        Args:
+            lock (bool): If True, lock the chat until the end of the transaction.
+        """
+        if (self._state.adding):
+            return
+        queryset = self.__class__.all_sites_objects.filter(pk=self.pk)
+        if (lock):
+            queryset = queryset.select_for_update()
+        values = queryset.values('number_of_messages', 'number_of_messages_by_sender', 'first_sender_id', 'last_sender_id', 'only_one_sender', 'features_hours').get()
+        for field_name, value in values.items():
+            setattr(self, field_name, value)
+
+    def update_statistics(self, message):
+        """
+        Update the statistics of the chat after a new message.
+
+        Args:
+            message (Message): The new message.
+        """
+        self.number_of_messages += 1
+        if (message.sender_id is not None):
+            number_of_messages_by_sender = dict(self.number_of_messages_by_sender)
+            number_of_messages_by_sender[message.sender_id] = number_of_messages_by_sender.get(message.sender_id, 0) + 1
+            self.number_of_messages_by_sender = number_of_messages_by_sender
+            if (self.first_sender_id is None):
+                self.first_sender_id = message.sender_id
+            self.last_sender_id = message.sender_id
+        self.only_one_sender = (len(self.number_of_messages_by_sender) == 1)
+
+    def update_features_counts(self, message, only_one_sender_before):
+        """
+        Update the counts of chats with only one sender, by feature, after a new message (see ChatFeatureCount).
+
+        Call after update_statistics(), with the chat locked.
+
+        Args:
+            message (Message): The new message.
+            only_one_sender_before (bool): The value of only_one_sender before the new message.
+        """
+        if (message.sender_id is None):
+            return
+        if (self.only_one_sender):
+            hour = ChatFeatureCount.get_hour(date=message.date_created)
+            features_hours = dict(self.features_hours)
+            for feature in message.get_features():
+                if (not (features_hours.get(feature) == hour)):
+                    if (feature in features_hours):
+                        ChatFeatureCount.objects.add(site_id=self.site_id, entity_id=self.first_sender_id, feature=feature, hour=features_hours[feature], count=-1)
+                    ChatFeatureCount.objects.add(site_id=self.site_id, entity_id=self.first_sender_id, feature=feature, hour=hour, count=1)
+                    features_hours[feature] = hour
+            self.features_hours = features_hours
+        elif (only_one_sender_before):
+            # Someone replied, the chat is not counted anymore.
+            for feature, hour in self.features_hours.items():
+                ChatFeatureCount.objects.add(site_id=self.site_id, entity_id=self.first_sender_id, feature=feature, hour=hour, count=-1)
+            self.features_hours = {}
+
     def mark_read(self, entity):
         """
         Mark the chat as read for the given entity.
@@ -150,11 +269,15 @@ class Message(TimeStampedModel):
         chat (ForeignKey): The chat the message belongs to.
         sender (ForeignKey): The sender of the message.
         text (TextField): The content of the message.
+        text_hash (CharField): A hash of the normalized text, identical messages have the same hash (see get_text_hash).
     """
+    FEATURES = ("@", "http://", "https://", "discord")
+
     id = RegularUDIDField()
     chat = models.ForeignKey(to=Chat, verbose_name=_('chat'), on_delete=models.PROTECT, blank=True, null=True, related_name='messages')
     sender = models.ForeignKey(to=Entity, verbose_name=_('sender'), on_delete=models.PROTECT, blank=True, null=True)
     text = models.TextField(verbose_name=_('message'), max_length=50000, validators=[MaxLengthValidator(limit_value=50000)])
+    text_hash = models.CharField(verbose_name=_('text hash'), max_length=40, blank=True, db_index=True)
 
     objects = MessageManager()
 
@@ -163,6 +286,10 @@ class Message(TimeStampedModel):
         verbose_name_plural = _('messages')
         ordering = ('-date_created',)
         get_latest_by = 'date_created'
+        indexes = [
+            models.Index(fields=['sender', 'text_hash'], name='core_messag_sender__text_hash'),
+            models.Index(fields=['chat', 'date_created', 'id'], name='core_messag_chat_date_id'),
+        ]
 
     def __str__(self):
         """
@@ -173,6 +300,34 @@ class Message(TimeStampedModel):
         """
         return '{}: {}'.format(self.sender.user if self.sender else str(_("Unknown")), self.text[:140])
 
+    def get_features(self):
+        """
+        Return the features (case-insensitive strings, from FEATURES) found in the text of the message.
+
+        Returns:
+            list: The features found in the text.
+        """
+        text = self.text.lower()
+        return [feature for feature in self.FEATURES if (feature in text)]
+
+    def save(self, *args, **kwargs):
+        self.text_hash = self.get_text_hash(text=self.text)
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_text_hash(text):
+        """
+        Return a hash of the text, ignoring case and whitespace differences.
+
+        Args:
+            text (str): The text of a message.
+
+        Returns:
+            str: The hash.
+        """
+        normalized_text = " ".join(text.split()).casefold()
+        return hashlib.sha1(normalized_text.encode('utf-8')).hexdigest()
+
 
 class ReadMark(TimeStampedModel):
     """
@@ -181,9 +336,11 @@ class ReadMark(TimeStampedModel):
     Attributes:
         entity (ForeignKey): The entity that read the chat.
         chat (ForeignKey): The chat that was read.
+        is_unread (BooleanField): Indicates if there are new messages in the chat, which the entity didn't read yet.
     """
     entity = models.ForeignKey(to=Entity, verbose_name=_('entity'), on_delete=models.CASCADE, related_name='+')
     chat = models.ForeignKey(to=Chat, verbose_name=_('chat'), on_delete=models.CASCADE, related_name='+')
+    is_unread = models.BooleanField(verbose_name=_('is unread'), default=False)
 
     objects = ReadMarkManager()
 
@@ -193,40 +350,58 @@ class ReadMark(TimeStampedModel):
         unique_together = ('entity', 'chat')
         ordering = ('-date_created',)
         get_latest_by = 'date_created'
+        indexes = [
+            models.Index(fields=['entity', 'is_unread'], name='core_messag_entity_is_unread'),
+        ]
 
 
-@receiver(signal=models.signals.post_save, sender=Chat)
-def invalidate_unread_chats_count_after_update_chat(sender, instance: Chat, **kwargs):
+class ChatFeatureCount(TimeStampedModel):
     """
-    Signal receiver that invalidates the unread chats count cache after a chat is updated.
+    Counts the chats with only one sender in which the entity sent messages with a feature (see Message.FEATURES), by the hour of the last message with the feature in each chat.
 
-    Args:
-        sender (type): The model class that sent the signal.
-        instance (Chat): The instance of the Chat model.
-        **kwargs: Additional keyword arguments.
-    """
-    if (instance.last_message is not None):
-        other_participants = instance.get_other_participants(entity=instance.last_message.sender)
-        bust_cache(cache_type='unread_chats_count', entities_pks=[p.pk for p in other_participants])
+    The counts are updated when messages are sent, so the number of such chats in the last days is a sum of a few counts, without searching the messages. A chat is not counted anymore when another participant replies.
 
+    Counts older than MAX_AGE_IN_HOURS are never used, and are deleted periodically by the delete_old_chat_feature_counts command.
 
-@receiver(signal=models.signals.post_save, sender=ReadMark)
-def invalidate_unread_chats_count_after_read_mark(sender, instance: ReadMark, **kwargs):
+    Attributes:
+        site (ForeignKey): The site of the chats.
+        entity (ForeignKey): The sender of the messages.
+        feature (CharField): The feature.
+        hour (PositiveIntegerField): The number of hours since the epoch.
+        count (IntegerField): The number of chats.
     """
-    Signal receiver that invalidates the unread chats count cache after a read mark is created.
+    # The largest period of time in which chats are counted (see speedy.core.messages.rules).
+    MAX_AGE_IN_HOURS = 7 * 24
 
-    Args:
-        sender (type): The model class that sent the signal.
-        instance (ReadMark): The instance of the ReadMark model.
-        **kwargs: Additional keyword arguments.
-    """
-    bust_cache(cache_type='unread_chats_count', entities_pks=[instance.entity.pk])
+    site = models.ForeignKey(to=Site, verbose_name=_('site'), on_delete=models.CASCADE, related_name='+')
+    entity = models.ForeignKey(to=Entity, verbose_name=_('entity'), on_delete=models.CASCADE, related_name='+')
+    feature = models.CharField(verbose_name=_('feature'), max_length=50)
+    hour = models.PositiveIntegerField(verbose_name=_('hour'))
+    count = models.IntegerField(verbose_name=_('count'), default=0)
+
+    objects = ChatFeatureCountManager()
+
+    class Meta:
+        verbose_name = _('chat feature count')
+        verbose_name_plural = _('chat feature counts')
+        unique_together = ('site', 'entity', 'feature', 'hour')
+
+    @staticmethod
+    def get_hour(date):
+        return int(date.timestamp() // (60 * 60))
+
+    @classmethod
+    def get_min_hour(cls):
+        """
+        Return the oldest hour which is still used.
+        """
+        return cls.get_hour(date=now()) - cls.MAX_AGE_IN_HOURS
 
 
 @receiver(signal=models.signals.post_save, sender=Message)
 def mail_user_on_new_message(sender, instance: Message, created, **kwargs):
     """
-    Signal receiver that sends an email to users when a new message is created.
+    Signal receiver that queues an email to users when a new message is created. New messages in the same chat are combined into one email.
 
     Args:
         sender (type): The model class that sent the signal.
@@ -238,8 +413,8 @@ def mail_user_on_new_message(sender, instance: Message, created, **kwargs):
         other_participants = instance.chat.get_other_participants(entity=instance.sender)
         for entity in other_participants:
             if ((entity.user.is_active) and (entity.user.notify_on_message == User.NOTIFICATIONS_ON)):
-                entity.user.mail_user(template_name_prefix='email/messages/new_message', context={
+                entity.user.queue_mail(template_name_prefix='email/messages/new_message', context={
                     'message': instance,
-                })
+                }, coalesce_key='chat-{}'.format(instance.chat_id))
 
 
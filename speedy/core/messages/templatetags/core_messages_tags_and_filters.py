@@ -32,8 +32,8 @@ def annotate_messages_with_read_marks(message_list, entity):
     :type message_list: [speedy.core.messages.models.Message]
     :type entity: speedy.core.accounts.models.Entity
     """
-    chats = set(message.chat for message in message_list)
-    read_marks = {read_mark.chat_id: read_mark for read_mark in ReadMark.objects.filter(chat__in=chats, entity=entity)}
+    chats_ids = set(message.chat_id for message in message_list)
+    read_marks = {read_mark.chat_id: read_mark for read_mark in ReadMark.objects.filter(chat_id__in=chats_ids, entity=entity)}
     for message in message_list:
         read_mark = read_marks.get(message.chat_id)
         if (read_mark is None):
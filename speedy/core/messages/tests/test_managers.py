@@ -2,15 +2,19 @@ from django.conf import settings as django_settings
 
 if (django_settings.TESTS):
     if (django_settings.LOGIN_ENABLED):
+        from datetime import timedelta
         from time import sleep
 
+        from django.core.management import call_command
+        from django.utils.timezone import now
+
         from speedy.core.base.test.models import SiteTestCase
         from speedy.core.base.test.decorators import only_on_sites_with_login
 
         from speedy.core.accounts.test.user_factories import ActiveUserFactory
         from speedy.core.messages.test.factories import ChatFactory
 
-        from speedy.core.messages.models import Chat, Message, ReadMark
+        from speedy.core.messages.models import Chat, Message, ReadMark, ChatFeatureCount
 
 
         @only_on_sites_with_login
@@ -74,6 +78,54 @@ if (django_settings.TESTS):
                 self.assertEqual(first=read_mark.chat, second=chat)
                 self.assertEqual(first=read_mark.entity.id, second=self.user_2.id)
 
+            def test_chats_dont_load_messages(self):
+                for i in range(3):
+                    Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='Hello {}'.format(i))
+                chats = list(Chat.objects.chats(entity=self.user_1))
+                for chat in chats:
+                    self.assertNotIn(member='messages', container=getattr(chat, '_prefetched_objects_cache', {}))
+                chat = Chat.objects.get(pk=self.chat_1_2.pk)
+                self.assertEqual(first=chat.messages_count, second=3)
+                self.assertSetEqual(set1=chat.senders_ids, set2={self.user_1.id})
+
+            def test_statistics(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='Hello')
+                Message.objects.send_message(from_entity=self.user_2, chat=self.chat_1_2, text='Hello')
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='Hello')
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2_3, text='Hello')
+                chats = {chat.id: chat for chat in Chat.objects.chats(entity=self.user_1)}
+                with self.assertNumQueries(num=0):
+                    self.assertEqual(first=chats[self.chat_1_2.id].messages_count, second=3)
+                    self.assertSetEqual(set1=chats[self.chat_1_2.id].senders_ids, set2={self.user_1.id, self.user_2.id})
+                    self.assertDictEqual(d1=chats[self.chat_1_2.id].number_of_messages_by_sender, d2={self.user_1.id: 2, self.user_2.id: 1})
+                    self.assertEqual(first=chats[self.chat_1_2.id].first_sender_id, second=self.user_1.id)
+                    self.assertEqual(first=chats[self.chat_1_2.id].last_sender_id, second=self.user_1.id)
+                    self.assertIs(expr1=chats[self.chat_1_2.id].only_one_sender, expr2=False)
+                    self.assertEqual(first=chats[self.chat_1_2_3.id].messages_count, second=1)
+                    self.assertSetEqual(set1=chats[self.chat_1_2_3.id].senders_ids, set2={self.user_1.id})
+                    self.assertIs(expr1=chats[self.chat_1_2_3.id].only_one_sender, expr2=True)
+                self.assertEqual(first=Chat.objects.chats_with_only_one_sender(entity=self.user_1).count(), second=1)
+                self.assertEqual(first=Chat.objects.chats_with_only_one_sender(entity=self.user_2).count(), second=0)
+
+            def test_sending_message_with_stale_chat_doesnt_overwrite_statistics(self):
+                chat = Chat.objects.get(pk=self.chat_1_2.pk)
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='Hello')
+                Message.objects.send_message(from_entity=self.user_2, chat=chat, text='Hello')
+                chat = Chat.objects.get(pk=self.chat_1_2.pk)
+                self.assertEqual(first=chat.messages_count, second=2)
+                self.assertDictEqual(d1=chat.number_of_messages_by_sender, d2={self.user_1.id: 1, self.user_2.id: 1})
+
+            def test_update_chats_statistics_command(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='Hello')
+                Message.objects.send_message(from_entity=self.user_2, chat=self.chat_1_2, text='Hello')
+                Chat.objects.filter(pk=self.chat_1_2.pk).update(number_of_messages=0, number_of_messages_by_sender={}, first_sender=None, last_sender=None, only_one_sender=False)
+                call_command('update_chats_statistics')
+                chat = Chat.objects.get(pk=self.chat_1_2.pk)
+                self.assertEqual(first=chat.messages_count, second=2)
+                self.assertDictEqual(d1=chat.number_of_messages_by_sender, d2={self.user_1.id: 1, self.user_2.id: 1})
+                self.assertEqual(first=chat.first_sender_id, second=self.user_1.id)
+                self.assertEqual(first=chat.last_sender_id, second=self.user_2.id)
+
 
         @only_on_sites_with_login
         class MessageManagerOnlyEnglishTestCase(SiteTestCase):
@@ -114,6 +166,88 @@ if (django_settings.TESTS):
                 self.assertEqual(first=read_mark.chat, second=chat)
                 self.assertEqual(first=read_mark.entity_id, second=user_1.id)
 
+            def test_text_hash(self):
+                user_1 = ActiveUserFactory()
+                user_2 = ActiveUserFactory()
+                user_3 = ActiveUserFactory()
+                message_1 = Message.objects.send_message(from_entity=user_1, to_entity=user_2, text='Lorem ipsum dolor sit amet')
+                message_2 = Message.objects.send_message(from_entity=user_1, to_entity=user_3, text=' lorem  ipsum dolor sit AMET')
+                message_3 = Message.objects.send_message(from_entity=user_1, to_entity=user_3, text='Lorem ipsum dolor sit amet!')
+                self.assertEqual(first=message_1.text_hash, second=message_2.text_hash)
+                self.assertNotEqual(first=message_1.text_hash, second=message_3.text_hash)
+                self.assertSetEqual(set1={message.chat_id for message in Message.objects.messages_with_identical_text(text='Lorem ipsum dolor sit amet')}, set2={message_1.chat_id, message_2.chat_id})
+
+            def test_count_identical_messages_in_chats_with_only_one_sender(self):
+                user_1 = ActiveUserFactory()
+                users = [ActiveUserFactory() for i in range(4)]
+                self.assertTupleEqual(tuple1=Chat.objects.count_identical_messages_in_chats_with_only_one_sender(entity=user_1), tuple2=(0, ""))
+                for user in users:
+                    Message.objects.send_message(from_entity=user_1, to_entity=user, text='Lorem ipsum dolor sit amet')
+                Message.objects.send_message(from_entity=user_1, to_entity=users[0], text='Hello')
+                self.assertTupleEqual(tuple1=Chat.objects.count_identical_messages_in_chats_with_only_one_sender(entity=user_1), tuple2=(4, 'Lorem ipsum dolor sit amet'))
+                Message.objects.send_message(from_entity=users[0], to_entity=user_1, text='Hi.')
+                self.assertTupleEqual(tuple1=Chat.objects.count_identical_messages_in_chats_with_only_one_sender(entity=user_1), tuple2=(3, 'Lorem ipsum dolor sit amet'))
+
+            def test_count_identical_messages_ignores_messages_without_text_hash(self):
+                user_1 = ActiveUserFactory()
+                users = [ActiveUserFactory() for i in range(2)]
+                Message.objects.send_message(from_entity=user_1, to_entity=users[0], text='Lorem ipsum dolor sit amet')
+                Message.objects.send_message(from_entity=user_1, to_entity=users[1], text='Consectetur adipiscing elit, sed do')
+                Message.objects.filter(sender_id=user_1.id).update(text_hash='')
+                self.assertTupleEqual(tuple1=Chat.objects.count_identical_messages_in_chats_with_only_one_sender(entity=user_1), tuple2=(0, ""))
+
+
+        @only_on_sites_with_login
+        class ChatFeatureCountManagerOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory()
+                self.user_2 = ActiveUserFactory()
+                self.user_3 = ActiveUserFactory()
+                self.chat_1_2 = ChatFactory(ent1=self.user_1, ent2=self.user_2)
+                self.chat_1_3 = ChatFactory(ent1=self.user_1, ent2=self.user_3)
+
+            def count_chats(self, features):
+                return ChatFeatureCount.objects.count_chats(entity=self.user_1, features=features, created_after=now() - timedelta(days=1))
+
+            def test_count_chats(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='test@example.com')
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='TEST@example.com https://example.com')
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_3, text='test@example.com')
+                self.assertEqual(first=self.count_chats(features=["@"]), second=2)
+                self.assertEqual(first=self.count_chats(features=["https://"]), second=1)
+                self.assertEqual(first=self.count_chats(features=["@", "https://"]), second=2)
+                self.assertEqual(first=self.count_chats(features=["discord"]), second=0)
+                self.assertDictEqual(d1=Chat.objects.get(pk=self.chat_1_2.pk).features_hours, d2={"@": ChatFeatureCount.get_hour(date=now()), "https://": ChatFeatureCount.get_hour(date=now())})
+
+            def test_chat_is_not_counted_after_reply(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='test@example.com')
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_3, text='test@example.com')
+                Message.objects.send_message(from_entity=self.user_2, chat=self.chat_1_2, text='Hi.')
+                self.assertEqual(first=self.count_chats(features=["@"]), second=1)
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='test@example.com')
+                self.assertEqual(first=self.count_chats(features=["@"]), second=1)
+                self.assertDictEqual(d1=Chat.objects.get(pk=self.chat_1_2.pk).features_hours, d2={})
+
+            def test_update_chats_statistics_command_doesnt_count_chats_twice(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='test@example.com')
+                call_command('update_chats_statistics')
+                call_command('update_chats_statistics')
+                self.assertEqual(first=self.count_chats(features=["@"]), second=1)
+
+            def test_delete_old_counts(self):
+                Message.objects.send_message(from_entity=self.user_1, chat=self.chat_1_2, text='test@example.com')
+                old_hour = ChatFeatureCount.get_min_hour() - 1
+                ChatFeatureCount.objects.create(site_id=self.chat_1_3.site_id, entity_id=self.user_1.id, feature="@", hour=old_hour, count=1)
+                self.assertEqual(first=ChatFeatureCount.objects.count(), second=2)
+                call_command('delete_old_chat_feature_counts')
+                self.assertListEqual(list1=list(ChatFeatureCount.objects.values_list('hour', flat=True)), list2=[ChatFeatureCount.get_hour(date=now())])
+                self.assertEqual(first=self.count_chats(features=["@"]), second=1)
+
+            def test_counts_of_old_hours_are_not_added(self):
+                ChatFeatureCount.objects.add(site_id=self.chat_1_2.site_id, entity_id=self.user_1.id, feature="@", hour=ChatFeatureCount.get_min_hour() - 1, count=-1)
+                self.assertEqual(first=ChatFeatureCount.objects.count(), second=0)
+
 
         @only_on_sites_with_login
         class ReadMarkManagerOnlyEnglishTestCase(SiteTestCase):
@@ -125,4 +125,11 @@ if (django_settings.TESTS):
                 self.assertEqual(first=core_messages_tags_and_filters.unread_chats_count(entity=user_2), second=0 + 0 + 1)
                 self.assertEqual(first=core_messages_tags_and_filters.unread_chats_count(entity=user_3), second=0 + 0 + 0)
 
+                chats[1].mark_read(entity=user_1)
+                with self.assertNumQueries(num=1):
+                    self.assertEqual(first=core_messages_tags_and_filters.unread_chats_count(entity=user_1), second=1 + 0 + 0)
+                Message.objects.send_message(from_entity=user_3, chat=chats[1], text='text')
+                Message.objects.send_message(from_entity=user_3, chat=chats[1], text='text')
+                self.assertEqual(first=core_messages_tags_and_filters.unread_chats_count(entity=user_1), second=1 + 1 + 0)
+
 
@@ -2,12 +2,16 @@ from django.conf import settings as django_settings
 
 if (django_settings.TESTS):
     if (django_settings.LOGIN_ENABLED):
+        import base64
+        import json
         from time import sleep
+        from unittest import mock
 
         from dateutil.relativedelta import relativedelta
 
         from django.test import override_settings
         from django.core import mail
+        from django.core.management import call_command
 
         from speedy.core.base.test import tests_settings
         from speedy.core.base.test.mixins import TestCaseMixin
@@ -19,7 +23,7 @@ if (django_settings.TESTS):
         from speedy.core.accounts.test.user_factories import ActiveUserFactory
         from speedy.core.messages.test.factories import ChatFactory
 
-        from speedy.core.accounts.models import User
+        from speedy.core.accounts.models import User, QueuedMail
         from speedy.core.blocks.models import Block
         from speedy.core.messages.models import Message, ReadMark, Chat
 
@@ -87,6 +91,44 @@ if (django_settings.TESTS):
                 r = self.client.get(path=self.page_url)
                 self.assertEqual(first=r.status_code, second=200)
 
+            def test_user_can_read_all_the_pages(self):
+                self.client.login(username=self.user_1.slug, password=tests_settings.USER_PASSWORD)
+                for i in range(27):
+                    Message.objects.send_message(from_entity=self.user_2, chat=self.chat_1_2, text='Message {}'.format(i))
+                all_messages = list(self.chat_1_2.messages_queryset.order_by('-date_created', '-id'))
+                self.assertEqual(first=len(all_messages), second=30)
+                r = self.client.get(path=self.page_url)
+                self.assertEqual(first=r.status_code, second=200)
+                page = r.context['page_obj']
+                self.assertListEqual(list1=list(r.context['message_list']), list2=all_messages[:24])
+                self.assertEqual(first=page.number, second=1)
+                self.assertIs(expr1=page.has_previous(), expr2=False)
+                self.assertIs(expr1=page.has_next(), expr2=True)
+                r = self.client.get(path=self.page_url, data={'page': page.next_page_number(), 'after': page.next_cursor})
+                self.assertEqual(first=r.status_code, second=200)
+                page = r.context['page_obj']
+                self.assertListEqual(list1=list(r.context['message_list']), list2=all_messages[24:])
+                self.assertEqual(first=page.number, second=2)
+                self.assertIs(expr1=page.has_previous(), expr2=True)
+                self.assertIs(expr1=page.has_next(), expr2=False)
+                r = self.client.get(path=self.page_url, data={'page': page.previous_page_number(), 'before': page.previous_cursor})
+                self.assertEqual(first=r.status_code, second=200)
+                page = r.context['page_obj']
+                self.assertListEqual(list1=list(r.context['message_list']), list2=all_messages[:24])
+                self.assertEqual(first=page.number, second=1)
+                self.assertIs(expr1=page.has_previous(), expr2=False)
+
+            def test_invalid_cursor_returns_404(self):
+                self.client.login(username=self.user_1.slug, password=tests_settings.USER_PASSWORD)
+                r = self.client.get(path=self.page_url, data={'after': 'invalid'})
+                self.assertEqual(first=r.status_code, second=404)
+                for values in [[5, "x"], [None, None], ["", ""], ["2026-10-18T12:00:00", None], "x"]:
+                    cursor = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+                    r = self.client.get(path=self.page_url, data={'after': cursor})
+                    self.assertEqual(first=r.status_code, second=404)
+                    r = self.client.get(path=self.page_url, data={'before': cursor})
+                    self.assertEqual(first=r.status_code, second=404)
+
 
         @only_on_sites_with_login
         class SendMessageToChatViewOnlyEnglishTestCase(SiteTestCase):
@@ -212,6 +254,8 @@ if (django_settings.TESTS):
                 self.assertEqual(first=chat.ent1.id, second=self.user_1.id)
                 self.assertEqual(first=chat.ent2.id, second=self.user_2.id)
                 self.assertIs(expr1=chat.is_private, expr2=True)
+                self.assertEqual(first=len(mail.outbox), second=0)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=1)
                 self.assertEqual(first=mail.outbox[0].subject, second={
                     django_settings.SPEEDY_NET_SITE_ID: self._you_have_a_new_message_on_speedy_net_subject,
@@ -260,12 +304,46 @@ if (django_settings.TESTS):
                 self.assertEqual(first=chat.ent1.id, second=self.user_1.id)
                 self.assertEqual(first=chat.ent2.id, second=self.user_2.id)
                 self.assertIs(expr1=chat.is_private, expr2=True)
+                self.assertEqual(first=len(mail.outbox), second=0)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=1)
                 self.assertEqual(first=mail.outbox[0].subject, second={
                     django_settings.SPEEDY_NET_SITE_ID: self._you_have_a_new_message_on_speedy_net_subject,
                     django_settings.SPEEDY_MATCH_SITE_ID: self._you_have_a_new_message_on_speedy_match_subject,
                 }[self.site.id])
 
+            def test_other_user_gets_one_email_on_many_messages(self):
+                self.client.login(username=self.user_1.slug, password=tests_settings.USER_PASSWORD)
+                for i in range(3):
+                    self.client.post(path=self.page_url, data=self.data)
+                self.assertEqual(first=Message.objects.count(), second=3)
+                self.assertEqual(first=QueuedMail.objects.pending().count(), second=1)
+                self.assertEqual(first=QueuedMail.objects.pending().get().number_of_notifications, second=3)
+                call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=1)
+                self.assertEqual(first=QueuedMail.objects.pending().count(), second=0)
+                call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=1)
+
+            def test_email_which_failed_is_sent_again(self):
+                self.client.login(username=self.user_1.slug, password=tests_settings.USER_PASSWORD)
+                self.client.post(path=self.page_url, data=self.data)
+                with mock.patch.object(target=User, attribute='mail_user', return_value=None):
+                    call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=0)
+                queued_mail = QueuedMail.objects.pending().get()
+                self.assertEqual(first=queued_mail.number_of_attempts, second=1)
+                self.assertIsNotNone(obj=queued_mail.date_claimed)
+                self.assertIsNone(obj=queued_mail.date_sent)
+                # The email is still claimed.
+                call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=0)
+                with override_settings(MAIL_QUEUE_CLAIM_TIMEOUT=0):
+                    call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=1)
+                self.assertEqual(first=QueuedMail.objects.pending().count(), second=0)
+                self.assertEqual(first=QueuedMail.objects.get(pk=queued_mail.pk).number_of_attempts, second=2)
+
             def test_user_can_submit_the_form_and_other_user_doesnt_get_notified_on_message(self):
                 self.assert_models_count(
                     entity_count=2,
@@ -308,6 +386,7 @@ if (django_settings.TESTS):
                 self.assertEqual(first=chat.ent1.id, second=self.user_1.id)
                 self.assertEqual(first=chat.ent2.id, second=self.user_2.id)
                 self.assertIs(expr1=chat.is_private, expr2=True)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=0)
 
             def test_user_cannot_submit_the_form_with_text_too_long_1(self):
@@ -394,6 +473,52 @@ if (django_settings.TESTS):
                 self.assertEqual(first=self.language_code, second='he')
 
 
+        @only_on_sites_with_login
+        class ChatPollMessagesViewOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory()
+                self.user_2 = ActiveUserFactory()
+                self.user_3 = ActiveUserFactory()
+                self.chat = ChatFactory(ent1=self.user_1, ent2=self.user_2)
+                self.message = Message.objects.send_message(from_entity=self.user_2, chat=self.chat, text='Hello')
+                self.page_url = '/messages/{}/poll/'.format(self.chat.id)
+
+            def test_user_can_poll_new_messages(self):
+                self.client.login(username=self.user_1.slug, password=tests_settings.USER_PASSWORD)
+                r = self.client.get(path=self.page_url, data={'since': 0})
+                self.assertEqual(first=r.status_code, second=200)
+                self.assertListEqual(list1=list(r.context['message_list']), list2=[self.message])
+                r = self.client.get(path=self.page_url, data={'since': self.message.date_created.timestamp()})
+                self.assertEqual(first=r.status_code, second=200)
+                self.assertEqual(first=r.content, second=b'')
+                sleep(0.01)
+                with self.captureOnCommitCallbacks(execute=True):
+                    message = Message.objects.send_message(from_entity=self.user_2, chat=self.chat, text='Hello again')
+                r = self.client.get(path=self.page_url, data={'since': self.message.date_created.timestamp()})
+                self.assertEqual(first=r.status_code, second=200)
+                self.assertListEqual(list1=list(r.context['message_list']), list2=[message])
+
+            def test_chat_version_is_not_older_than_the_last_message(self):
+                old_chat = Chat.objects.get(pk=self.chat.pk)
+                sleep(0.01)
+                message = Message.objects.send_message(from_entity=self.user_1, chat=self.chat, text='Hello again')
+                # As if the callback of the first message was called after the callback of the second message.
+                self.chat.set_version()
+                old_chat.set_version()
+                self.assertEqual(first=Chat.get_version(chat_id=self.chat.id)['last_message_timestamp'], second=message.date_created.timestamp())
+                chat_version = Chat.get_version(chat_id=self.chat.id)
+                Chat.objects.filter(pk=self.chat.pk).update(last_message_date=self.message.date_created)
+                old_chat.set_version()
+                self.assertDictEqual(d1=Chat.get_version(chat_id=self.chat.id), d2=chat_version)
+
+            def test_user_cannot_poll_a_chat_they_dont_participate_in(self):
+                self.chat.set_version()
+                self.client.login(username=self.user_3.slug, password=tests_settings.USER_PASSWORD)
+                r = self.client.get(path=self.page_url, data={'since': self.message.date_created.timestamp()})
+                self.assertEqual(first=r.status_code, second=404)
+
+
         @only_on_sites_with_login
         class MarkChatAsReadViewOnlyEnglishTestCase(SiteTestCase):
             def set_up(self):
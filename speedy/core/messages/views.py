@@ -1,15 +1,18 @@
+import time
 from datetime import datetime
 
+from django.conf import settings as django_settings
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
 from django.db.models import Q
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
 from django.views import generic
 from django.contrib import messages
 from django.utils.translation import pgettext_lazy
 from rules.contrib.views import PermissionRequiredMixin
 
+from speedy.core.base.views import KeysetPaginationMixin
 from speedy.core.profiles.views import UserMixin
 from speedy.core.base.utils import normalize_username
 from speedy.core.blocks.models import Block
@@ -52,7 +55,8 @@ class UserSingleChatMixin(UserChatsMixin):
             raise Http404()
 
     def get_messages_queryset(self):
-        return self.get_chat().messages_queryset
+        # Messages are loaded only for the current page.
+        return self.chat.messages_queryset.select_related('sender__user')
 
     def has_permission(self):
         return ((super().has_permission()) and (self.request.user.has_perm(perm='messages.read_chat', obj=self.chat)))
@@ -79,20 +83,22 @@ class UserSingleChatMixin(UserChatsMixin):
         return super().handle_no_permission()
 
 
-class ChatListView(UserChatsMixin, generic.ListView):
+class ChatListView(UserChatsMixin, KeysetPaginationMixin, generic.ListView):
     template_name = 'messages/chat_list.html'
     page_size = 24
     paginate_by = page_size
+    keyset_fields = ('last_message_date', 'id')
 
     def get_queryset(self):
         return self.get_chat_queryset()
 
 
-class ChatDetailView(UserSingleChatMixin, generic.ListView):
+class ChatDetailView(UserSingleChatMixin, KeysetPaginationMixin, generic.ListView):
     permission_required = 'messages.read_chat'
     template_name = 'messages/chat_detail.html'
     page_size = 24
     paginate_by = page_size
+    keyset_fields = ('date_created', 'id')
 
     def dispatch(self, request, *args, **kwargs):
         if (not (request.user.is_authenticated)):
@@ -143,13 +149,34 @@ class ChatDetailView(UserSingleChatMixin, generic.ListView):
 
 
 class ChatPollMessagesView(UserSingleChatMixin, generic.ListView):
+    """
+    Returns the messages in the chat since the given timestamp.
+
+    The cached version of the chat (see Chat.set_version) is checked first, if the user is a participant and there are no new messages, it waits up to MESSAGES_POLL_WAIT_TIMEOUT seconds for a new message, and returns an empty response without querying the database.
+    """
     template_name = 'messages/message_list_poll.html'
     raise_exception = True
 
+    def dispatch(self, request, *args, **kwargs):
+        self.since = float(self.request.GET.get('since', 0)) + 0.0001
+        if (request.user.is_authenticated):
+            chat_version = self.wait_for_new_message(chat_id=self.kwargs['chat_slug'])
+            if ((chat_version is not None) and (request.user.id in chat_version['participants_ids']) and (chat_version['last_message_timestamp'] <= self.since)):
+                return HttpResponse('')
+        return super().dispatch(request=request, *args, **kwargs)
+
+    def wait_for_new_message(self, chat_id):
+        deadline = time.monotonic() + django_settings.MESSAGES_POLL_WAIT_TIMEOUT
+        chat_version = Chat.get_version(chat_id=chat_id)
+        while ((chat_version is not None) and (self.request.user.id in chat_version['participants_ids']) and (chat_version['last_message_timestamp'] <= self.since) and (time.monotonic() + django_settings.MESSAGES_POLL_WAIT_INTERVAL <= deadline)):
+            time.sleep(django_settings.MESSAGES_POLL_WAIT_INTERVAL)
+            chat_version = Chat.get_version(chat_id=chat_id)
+        return chat_version
+
     def get_queryset(self):
-        since = float(self.request.GET.get('since', 0))
-        since += 0.0001
-        return self.get_messages_queryset().filter(date_created__gt=datetime.fromtimestamp(since))
+        if (Chat.get_version(chat_id=self.chat.id) is None):
+            self.chat.set_version()
+        return self.get_messages_queryset().filter(date_created__gt=datetime.fromtimestamp(self.since))
 
     def get_context_data(self, **kwargs):
         cd = super().get_context_data(**kwargs)
@@ -213,7 +240,7 @@ class MarkChatAsReadView(UserSingleChatMixin, generic.View):
         return redirect(to=self.get_success_url())
 
     def post(self, request, *args, **kwargs):
-        self.get_chat().mark_read(entity=self.get_user())
+        self.chat.mark_read(entity=self.get_user())
         return redirect(to=self.get_success_url())
 
     def get_success_url(self):
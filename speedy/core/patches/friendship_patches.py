@@ -1,88 +1,82 @@
 def patch():
     import logging
 
-    from friendship.models import BUST_CACHES, CACHE_TYPES, Friend, FriendshipManager, FriendshipRequest, cache, cache_key
+    from django.contrib.auth import get_user_model
 
-    MAX_NUMBER_OF_FRIENDS_TO_CACHE = 400
-    MAX_NUMBER_OF_REQUESTS_TO_CACHE = 4000
+    from friendship.models import BUST_CACHES, CACHE_TYPES, Friend, FriendshipManager, FriendshipRequest, cache, cache_key
 
     CACHE_TYPES.setdefault("friends_count", "speedy-core-friends-count-%s")
     BUST_CACHES["friends"].append("friends_count") if "friends_count" not in BUST_CACHES["friends"] else None
 
+    # Only the ids are cached, so that the lists of users with many friends or requests are small enough to be cached. The objects are loaded in one query (in friends, requests and sent_requests), but friends_ids and are_friends don't query the database if the ids are cached.
+    CACHE_TYPES.setdefault("friends_ids", "speedy-core-friends-ids-%s")
+    CACHE_TYPES.setdefault("requests_ids", "speedy-core-friendship-requests-ids-%s")
+    CACHE_TYPES.setdefault("sent_requests_ids", "speedy-core-sent-friendship-requests-ids-%s")
+    BUST_CACHES["friends"].append("friends_ids") if "friends_ids" not in BUST_CACHES["friends"] else None
+    BUST_CACHES["requests"].append("requests_ids") if "requests_ids" not in BUST_CACHES["requests"] else None
+    BUST_CACHES["sent_requests"].append("sent_requests_ids") if "sent_requests_ids" not in BUST_CACHES["sent_requests"] else None
+
     logger = logging.getLogger(__name__)
 
+    def _get_ids(key, qs, user, method_name):
+        ids = cache.get(key)
+
+        if ids is None:
+            ids = list(qs)
+            try:
+                cache.set(key, ids)
+            except Exception as e:
+                logger.warning("friendship_patches::FriendshipManager::{method_name}::friendship.models.cache.set raised an exception, len_ids={len_ids}, user={user}, Exception={e}".format(
+                    method_name=method_name,
+                    len_ids=len(ids),
+                    user=user,
+                    e=str(e),
+                ))
+
+        return ids
+
+    def _hydrate(model, ids):
+        """ Load the objects of ids in one query, in the same order. Objects which were deleted are skipped. """
+        objects = model.objects.in_bulk(id_list=ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    def friends_ids(self, user):
+        """ Return a list of the ids of all friends """
+        qs = Friend.objects.filter(to_user=user).values_list("from_user_id", flat=True)
+        return _get_ids(key=cache_key("friends_ids", user.pk), qs=qs, user=user, method_name="friends_ids")
+
+    def requests_ids(self, user):
+        """ Return a list of the ids of friendship requests """
+        qs = FriendshipRequest.objects.filter(to_user=user).values_list("pk", flat=True)
+        return _get_ids(key=cache_key("requests_ids", user.pk), qs=qs, user=user, method_name="requests_ids")
+
+    def sent_requests_ids(self, user):
+        """ Return a list of the ids of friendship requests from user """
+        qs = FriendshipRequest.objects.filter(from_user=user).values_list("pk", flat=True)
+        return _get_ids(key=cache_key("sent_requests_ids", user.pk), qs=qs, user=user, method_name="sent_requests_ids")
+
     def friends(self, user):
         """ Return a list of all friends """
-        key = cache_key("friends", user.pk)
-        friends = cache.get(key)
-
-        if friends is None:
-            qs = Friend.objects.select_related("from_user").filter(to_user=user)
-            friends = [u.from_user for u in qs]
-            if (len(friends) <= MAX_NUMBER_OF_FRIENDS_TO_CACHE):
-                try:
-                    cache.set(key, friends)
-                except Exception as e:
-                    logger.warning("friendship_patches::FriendshipManager::friends::friendship.models.cache.set raised an exception, User has {len_friends} friends, user={user}, Exception={e}".format(
-                        len_friends=len(friends),
-                        user=user,
-                        e=str(e),
-                    ))
-
-        return friends
+        return _hydrate(model=get_user_model(), ids=self.friends_ids(user=user))
 
     def requests(self, user):
         """ Return a list of friendship requests """
-        key = cache_key("requests", user.pk)
-        requests = cache.get(key)
-
-        if requests is None:
-            qs = (
-                # FriendshipRequest.objects.select_related("from_user", "to_user")
-                FriendshipRequest.objects
-                .filter(to_user=user)
-                .all()
-            )
-            requests = list(qs)
-            if (len(requests) <= MAX_NUMBER_OF_REQUESTS_TO_CACHE):
-                try:
-                    cache.set(key, requests)
-                except Exception as e:
-                    logger.warning("friendship_patches::FriendshipManager::requests::friendship.models.cache.set raised an exception, User has {len_requests} requests, user={user}, Exception={e}".format(
-                        len_requests=len(requests),
-                        user=user,
-                        e=str(e),
-                    ))
-
-        return requests
+        return _hydrate(model=FriendshipRequest, ids=self.requests_ids(user=user))
 
     def sent_requests(self, user):
         """ Return a list of friendship requests from user """
-        key = cache_key("sent_requests", user.pk)
-        requests = cache.get(key)
-
-        if requests is None:
-            qs = (
-                # FriendshipRequest.objects.select_related("from_user", "to_user")
-                FriendshipRequest.objects
-                .filter(from_user=user)
-                .all()
-            )
-            requests = list(qs)
-            if (len(requests) <= MAX_NUMBER_OF_REQUESTS_TO_CACHE):
-                try:
-                    cache.set(key, requests)
-                except Exception as e:
-                    logger.warning("friendship_patches::FriendshipManager::sent_requests::friendship.models.cache.set raised an exception, User has {len_requests} sent requests, user={user}, Exception={e}".format(
-                        len_requests=len(requests),
-                        user=user,
-                        e=str(e),
-                    ))
-
-        return requests
+        return _hydrate(model=FriendshipRequest, ids=self.sent_requests_ids(user=user))
+
+    def are_friends(self, user1, user2):
+        """ Are these two users friends? """
+        return user2.pk in self.friends_ids(user=user1)
 
+    FriendshipManager.friends_ids = friends_ids
+    FriendshipManager.requests_ids = requests_ids
+    FriendshipManager.sent_requests_ids = sent_requests_ids
     FriendshipManager.friends = friends
     FriendshipManager.requests = requests
     FriendshipManager.sent_requests = sent_requests
+    FriendshipManager.are_friends = are_friends
 
 
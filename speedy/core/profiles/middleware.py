@@ -0,0 +1,22 @@
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+
+from . import relationships
+
+
+class RelationshipsMiddleware(object):
+    """
+    Load the relationship between each pair of users once per request (see speedy.core.profiles.relationships.get_relationship).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase:
+        token = relationships.start_request()
+        try:
+            return self.get_response(request=request)
+        finally:
+            relationships.end_request(token=token)
+
+
@@ -0,0 +1,102 @@
+import contextvars
+from collections import namedtuple
+
+from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
+from django.dispatch import receiver
+from friendship.models import Friend, FriendshipRequest
+
+from speedy.core.accounts.models import Entity
+from speedy.core.blocks.models import Block
+from speedy.match.likes.models import UserLike
+
+_relationships = contextvars.ContextVar('speedy_core_profiles_relationships', default=None)
+
+RELATIONSHIP_FIELDS = ('are_friends', 'friendship_request_sent_id', 'friendship_request_received_id', 'you_like_user', 'user_likes_you', 'has_blocked', 'is_blocked')
+
+
+class Relationship(namedtuple('Relationship', RELATIONSHIP_FIELDS)):
+    """
+    The relationship between a user and another user (or entity), from the point of view of the user.
+
+    Attributes:
+        are_friends (bool): Whether the users are friends.
+        friendship_request_sent_id (int): The id of the friendship request from the user to the other user, or None.
+        friendship_request_received_id (int): The id of the friendship request from the other user to the user, or None.
+        you_like_user (bool): Whether the user likes the other user.
+        user_likes_you (bool): Whether the other user likes the user.
+        has_blocked (bool): Whether the user blocked the other user.
+        is_blocked (bool): Whether the other user blocked the user.
+    """
+    __slots__ = ()
+
+    @property
+    def friendship_request_sent(self):
+        return (self.friendship_request_sent_id is not None)
+
+    @property
+    def friendship_request_received(self):
+        return (self.friendship_request_received_id is not None)
+
+    @property
+    def there_is_block(self):
+        return ((self.has_blocked) or (self.is_blocked))
+
+
+NO_RELATIONSHIP = Relationship(are_friends=False, friendship_request_sent_id=None, friendship_request_received_id=None, you_like_user=False, user_likes_you=False, has_blocked=False, is_blocked=False)
+
+
+def get_relationship(user, other_user):
+    """
+    Return the relationship between user and other_user, which is loaded from the database in one query.
+
+    During a request (see RelationshipsMiddleware), the relationship is loaded once and reused by the view and by the rules predicates. It's loaded again after a friendship, friendship request, like or block is saved or deleted.
+
+    :return: A Relationship.
+    """
+    if ((not (isinstance(user, Entity))) or (not (isinstance(other_user, Entity)))):
+        return NO_RELATIONSHIP
+    relationships = _relationships.get()
+    if ((relationships is not None) and ((user.pk, other_user.pk) in relationships)):
+        return relationships[(user.pk, other_user.pk)]
+    values = Entity.objects.filter(pk=other_user.pk).annotate(
+        are_friends=Exists(Friend.objects.filter(from_user_id=user.pk, to_user_id=OuterRef('pk'))),
+        friendship_request_sent_id=Subquery(FriendshipRequest.objects.filter(from_user_id=user.pk, to_user_id=OuterRef('pk')).values('pk')[:1]),
+        friendship_request_received_id=Subquery(FriendshipRequest.objects.filter(from_user_id=OuterRef('pk'), to_user_id=user.pk).values('pk')[:1]),
+        you_like_user=Exists(UserLike.objects.filter(from_user_id=user.pk, to_user_id=OuterRef('pk'))),
+        user_likes_you=Exists(UserLike.objects.filter(from_user_id=OuterRef('pk'), to_user_id=user.pk)),
+        has_blocked=Exists(Block.objects.filter(blocker_id=user.pk, blocked_id=OuterRef('pk'))),
+        is_blocked=Exists(Block.objects.filter(blocker_id=OuterRef('pk'), blocked_id=user.pk)),
+    ).values(*RELATIONSHIP_FIELDS).first()
+    relationship = Relationship(**values) if (values is not None) else NO_RELATIONSHIP
+    if (relationships is not None):
+        relationships[(user.pk, other_user.pk)] = relationship
+    return relationship
+
+
+def start_request():
+    return _relationships.set({})
+
+
+def end_request(token):
+    _relationships.reset(token)
+
+
+def clear_relationships():
+    relationships = _relationships.get()
+    if (relationships is not None):
+        relationships.clear()
+
+
+@receiver(signal=models.signals.post_save, sender=Friend)
+@receiver(signal=models.signals.post_delete, sender=Friend)
+@receiver(signal=models.signals.post_save, sender=FriendshipRequest)
+@receiver(signal=models.signals.post_delete, sender=FriendshipRequest)
+@receiver(signal=models.signals.post_save, sender=UserLike)
+@receiver(signal=models.signals.post_delete, sender=UserLike)
+@receiver(signal=models.signals.post_save, sender=Block)
+@receiver(signal=models.signals.post_delete, sender=Block)
+def clear_relationships_after_update(sender, **kwargs):
+    clear_relationships()
+
+
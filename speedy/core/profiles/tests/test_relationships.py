@@ -0,0 +1,60 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from friendship.models import Friend, FriendshipRequest
+
+        from speedy.core.base.test.models import SiteTestCase
+        from speedy.core.base.test.decorators import only_on_sites_with_login
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.core.blocks.models import Block
+        from speedy.match.likes.models import UserLike
+        from speedy.core.profiles import relationships
+
+
+        @only_on_sites_with_login
+        class RelationshipOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory()
+                self.user_2 = ActiveUserFactory()
+
+            def test_no_relationship(self):
+                self.assertEqual(first=relationships.get_relationship(user=self.user_1, other_user=self.user_2), second=relationships.NO_RELATIONSHIP)
+
+            def test_relationship_is_loaded_in_one_query(self):
+                friendship_request = Friend.objects.add_friend(from_user=self.user_2, to_user=self.user_1)
+                UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+                with self.assertNumQueries(num=1):
+                    relationship = relationships.get_relationship(user=self.user_1, other_user=self.user_2)
+                self.assertIs(expr1=relationship.are_friends, expr2=False)
+                self.assertIs(expr1=relationship.friendship_request_sent, expr2=False)
+                self.assertIs(expr1=relationship.friendship_request_received, expr2=True)
+                self.assertEqual(first=relationship.friendship_request_received_id, second=friendship_request.pk)
+                self.assertIs(expr1=relationship.you_like_user, expr2=True)
+                self.assertIs(expr1=relationship.user_likes_you, expr2=False)
+                self.assertIs(expr1=relationship.there_is_block, expr2=False)
+                other_relationship = relationships.get_relationship(user=self.user_2, other_user=self.user_1)
+                self.assertIs(expr1=other_relationship.friendship_request_sent, expr2=True)
+                self.assertIs(expr1=other_relationship.user_likes_you, expr2=True)
+
+            def test_relationship_is_memoized_during_request(self):
+                token = relationships.start_request()
+                try:
+                    relationships.get_relationship(user=self.user_1, other_user=self.user_2)
+                    with self.assertNumQueries(num=0):
+                        relationships.get_relationship(user=self.user_1, other_user=self.user_2)
+                    Friend.objects.add_friend(from_user=self.user_1, to_user=self.user_2)
+                    self.assertIs(expr1=relationships.get_relationship(user=self.user_1, other_user=self.user_2).friendship_request_sent, expr2=True)
+                    FriendshipRequest.objects.get(from_user=self.user_1, to_user=self.user_2).accept()
+                    self.assertIs(expr1=relationships.get_relationship(user=self.user_1, other_user=self.user_2).are_friends, expr2=True)
+                    Block.objects.block(blocker=self.user_2, blocked=self.user_1)
+                    relationship = relationships.get_relationship(user=self.user_1, other_user=self.user_2)
+                    self.assertIs(expr1=relationship.is_blocked, expr2=True)
+                    self.assertIs(expr1=relationship.has_blocked, expr2=False)
+                finally:
+                    relationships.end_request(token=token)
+
+
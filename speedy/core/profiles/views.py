@@ -6,16 +6,12 @@ from django.shortcuts import redirect
 from django.utils.module_loading import import_string
 from django.utils.translation import pgettext_lazy
 from django.views import generic
-from friendship.models import FriendshipRequest
 from rules.contrib.views import LoginRequiredMixin
 
 from speedy.core.base.utils import get_both_genders_context_from_users
-from speedy.core.friends.rules import friendship_request_sent, friendship_request_received, are_friends
 from speedy.core.base.utils import normalize_username
 from speedy.core.accounts.models import User
-
-if (django_settings.SITE_ID == django_settings.SPEEDY_MATCH_SITE_ID):
-    from speedy.match.likes.rules import you_like_user, user_likes_you
+from .relationships import get_relationship
 
 
 class SelfUserMixin(object):
@@ -86,20 +82,20 @@ class UserMixin(object):
             'user': self.user,
         })
         if (self.request.user.is_authenticated):
+            relationship = get_relationship(user=self.request.user, other_user=self.user)
             cd.update({
-                'user_is_friend': are_friends(user=self.request.user, other_user=self.user),
-                'friendship_request_sent': friendship_request_sent(user=self.request.user, other_user=self.user),
-                'friendship_request_received': friendship_request_received(user=self.request.user, other_user=self.user),
+                'user_is_friend': relationship.are_friends,
+                'friendship_request_sent': relationship.friendship_request_sent,
+                'friendship_request_received': relationship.friendship_request_received,
             })
             if (cd['friendship_request_received']):
-                friendship_request_received_id = FriendshipRequest.objects.get(from_user=self.user, to_user=self.request.user).pk
                 cd.update({
-                    'friendship_request_received_id': friendship_request_received_id,
+                    'friendship_request_received_id': relationship.friendship_request_received_id,
                 })
             if (django_settings.SITE_ID == django_settings.SPEEDY_MATCH_SITE_ID):
                 cd.update({
-                    'you_like_user': you_like_user(user=self.request.user, other_user=self.user),
-                    'user_likes_you': user_likes_you(user=self.request.user, other_user=self.user),
+                    'you_like_user': relationship.you_like_user,
+                    'user_likes_you': relationship.user_likes_you,
                     'this_user_doesnt_match_your_profile_message': pgettext_lazy(context=get_both_genders_context_from_users(user=self.request.user, other_user=self.user), message="This user doesn't match your profile, but you can visit their Speedy Net profile. View user's profile on Speedy Net."),
                 })
         return cd
@@ -40,6 +40,13 @@ DISALLOWED_USER_AGENTS = [
 DEFAULT_FROM_EMAIL = 'notifications@speedy.net'
 SERVER_EMAIL = 'webmaster+server@speedy.net'
 
+# Notification emails are queued and sent by the send_queued_mails command. Notifications with the same coalesce key to the same user within MAIL_QUEUE_COALESCE_WINDOW seconds are sent as one email.
+MAIL_QUEUE_COALESCE_WINDOW = 10 * 60  # 10 minutes
+MAIL_QUEUE_BATCH_SIZE = 100
+# Emails are claimed by a worker before they are sent. Emails which were not sent (the worker failed or was stopped) are claimed again after MAIL_QUEUE_CLAIM_TIMEOUT seconds, up to MAIL_QUEUE_MAX_ATTEMPTS times.
+MAIL_QUEUE_CLAIM_TIMEOUT = 10 * 60  # 10 minutes
+MAIL_QUEUE_MAX_ATTEMPTS = 3
+
 ADMINS = MANAGERS = (
     ('Uri Rodberg', 'webmaster@speedy.net'),
 )
@@ -93,6 +100,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'speedy.core.profiles.middleware.RelationshipsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.contrib.sites.middleware.CurrentSiteMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -147,17 +155,38 @@ CACHES = {
 
 # Speedy Net and Speedy Match timeouts:
 CACHE_SET_BLOCKED_ENTITIES_IDS_TIMEOUT = 6 * 60  # 6 minutes
-CACHE_GET_BLOCKED_ENTITIES_IDS_SLIDING_TIMEOUT = 0
 CACHE_SET_BLOCKING_ENTITIES_IDS_TIMEOUT = 6 * 60  # 6 minutes
-CACHE_GET_BLOCKING_ENTITIES_IDS_SLIDING_TIMEOUT = 0
 CACHE_SET_RECEIVED_FRIENDSHIP_REQUESTS_COUNT_TIMEOUT = 5 * 60  # 5 minutes
 CACHE_GET_RECEIVED_FRIENDSHIP_REQUESTS_COUNT_SLIDING_TIMEOUT = 0
-CACHE_SET_UNREAD_CHATS_COUNT_TIMEOUT = 5 * 60  # 5 minutes
-CACHE_GET_UNREAD_CHATS_COUNT_SLIDING_TIMEOUT = 0
+CACHE_SET_CHAT_VERSION_TIMEOUT = 60 * 60  # 1 hour
+
+# Polling for new messages in a chat. A poll without new messages waits up to MESSAGES_POLL_WAIT_TIMEOUT seconds for a new message (long polling), each waiting request occupies a worker, so keep it 0 unless the site is served by enough workers.
+MESSAGES_POLL_WAIT_TIMEOUT = 0
+MESSAGES_POLL_WAIT_INTERVAL = 1  # 1 second
 
 # Speedy Match timeouts:
 CACHE_SET_MATCHES_TIMEOUT = 6 * 60  # 6 minutes
+CACHE_SET_MATCHES_STALE_TIMEOUT = 60 * 60  # 1 hour
 CACHE_GET_MATCHES_SLIDING_TIMEOUT = 0
+CACHE_MATCHES_LEASE_TIMEOUT = 60  # 1 minute
+CACHE_MATCHES_LEASE_WAIT_TIMEOUT = 5  # 5 seconds
+
+# Speedy Match candidate index:
+USE_MATCH_CANDIDATE_INDEX = True
+MATCH_CANDIDATE_INDEX_REFRESH_INTERVAL = 30  # 30 seconds
+MATCH_CANDIDATE_INDEX_REFRESH_OVERLAP = 60  # 1 minute
+MATCH_CANDIDATE_INDEX_FULL_REFRESH_INTERVAL = 60 * 60  # 1 hour
+
+# Speedy Match admin timeouts:
+CACHE_SET_ADMIN_STATISTICS_TIMEOUT = 10 * 60  # 10 minutes
+CACHE_SET_ADMIN_STATISTICS_STALE_TIMEOUT = 24 * 60 * 60  # 24 hours
+
+# Stale values are refreshed in background threads (uWSGI must run with enable-threads):
+CACHE_REVALIDATE_IN_BACKGROUND = True
+CACHE_REVALIDATE_MAX_WORKERS = 2
+
+# Sites are loaded once per process, and reloaded if they were changed in another process:
+SITE_REGISTRY_VERSION_CHECK_INTERVAL = 60  # 1 minute
 
 BUST_ALL_CACHES_FOR_A_USER = True
 
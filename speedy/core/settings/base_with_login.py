@@ -54,6 +54,13 @@ IGNORE_LAST_VISIT = [
     '/set-session/',
 ]
 
+# Last visits and last IP addresses used are written to the database in batches, at most VISITS_WRITE_BEHIND_MAX_STALENESS seconds after the visit.
+VISITS_WRITE_BEHIND = True
+VISITS_WRITE_BEHIND_MAX_STALENESS = 60  # 1 minute
+VISITS_WRITE_BEHIND_MAX_BUFFER_SIZE = 1000
+# A background thread flushes the buffer, also when the process doesn't get any requests (uWSGI must run with enable-threads):
+VISITS_WRITE_BEHIND_FLUSH_IN_BACKGROUND = True
+
 LOCALE_PATHS += [
     str(ROOT_DIR / 'speedy/net/locale'),
     str(ROOT_DIR / 'speedy/match/locale'),
@@ -71,6 +71,10 @@ def activate_tests(settings):
         'MEDIA_ROOT': TESTS_MEDIA_ROOT,
         'LOGGING': LOGGING,
         'TESTS': True,
+        'VISITS_WRITE_BEHIND_MAX_STALENESS': 0,  # Write visits to the database immediately.
+        'CACHE_REVALIDATE_IN_BACKGROUND': False,  # Background threads don't see the data of the test's transaction.
+        'VISITS_WRITE_BEHIND_FLUSH_IN_BACKGROUND': False,  # Background threads don't see the data of the test's transaction.
+        'MATCH_CANDIDATE_INDEX_FULL_REFRESH_INTERVAL': 0,  # The database is rolled back after each test, so reload the candidate index every time.
         'DEBUG': False,  # Django sets it to False anyway.
     })
 
@@ -743,12 +743,17 @@ evil.block('@@MessageList', {
     init: function () {
         var _this = this;
         if (this.block.data('page-number') === 1) {
-            window.setInterval(function () {
-                _this.poll();
-            }, 5000);
+            this.schedulePoll();
         }
     },
 
+    schedulePoll: function () {
+        var _this = this;
+        window.setTimeout(function () {
+            _this.poll();
+        }, 5000);
+    },
+
     poll: function () {
         var _this = this;
         if (this.block.data('page-number') === 1) {
@@ -756,13 +761,18 @@ evil.block('@@MessageList', {
                 var url = this.block.data('poll-url');
                 var since = this.$('@message').first().data('timestamp');
                 url += '?since=' + since;
+                // Poll again only after this request is done, the server may wait for new messages before responding.
                 $.ajax(url).done(function (data) {
                     $(data).prependTo(_this.block);
                 }).fail(function (jqXHR) {
                     if ((jqXHR.status === 403) && (window.localStorage !== null)) {
                         window.localStorage.setItem('logged-in', 'false');
                     }
+                }).always(function () {
+                    _this.schedulePoll();
                 });
+            } else {
+                this.schedulePoll();
             }
         }
     }
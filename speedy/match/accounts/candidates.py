@@ -0,0 +1,311 @@
+import logging
+import threading
+from collections.abc import Sequence
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.db.models import Q
+from django.db.models.fields.json import KT
+from django.utils.timezone import now
+from django.utils.translation import get_language
+
+from speedy.core.base.utils import get_age_ranges_match
+from speedy.core.accounts.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def get_coordinates_from_ipapi_results(raw_ipapi_results):
+    """
+    Get the coordinates of a user from the raw ipapi results of the last IP address used.
+
+    :param raw_ipapi_results: The raw ipapi results (a dict, or None).
+    :return: A tuple (latitude, longitude), or None if the coordinates are not known.
+    """
+    if (
+        (raw_ipapi_results is not None) and
+        ("latitude" in raw_ipapi_results) and
+        (raw_ipapi_results["latitude"] is not None) and
+        ("longitude" in raw_ipapi_results) and
+        (raw_ipapi_results["longitude"] is not None)
+    ):
+        return (float(raw_ipapi_results["latitude"]), float(raw_ipapi_results["longitude"]))
+    return None
+
+
+class MatchCandidate(object):
+    """
+    A compact record of a Speedy Match user, with only the fields which are relevant for matching.
+    """
+    __slots__ = (
+        'pk',
+        'gender',
+        'diet',
+        'smoking_status',
+        'relationship_status',
+        'date_of_birth',
+        'active_languages',
+        'gender_to_match',
+        'diet_to_match',
+        'smoking_status_to_match',
+        'relationship_status_to_match',
+        'diet_match',
+        'smoking_status_match',
+        'relationship_status_match',
+        'min_age_to_match',
+        'max_age_to_match',
+        'height',
+        'last_visit',
+        'photo_visible_on_website',
+        'not_allowed_to_use_speedy_match',
+        'likes_to_user_count',
+        'coordinates',
+    )
+
+    def __init__(self, row):
+        self.pk = row['user_id']
+        self.gender = row['user__gender']
+        self.diet = row['user__diet']
+        self.smoking_status = row['user__smoking_status']
+        self.relationship_status = row['user__relationship_status']
+        self.date_of_birth = row['user__date_of_birth']
+        self.active_languages = frozenset(row['active_languages'])
+        self.gender_to_match = frozenset(row['gender_to_match'])
+        self.diet_to_match = frozenset(row['diet_to_match'])
+        self.smoking_status_to_match = frozenset(row['smoking_status_to_match'])
+        self.relationship_status_to_match = frozenset(row['relationship_status_to_match'])
+        self.diet_match = row['diet_match']
+        self.smoking_status_match = row['smoking_status_match']
+        self.relationship_status_match = row['relationship_status_match']
+        self.min_age_to_match = row['min_age_to_match']
+        self.max_age_to_match = row['max_age_to_match']
+        self.height = row['height']
+        self.last_visit = row['last_visit']
+        self.photo_visible_on_website = (row['user__photo__visible_on_website'] is True)
+        self.not_allowed_to_use_speedy_match = row['not_allowed_to_use_speedy_match']
+        self.likes_to_user_count = row['likes_to_user_count']
+        try:
+            self.coordinates = get_coordinates_from_ipapi_results(raw_ipapi_results={"latitude": row['latitude'], "longitude": row['longitude']})
+        except (TypeError, ValueError):
+            self.coordinates = None
+
+    def __repr__(self):
+        return '<MatchCandidate {}>'.format(self.pk)
+
+
+class MatchCandidateIndex(object):
+    """
+    A per-process index of Speedy Match candidates, keyed by language.
+
+    The index is loaded from the database once, and then refreshed incrementally from the rows which were updated since the last refresh (users, Speedy Match profiles and photos all have an indexed date_updated field). Users which were deleted from the database are dropped by a periodic full refresh.
+
+    The candidates of each language are kept sorted by last visit to Speedy Match, like in SiteProfileManager._get_matching_users_queryset().
+    """
+    VALUES_FIELDS = (
+        'user_id',
+        'user__is_active',
+        'user__is_deleted',
+        'user__gender',
+        'user__diet',
+        'user__smoking_status',
+        'user__relationship_status',
+        'user__date_of_birth',
+        'user__photo__visible_on_website',
+        'active_languages',
+        'gender_to_match',
+        'diet_to_match',
+        'smoking_status_to_match',
+        'relationship_status_to_match',
+        'diet_match',
+        'smoking_status_match',
+        'relationship_status_match',
+        'min_age_to_match',
+        'max_age_to_match',
+        'height',
+        'last_visit',
+        'not_allowed_to_use_speedy_match',
+        'likes_to_user_count',
+        'latitude',
+        'longitude',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._candidates = {}
+        self._candidates_by_language = {}
+        self._last_refresh = None
+        self._last_full_refresh = None
+
+    def _get_queryset(self):
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+        return SpeedyMatchSiteProfile.objects.annotate(
+            latitude=KT('user__last_ip_address_used_raw_ipapi_results__latitude'),
+            longitude=KT('user__last_ip_address_used_raw_ipapi_results__longitude'),
+        ).order_by().values(*self.VALUES_FIELDS)
+
+    def refresh(self):
+        """
+        Refresh the index from the database, if the refresh interval has passed since the last refresh.
+
+        Only one thread refreshes the index at a time. Other threads keep using the current candidates meanwhile, unless the index was never loaded.
+        """
+        if (self._last_full_refresh is None):
+            self._lock.acquire()
+        elif (not (self._lock.acquire(blocking=False))):
+            return
+        try:
+            timezone_now = now()
+            if ((self._last_full_refresh is None) or ((timezone_now - self._last_full_refresh).total_seconds() >= django_settings.MATCH_CANDIDATE_INDEX_FULL_REFRESH_INTERVAL)):
+                candidates = {}
+                rows = self._get_queryset().filter(user__is_active=True, user__is_deleted=False)
+                full_refresh = True
+            elif ((timezone_now - self._last_refresh).total_seconds() >= django_settings.MATCH_CANDIDATE_INDEX_REFRESH_INTERVAL):
+                candidates = dict(self._candidates)
+                # Rows which were saved just before the last refresh may have been committed after it, so read them again.
+                since = self._last_refresh - timedelta(seconds=django_settings.MATCH_CANDIDATE_INDEX_REFRESH_OVERLAP)
+                rows = self._get_queryset().filter(Q(date_updated__gte=since) | Q(user__date_updated__gte=since) | Q(user__photo__date_updated__gte=since))
+                full_refresh = False
+            else:
+                return
+            number_of_rows = 0
+            for row in rows:
+                number_of_rows += 1
+                if ((row['user__is_active']) and (not (row['user__is_deleted'])) and (len(row['active_languages']) > 0)):
+                    candidates[row['user_id']] = MatchCandidate(row=row)
+                else:
+                    candidates.pop(row['user_id'], None)
+            candidates_by_language = {}
+            for candidate in sorted(candidates.values(), key=lambda c: c.last_visit, reverse=True):
+                for language_code in candidate.active_languages:
+                    candidates_by_language.setdefault(language_code, []).append(candidate)
+            self._candidates = candidates
+            self._candidates_by_language = candidates_by_language
+            self._last_refresh = timezone_now
+            if (full_refresh):
+                self._last_full_refresh = timezone_now
+            logger.debug("MatchCandidateIndex::refresh:full_refresh={full_refresh}, number_of_rows={number_of_rows}, number_of_candidates={number_of_candidates}".format(
+                full_refresh=full_refresh,
+                number_of_rows=number_of_rows,
+                number_of_candidates=len(candidates),
+            ))
+        finally:
+            self._lock.release()
+
+    def get_matching_candidates(self, user, from_list=None, limit=None):
+        """
+        Get the candidates who match this user, in the current language. Same filters as SiteProfileManager._get_matching_users_queryset(), but without a database query.
+
+        :param user: The user who is looking for matches.
+        :param from_list: A given list of users IDs (optional).
+        :param limit: The maximal number of candidates to return (optional).
+        :return: A list of matching candidates, sorted by last visit to Speedy Match.
+        """
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+        self.refresh()
+        user_profile = user.speedy_match_profile
+        user_profile._set_values_to_match()
+        language_code = get_language()
+        min_height_to_match, max_height_to_match = SpeedyMatchSiteProfile.settings.MIN_HEIGHT_TO_MATCH, SpeedyMatchSiteProfile.settings.MAX_HEIGHT_TO_MATCH
+        min_date_of_birth, max_date_of_birth = get_age_ranges_match(min_age=user_profile.min_age_to_match, max_age=user_profile.max_age_to_match)
+        user_age = user.get_age()
+        gender_to_match = set(user_profile.gender_to_match)
+        diet_to_match = set(user_profile.diet_to_match)
+        smoking_status_to_match = set(user_profile.smoking_status_to_match)
+        relationship_status_to_match = set(user_profile.relationship_status_to_match)
+        excluded_users_ids = {user.pk} | set(user.blocked_entities_ids) | set(user.blocking_entities_ids)
+        # If from_list is None, get matching users who visited Speedy Match in the last 2 years (720 days). Otherwise, get matching users from the given list.
+        if (from_list is None):
+            min_last_visit = now() - timedelta(days=720)
+            candidates = self._candidates_by_language.get(language_code, [])
+        else:
+            min_last_visit = None
+            candidates = [self._candidates[pk] for pk in set(from_list) if ((pk in self._candidates) and (language_code in self._candidates[pk].active_languages))]
+            candidates = sorted(candidates, key=lambda c: c.last_visit, reverse=True)
+        matching_candidates = []
+        for candidate in candidates:
+            if ((min_last_visit is not None) and (candidate.last_visit < min_last_visit)):
+                # Candidates are sorted by last visit, so all the other candidates visited before too.
+                break
+            if (
+                (candidate.pk not in excluded_users_ids) and
+                (candidate.photo_visible_on_website) and
+                (not (candidate.not_allowed_to_use_speedy_match)) and
+                (candidate.gender in gender_to_match) and
+                (candidate.diet in diet_to_match) and
+                (candidate.smoking_status in smoking_status_to_match) and
+                (candidate.relationship_status in relationship_status_to_match) and
+                (user.gender in candidate.gender_to_match) and
+                (user.diet in candidate.diet_to_match) and
+                (user.smoking_status in candidate.smoking_status_to_match) and
+                (user.relationship_status in candidate.relationship_status_to_match) and
+                (min_date_of_birth <= candidate.date_of_birth <= max_date_of_birth) and
+                (candidate.min_age_to_match <= user_age <= candidate.max_age_to_match) and
+                (candidate.height is not None) and
+                (min_height_to_match <= candidate.height <= max_height_to_match)
+            ):
+                matching_candidates.append(candidate)
+                if ((limit is not None) and (len(matching_candidates) >= limit)):
+                    break
+        return matching_candidates
+
+
+class LazyMatchesList(Sequence):
+    """
+    A list of matching users, which gets users from the database only when they are accessed - for example, only the users of the page being rendered.
+
+    Users which are not active anymore are dropped from the list before its length is used or any user is accessed (in one query of only the ids), so that len() and slices are consistent - for example, when the list is paginated.
+    """
+    def __init__(self, users_ids, ranks):
+        self._users_ids = list(users_ids)
+        self._ranks = dict(zip(self._users_ids, ranks))
+        self._users = {}
+        self._active_users_ids_checked = False
+
+    def _check_active_users_ids(self):
+        if (not (self._active_users_ids_checked)):
+            active_users_ids = set(User.objects.active(pk__in=self._users_ids).values_list('pk', flat=True))
+            self._users_ids = [pk for pk in self._users_ids if (pk in active_users_ids)]
+            self._active_users_ids_checked = True
+
+    @property
+    def users_ids(self):
+        self._check_active_users_ids()
+        return list(self._users_ids)
+
+    def _get_users(self, users_ids):
+        missing_users_ids = [pk for pk in users_ids if (pk not in self._users)]
+        if (len(missing_users_ids) > 0):
+            for user in User.objects.active(pk__in=missing_users_ids):
+                user.speedy_match_profile.rank = self._ranks[user.pk]
+                self._users[user.pk] = user
+            # Users which were deactivated since the list was checked.
+            not_found_users_ids = {pk for pk in missing_users_ids if (pk not in self._users)}
+            if (len(not_found_users_ids) > 0):
+                self._users_ids = [pk for pk in self._users_ids if (pk not in not_found_users_ids)]
+        return [self._users[pk] for pk in users_ids if (pk in self._users)]
+
+    def __len__(self):
+        self._check_active_users_ids()
+        return len(self._users_ids)
+
+    def __getitem__(self, index):
+        self._check_active_users_ids()
+        while True:
+            if (isinstance(index, slice)):
+                users_ids = self._users_ids[index]
+            else:
+                users_ids = [self._users_ids[index]]
+            users = self._get_users(users_ids=users_ids)
+            if (len(users) == len(users_ids)):
+                return users if (isinstance(index, slice)) else users[0]
+
+    def __iter__(self):
+        self._check_active_users_ids()
+        return iter(self._get_users(users_ids=self._users_ids))
+
+    def __contains__(self, item):
+        self._check_active_users_ids()
+        return (getattr(item, 'pk', item) in self._users_ids)
+
+
+candidate_index = MatchCandidateIndex()
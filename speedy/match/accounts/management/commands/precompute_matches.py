@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.cache import close_caches
+from django.core.management import BaseCommand
+from django.db import connections, transaction
+from django.utils import translation
+from django.utils.timezone import now
+
+from speedy.core.accounts.cache_helper import cache_key
+from speedy.core.accounts.models import User
+from speedy.core.base import cache_manager
+from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+logger = logging.getLogger(__name__)
+
+RESULT_CALCULATED = 'calculated'
+RESULT_SKIPPED = 'skipped'
+RESULT_FAILED = 'failed'
+
+
+def precompute_matches(language_code, users_pks, dry_run, force):
+    """
+    Precompute the matches of a batch of users, in one language. Runs in a worker process.
+
+    Args:
+        language_code (str): The language of the matches.
+        users_pks (list): The pks of the users.
+        dry_run (bool): If True, calculate the matches but don't save anything.
+        force (bool): If True, calculate the matches even if they are already in the cache (and not stale).
+
+    Returns:
+        list: A list of (user_pk, result, seconds) tuples, result is RESULT_CALCULATED, RESULT_SKIPPED (fresh matches are already in the cache) or RESULT_FAILED (an exception was raised), seconds is None if the matches were not calculated.
+    """
+    results = []
+    with translation.override(language_code):
+        for user_pk in users_pks:
+            try:
+                # Stale matches are calculated again, they would be refreshed on the user's next visit anyway.
+                if ((not (force)) and (cache_manager.cache_get_fresh(key=cache_key(cache_type='matches', entity_pk=user_pk)) is not None)):
+                    results.append((user_pk, RESULT_SKIPPED, None))
+                    continue
+                start_time = time.perf_counter()
+                if (dry_run):
+                    # _get_matches doesn't save the user's profile (it updates only number_of_matches), so it doesn't invalidate any cached matches. Its update is rolled back.
+                    with transaction.atomic():
+                        user = User.objects.get(pk=user_pk)
+                        SpeedyMatchSiteProfile.objects._get_matches(user=user)
+                        transaction.set_rollback(True)
+                else:
+                    SpeedyMatchSiteProfile.objects._update_matches_cache(user_pk=user_pk)
+                results.append((user_pk, RESULT_CALCULATED, time.perf_counter() - start_time))
+            except Exception as e:
+                logger.error("precompute_matches::user_pk={user_pk}, language_code={language_code}, Exception={e}".format(
+                    user_pk=user_pk,
+                    language_code=language_code,
+                    e=str(e),
+                ))
+                results.append((user_pk, RESULT_FAILED, None))
+    return results
+
+
+class Command(BaseCommand):
+    """
+    Command to precompute and cache the matches of users who visited Speedy Match recently, so that they find their matches in the cache.
+
+    Users are processed by order of their last visit to Speedy Match, in each active language, in batches across a pool of worker processes.
+
+    Methods:
+        add_arguments(self, parser): Adds custom arguments to the command parser.
+        handle(self, *args, **options): Main method to precompute the matches.
+    """
+
+    def add_arguments(self, parser):
+        """
+        Adds custom arguments to the command parser.
+
+        Args:
+            parser (argparse.ArgumentParser): The argument parser instance.
+        """
+        parser.add_argument("--languages", nargs="+", default=None, help="Precompute matches only in these languages. Default: all languages.")
+        parser.add_argument("--days", type=int, default=7, help="Precompute matches of users who visited Speedy Match in the last DAYS days. Default: 7.")
+        parser.add_argument("--max-users", type=int, default=1000, help="The maximal number of users in each language. Default: 1000.")
+        parser.add_argument("--batch-size", type=int, default=20, help="The number of users in each batch sent to a worker process. Default: 20.")
+        parser.add_argument("--processes", type=int, default=2, help="The number of worker processes (0 to precompute in this process). Default: 2.")
+        parser.add_argument("--max-users-per-second", type=float, default=5.0, help="Rate limit, the maximal number of users processed per second (0 for no limit). Default: 5.")
+        parser.add_argument("--force", action="store_true", help="Precompute matches even if they are already in the cache.")
+        parser.add_argument("--dry-run", action="store_true", help="Calculate matches without saving them, and print a timing report.")
+
+    def get_users_pks(self, language_code, days, max_users):
+        return list(SpeedyMatchSiteProfile.objects.filter(
+            user__is_active=True,
+            user__is_deleted=False,
+            active_languages__contains=[language_code],
+            not_allowed_to_use_speedy_match=False,
+            last_visit__gte=now() - timedelta(days=days),
+        ).order_by('-last_visit').values_list('user_id', flat=True)[:max_users])
+
+    def handle(self, *args, **options):
+        """
+        Precomputes the matches of users who visited Speedy Match recently.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Arbitrary keyword arguments.
+        """
+        language_codes = options["languages"] or [language_code for language_code, language_name in django_settings.LANGUAGES]
+        batch_size = max([options["batch_size"], 1])
+        processes = max([options["processes"], 0])
+        max_users_per_second = options["max_users_per_second"]
+        batches = []
+        for language_code in language_codes:
+            users_pks = self.get_users_pks(language_code=language_code, days=options["days"], max_users=options["max_users"])
+            batches.extend([(language_code, users_pks[i:i + batch_size]) for i in range(0, len(users_pks), batch_size)])
+        number_of_users = sum([len(users_pks) for (language_code, users_pks) in batches])
+        self.timings = []
+        self.number_of_skipped_users = 0
+        self.number_of_failed_users = 0
+        start_time = time.perf_counter()
+        submitted_users = 0
+        if (processes == 0):
+            for (language_code, users_pks) in batches:
+                self.wait_for_rate_limit(submitted_users=submitted_users, max_users_per_second=max_users_per_second, start_time=start_time)
+                self.add_results(results=precompute_matches(language_code, users_pks, options["dry_run"], options["force"]))
+                submitted_users += len(users_pks)
+        else:
+            # Worker processes are forked, and must not share the database and cache connections of this process.
+            connections.close_all()
+            close_caches()
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as executor:
+                pending = set()
+                for (language_code, users_pks) in batches:
+                    while (len(pending) >= processes):
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self.add_results(results=future.result())
+                    self.wait_for_rate_limit(submitted_users=submitted_users, max_users_per_second=max_users_per_second, start_time=start_time)
+                    pending.add(executor.submit(precompute_matches, language_code, users_pks, options["dry_run"], options["force"]))
+                    submitted_users += len(users_pks)
+                for future in pending:
+                    self.add_results(results=future.result())
+        elapsed_time = time.perf_counter() - start_time
+        report = self.get_report(number_of_users=number_of_users, number_of_skipped_users=self.number_of_skipped_users, number_of_failed_users=self.number_of_failed_users, timings=self.timings, elapsed_time=elapsed_time, processes=processes, dry_run=options["dry_run"])
+        if (self.number_of_failed_users > 0):
+            logger.error("precompute_matches::{report}".format(report=report))
+        else:
+            logger.debug("precompute_matches::{report}".format(report=report))
+        if (options["dry_run"]):
+            self.stdout.write(report)
+
+    def wait_for_rate_limit(self, submitted_users, max_users_per_second, start_time):
+        if (max_users_per_second > 0):
+            # Don't submit users faster than the rate limit.
+            sleep_time = (submitted_users / max_users_per_second) - (time.perf_counter() - start_time)
+            if (sleep_time > 0):
+                time.sleep(sleep_time)
+
+    def add_results(self, results):
+        for (user_pk, result, seconds) in results:
+            if (result == RESULT_CALCULATED):
+                self.timings.append(seconds)
+            elif (result == RESULT_SKIPPED):
+                self.number_of_skipped_users += 1
+            else:
+                self.number_of_failed_users += 1
+
+    def get_report(self, number_of_users, number_of_skipped_users, number_of_failed_users, timings, elapsed_time, processes, dry_run):
+        timings = sorted(timings)
+        if (len(timings) > 0):
+            mean_time = sum(timings) / len(timings)
+            median_time = timings[len(timings) // 2]
+            p95_time = timings[min([int(len(timings) * 0.95), len(timings) - 1])]
+            max_time = timings[-1]
+        else:
+            mean_time, median_time, p95_time, max_time = 0, 0, 0, 0
+        return "dry_run={dry_run}, number_of_users={number_of_users}, number_of_calculated_users={number_of_calculated_users}, number_of_skipped_users={number_of_skipped_users}, number_of_failed_users={number_of_failed_users}, processes={processes}, elapsed_time={elapsed_time:.1f}s, users_per_second={users_per_second:.2f}, mean_time={mean_time:.3f}s, median_time={median_time:.3f}s, p95_time={p95_time:.3f}s, max_time={max_time:.3f}s, estimated_time_without_rate_limit={estimated_time:.1f}s".format(
+            dry_run=dry_run,
+            number_of_users=number_of_users,
+            number_of_calculated_users=len(timings),
+            number_of_skipped_users=number_of_skipped_users,
+            number_of_failed_users=number_of_failed_users,
+            processes=processes,
+            elapsed_time=elapsed_time,
+            users_per_second=(len(timings) / elapsed_time) if (elapsed_time > 0) else 0,
+            mean_time=mean_time,
+            median_time=median_time,
+            p95_time=p95_time,
+            max_time=max_time,
+            estimated_time=(sum(timings) / max([processes, 1])),
+        )
+
+
@@ -1,6 +1,7 @@
 import logging
 import hashlib
 import random
+from functools import partial
 from datetime import timedelta, datetime, date
 
 from haversine import haversine, Unit
@@ -13,9 +14,10 @@ from django.utils.translation import get_language
 
 from speedy.core.accounts.cache_helper import bust_cache, cache_key
 from speedy.core.base import cache_manager
-from speedy.core.base.utils import get_age_ranges_match, string_is_not_empty
+from speedy.core.base.utils import get_age_ranges_match, string_is_not_empty, to_attribute
 from speedy.core.base.managers import BaseManager
 from speedy.core.accounts.models import User
+from .candidates import candidate_index, get_coordinates_from_ipapi_results, LazyMatchesList
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,15 @@ def invalidate_matches_after_update_user(sender, instance: User, **kwargs):
 
 
 class SiteProfileManager(BaseManager):
+    DISTANCE_OFFSET_DESCRIPTIONS = {
+        0: "30.0",
+        2: "180.0",
+        4: "750.0",
+        6: "2100.0",
+        8: "4500.0",
+        10: "12000.0",
+    }
+
     def _get_rank(self, user, other_user, blocked_users_ids, blocking_users_ids):
         """
         Same function as user.speedy_match_profile.get_matching_rank(other_profile=other_user.speedy_match_profile), but more optimized.
@@ -37,39 +48,98 @@ class SiteProfileManager(BaseManager):
         :param blocking_users_ids: The IDs of the users who blocked this user.
         :return: The rank of the other user.
         """
-        if (user.pk == other_user.pk):
-            return self.model.RANK_0
-        if ((not (user.speedy_match_profile.is_active)) or (not (other_user.speedy_match_profile.is_active))):
-            return self.model.RANK_0
-        if (user.speedy_match_profile.not_allowed_to_use_speedy_match or other_user.speedy_match_profile.not_allowed_to_use_speedy_match):
-            return self.model.RANK_0
-        if (not (other_user.photo.visible_on_website)):
-            return self.model.RANK_0
-        if (other_user.gender not in user.speedy_match_profile.gender_to_match):
-            return self.model.RANK_0
-        if (user.gender not in other_user.speedy_match_profile.gender_to_match):
-            return self.model.RANK_0
-        if (not (user.speedy_match_profile.min_age_to_match <= other_user.get_age() <= user.speedy_match_profile.max_age_to_match)):
-            return self.model.RANK_0
-        if (not (other_user.speedy_match_profile.min_age_to_match <= user.get_age() <= other_user.speedy_match_profile.max_age_to_match)):
-            return self.model.RANK_0
-        if (not ((self.model.settings.MIN_HEIGHT_TO_MATCH <= user.speedy_match_profile.height <= self.model.settings.MAX_HEIGHT_TO_MATCH) and (self.model.settings.MIN_HEIGHT_TO_MATCH <= other_user.speedy_match_profile.height <= self.model.settings.MAX_HEIGHT_TO_MATCH))):
-            return self.model.RANK_0
-        if (other_user.pk in blocked_users_ids):
-            return self.model.RANK_0
-        if (other_user.pk in blocking_users_ids):
-            return self.model.RANK_0
-        other_diet_rank = other_user.speedy_match_profile.diet_match.get(str(user.diet), self.model.RANK_0)
-        other_smoking_status_rank = other_user.speedy_match_profile.smoking_status_match.get(str(user.smoking_status), self.model.RANK_0)
-        other_relationship_status_rank = other_user.speedy_match_profile.relationship_status_match.get(str(user.relationship_status), self.model.RANK_0)
-        other_user_rank = min([other_diet_rank, other_smoking_status_rank, other_relationship_status_rank])
-        if (other_user_rank == self.model.RANK_0):
-            return self.model.RANK_0
-        diet_rank = user.speedy_match_profile.diet_match.get(str(other_user.diet), self.model.RANK_0)
-        smoking_status_rank = user.speedy_match_profile.smoking_status_match.get(str(other_user.smoking_status), self.model.RANK_0)
-        relationship_status_rank = user.speedy_match_profile.relationship_status_match.get(str(other_user.relationship_status), self.model.RANK_0)
-        rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
-        return rank
+        return self._get_ranks(user=user, other_users=[other_user], blocked_users_ids=blocked_users_ids, blocking_users_ids=blocking_users_ids)[0]
+
+    def _get_ranks(self, user, other_users, blocked_users_ids, blocking_users_ids):
+        """
+        Same function as self._get_rank(), but for a list of users.
+
+        Values which depend only on the user (such as the user's age and match preferences) are calculated only once, and not once per other user.
+
+        :param user: The user who is looking for a match.
+        :param other_users: The other users who are being checked for a match.
+        :param blocked_users_ids: The IDs of the users who this user blocked.
+        :param blocking_users_ids: The IDs of the users who blocked this user.
+        :return: A list of ranks of the other users, in the same order as other_users.
+        """
+        RANK_0 = self.model.RANK_0
+        user_profile = user.speedy_match_profile
+        if ((not (user_profile.is_active)) or (user_profile.not_allowed_to_use_speedy_match)):
+            return [RANK_0 for other_user in other_users]
+        min_height_to_match, max_height_to_match = self.model.settings.MIN_HEIGHT_TO_MATCH, self.model.settings.MAX_HEIGHT_TO_MATCH
+        user_pk = user.pk
+        user_gender = user.gender
+        user_age = user.get_age()
+        user_height_is_valid = ((user_profile.height is not None) and (min_height_to_match <= user_profile.height <= max_height_to_match))
+        gender_to_match = set(user_profile.gender_to_match)
+        min_age_to_match, max_age_to_match = user_profile.min_age_to_match, user_profile.max_age_to_match
+        diet_match, smoking_status_match, relationship_status_match = user_profile.diet_match, user_profile.smoking_status_match, user_profile.relationship_status_match
+        user_diet, user_smoking_status, user_relationship_status = str(user.diet), str(user.smoking_status), str(user.relationship_status)
+        excluded_users_ids = set(blocked_users_ids) | set(blocking_users_ids)
+
+        def get_rank(other_user):
+            if (other_user.pk == user_pk):
+                return RANK_0
+            other_user_profile = other_user.speedy_match_profile
+            if ((not (other_user_profile.is_active)) or (other_user_profile.not_allowed_to_use_speedy_match)):
+                return RANK_0
+            if (not (other_user.photo.visible_on_website)):
+                return RANK_0
+            if (other_user.gender not in gender_to_match):
+                return RANK_0
+            if (user_gender not in other_user_profile.gender_to_match):
+                return RANK_0
+            if (not (min_age_to_match <= other_user.get_age() <= max_age_to_match)):
+                return RANK_0
+            if (not (other_user_profile.min_age_to_match <= user_age <= other_user_profile.max_age_to_match)):
+                return RANK_0
+            if (not ((user_height_is_valid) and (min_height_to_match <= other_user_profile.height <= max_height_to_match))):
+                return RANK_0
+            if (other_user.pk in excluded_users_ids):
+                return RANK_0
+            other_diet_rank = other_user_profile.diet_match.get(user_diet, RANK_0)
+            other_smoking_status_rank = other_user_profile.smoking_status_match.get(user_smoking_status, RANK_0)
+            other_relationship_status_rank = other_user_profile.relationship_status_match.get(user_relationship_status, RANK_0)
+            other_user_rank = min([other_diet_rank, other_smoking_status_rank, other_relationship_status_rank])
+            if (other_user_rank == RANK_0):
+                return RANK_0
+            diet_rank = diet_match.get(str(other_user.diet), RANK_0)
+            smoking_status_rank = smoking_status_match.get(str(other_user.smoking_status), RANK_0)
+            relationship_status_rank = relationship_status_match.get(str(other_user.relationship_status), RANK_0)
+            rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
+            return rank
+
+        return [get_rank(other_user=other_user) for other_user in other_users]
+
+    def _get_candidates_ranks(self, user, candidates):
+        """
+        Same function as self._get_ranks(), but for candidates from the candidate index (which already match this user, except the ranks).
+
+        :param user: The user who is looking for a match.
+        :param candidates: The candidates who are being checked for a match.
+        :return: A list of ranks of the candidates, in the same order as candidates.
+        """
+        RANK_0 = self.model.RANK_0
+        user_profile = user.speedy_match_profile
+        if ((not (user_profile.is_active)) or (user_profile.not_allowed_to_use_speedy_match)):
+            return [RANK_0 for candidate in candidates]
+        diet_match, smoking_status_match, relationship_status_match = user_profile.diet_match, user_profile.smoking_status_match, user_profile.relationship_status_match
+        user_diet, user_smoking_status, user_relationship_status = str(user.diet), str(user.smoking_status), str(user.relationship_status)
+
+        def get_rank(candidate):
+            other_diet_rank = candidate.diet_match.get(user_diet, RANK_0)
+            other_smoking_status_rank = candidate.smoking_status_match.get(user_smoking_status, RANK_0)
+            other_relationship_status_rank = candidate.relationship_status_match.get(user_relationship_status, RANK_0)
+            other_user_rank = min([other_diet_rank, other_smoking_status_rank, other_relationship_status_rank])
+            if (other_user_rank == RANK_0):
+                return RANK_0
+            diet_rank = diet_match.get(str(candidate.diet), RANK_0)
+            smoking_status_rank = smoking_status_match.get(str(candidate.smoking_status), RANK_0)
+            relationship_status_rank = relationship_status_match.get(str(candidate.relationship_status), RANK_0)
+            rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
+            return rank
+
+        return [get_rank(candidate=candidate) for candidate in candidates]
 
     def _get_distance_offset(self, index):
         """
@@ -131,7 +201,7 @@ class SiteProfileManager(BaseManager):
         qs = User.objects.active(
             **filter_dict
         ).exclude(
-            pk__in=[user.pk] + blocked_users_ids + blocking_users_ids,
+            pk__in={user.pk} | blocked_users_ids | blocking_users_ids,
         ).order_by('-speedy_match_site_profile__last_visit')
         return qs
 
@@ -154,95 +224,116 @@ class SiteProfileManager(BaseManager):
         today = date.today()
         blocked_users_ids = user.blocked_entities_ids
         blocking_users_ids = user.blocking_entities_ids
-        qs = self._get_matching_users_queryset(user=user)
-        _user_list = qs[:2400]
+        # Calculate the number of days since each user's last visit only once, and use it in all the calculations below.
+        if (django_settings.USE_MATCH_CANDIDATE_INDEX):
+            candidates = candidate_index.get_matching_candidates(user=user, limit=2400)
+            _user_list = [(c, (timezone_now - c.last_visit).days) for c in candidates]
+        else:
+            qs = self._get_matching_users_queryset(user=user)
+            _user_list = [(u, (timezone_now - u.speedy_match_profile.last_visit).days) for u in qs[:2400]]
         # If there are at least 1,080 users who visited Speedy Match in the last 4 months, use them. Otherwise check 8 months, 12 months etc.
-        user_list = []
+        user_list_with_last_visit_days = []
         months = None
         for m in range(4, 28, 4):
             if (months is None):
-                user_list = [u for u in _user_list if ((timezone_now - u.speedy_match_profile.last_visit).days <= m * 30)]
-                if ((m == 24) or (len(user_list) >= 1080)):
+                user_list_with_last_visit_days = [(u, last_visit_days) for (u, last_visit_days) in _user_list if (last_visit_days <= m * 30)]
+                if ((m == 24) or (len(user_list_with_last_visit_days) >= 1080)):
                     months = m
+        if (django_settings.USE_MATCH_CANDIDATE_INDEX):
+            # Get from the database only the candidates who are checked.
+            other_users_coordinates = {c.pk: c.coordinates for (c, last_visit_days) in user_list_with_last_visit_days}
+            users_dict = {u.pk: u for u in User.objects.active(pk__in=list(other_users_coordinates.keys()))}
+            user_list_with_last_visit_days = [(users_dict[c.pk], last_visit_days) for (c, last_visit_days) in user_list_with_last_visit_days if (c.pk in users_dict)]
+        else:
+            other_users_coordinates = None
+        user_list = [u for (u, last_visit_days) in user_list_with_last_visit_days]
+        ranks = self._get_ranks(
+            user=user,
+            other_users=user_list,
+            blocked_users_ids=blocked_users_ids,
+            blocking_users_ids=blocking_users_ids,
+        )
+        # Generate random numbers which change every 4 hours, but don't change when reloading the page.
+        random_string_format = "$$$-{user_id}-{{other_user_id}}-{today}-{hours}-{{salt}}-$$$".format(user_id=user.id, today=today.isoformat(), hours=(datetime_now.hour // 4))
+
+        def get_random_number(other_user, salt, modulo):
+            return int(hashlib.sha384(random_string_format.format(other_user_id=other_user.id, salt=salt).encode('utf-8')).hexdigest()[-32:], 16) % modulo
+
+        distance_offsets = {index: self._get_distance_offset(index=index) for index in [0, 2, 4, 6, 8, 10]}
+        user_coordinates = None
+        if (django_settings.USE_DISTANCE_BETWEEN_USERS_FROM_IPAPI_RESULTS):
+            try:
+                user_coordinates = get_coordinates_from_ipapi_results(raw_ipapi_results=user.last_ip_address_used_raw_ipapi_results)
+            except Exception as e:
+                logger.debug("SiteProfileManager::_get_matches:Can't calculate distance between users, user={user}, Exception={e} (registered {registered_days_ago} days ago)".format(
+                    user=user,
+                    e=str(e),
+                    registered_days_ago=(now() - user.date_created).days,
+                ))
+        user_is_active = user.speedy_match_profile.is_active
         matches_list = []
-        for other_user in user_list:
-            other_user.speedy_match_profile.rank = self._get_rank(
-                user=user,
-                other_user=other_user,
-                blocked_users_ids=blocked_users_ids,
-                blocking_users_ids=blocking_users_ids,
-            )
-            if ((user.speedy_match_profile.is_active) and (other_user.speedy_match_profile.is_active) and (other_user.speedy_match_profile.rank > self.model.RANK_0)):
-                other_user.speedy_match_profile._likes_to_user_count = other_user.speedy_match_profile.likes_to_user_count
-                other_user.speedy_match_profile._all_friends_count = other_user.speedy_net_profile.all_friends_count
-                other_user.speedy_match_profile._distance_between_users = None
-                other_user.speedy_match_profile._user_last_visit_days_offset = 0 * 30
-                if ((timezone_now - other_user.speedy_match_profile.last_visit).days >= 180):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 6 * 30
-                if ((timezone_now - other_user.date_created).days < 15) or ((timezone_now - other_user.speedy_match_profile.last_visit).days < 5):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+        sort_keys = []
+        for (other_user, last_visit_days), rank in zip(user_list_with_last_visit_days, ranks):
+            other_user_profile = other_user.speedy_match_profile
+            other_user_profile.rank = rank
+            if ((user_is_active) and (other_user_profile.is_active) and (rank > self.model.RANK_0)):
+                other_user_profile._likes_to_user_count = other_user_profile.likes_to_user_count
+                other_user_profile._all_friends_count = other_user.speedy_net_profile.all_friends_count
+                other_user_profile._distance_between_users = None
+                offset = 0 * 30
+                if (last_visit_days >= 180):
+                    offset += 6 * 30
+                if ((timezone_now - other_user.date_created).days < 15) or (last_visit_days < 5):
+                    offset += 0 * 30
                 else:
-                    if (other_user.speedy_match_profile.rank >= self.model.RANK_5) and ((timezone_now - other_user.speedy_match_profile.last_visit).days < 10):
-                        other_user.speedy_match_profile._user_last_visit_days_offset += 0
+                    if (rank >= self.model.RANK_5) and (last_visit_days < 10):
+                        offset += 0
                     else:
-                        if (other_user.speedy_match_profile._likes_to_user_count >= 10):
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 0
-                        elif (other_user.speedy_match_profile._likes_to_user_count >= 3):
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 30
+                        if (other_user_profile._likes_to_user_count >= 10):
+                            offset += 0
+                        elif (other_user_profile._likes_to_user_count >= 3):
+                            offset += 30
                         else:
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 80
-                    if (other_user.speedy_match_profile.rank >= self.model.RANK_5):
-                        other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                            offset += 80
+                    if (rank >= self.model.RANK_5):
+                        offset += 0 * 30
                     else:
-                        if (other_user.speedy_match_profile._all_friends_count >= 20):
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                        if (other_user_profile._all_friends_count >= 20):
+                            offset += 0 * 30
                         else:
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
+                            offset += 1 * 30
                         if (other_user.get_age() >= 18):
-                            if (120 <= other_user.speedy_match_profile.height <= 235):
-                                other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                            if (120 <= other_user_profile.height <= 235):
+                                offset += 0 * 30
                             else:
-                                other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
+                                offset += 1 * 30
                         else:
-                            if (50 <= other_user.speedy_match_profile.height <= 235):
-                                other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                            if (50 <= other_user_profile.height <= 235):
+                                offset += 0 * 30
                             else:
-                                other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
-                if ((timezone_now - other_user.speedy_match_profile.last_visit).days < 10):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                                offset += 1 * 30
+                if (last_visit_days < 10):
+                    offset += 0 * 30
                 else:
-                    if (other_user.speedy_match_profile.rank >= self.model.RANK_5) and ((timezone_now - other_user.speedy_match_profile.last_visit).days < 20):
-                        other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                    if (rank >= self.model.RANK_5) and (last_visit_days < 20):
+                        offset += 0 * 30
                     else:
-                        # Generate a random number which changes every 4 hours, but doesn't change when reloading the page.
-                        s = int(hashlib.sha384("$$$-{}-{}-{}-{}-{}-$$$".format(user.id, other_user.id, today.isoformat(), (datetime_now.hour // 4), "97-97a").encode('utf-8')).hexdigest()[-32:], 16) % 12
+                        s = get_random_number(other_user=other_user, salt="97-97a", modulo=12)
                         if (5 <= s < 9):  # 4/12
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
+                            offset += 1 * 30
                         elif (9 <= s < 12):  # 3/12
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 2 * 30
+                            offset += 2 * 30
                         else:  # 5/12
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                            offset += 0 * 30
                 if (django_settings.USE_DISTANCE_BETWEEN_USERS_FROM_IPAPI_RESULTS):
-                    # Generate a random number which changes every 4 hours, but doesn't change when reloading the page.
-                    s = int(hashlib.sha384("$$$-{}-{}-{}-{}-{}-$$$".format(user.id, other_user.id, today.isoformat(), (datetime_now.hour // 4), "92-92a").encode('utf-8')).hexdigest()[-32:], 16) % 6000
+                    s = get_random_number(other_user=other_user, salt="92-92a", modulo=6000)
                     if (0 <= s < 1920):  # 1920/6000
                         if (0 <= s < 144):  # 144/6000
                             index = (s % 3) * 2
                         else:  # 1776/6000
                             index = (s % 3 + 3) * 2
-                        distance_offset = self._get_distance_offset(index=index)
-                        if (index == 0):
-                            other_user.speedy_match_profile._distance_between_users = "30.0 distance_offset #1"
-                        elif (index == 2):
-                            other_user.speedy_match_profile._distance_between_users = "180.0 distance_offset #1"
-                        elif (index == 4):
-                            other_user.speedy_match_profile._distance_between_users = "750.0 distance_offset #1"
-                        elif (index == 6):
-                            other_user.speedy_match_profile._distance_between_users = "2100.0 distance_offset #1"
-                        elif (index == 8):
-                            other_user.speedy_match_profile._distance_between_users = "4500.0 distance_offset #1"
-                        elif (index == 10):
-                            other_user.speedy_match_profile._distance_between_users = "12000.0 distance_offset #1"
+                        distance_offset = distance_offsets[index]
+                        other_user_profile._distance_between_users = "{} distance_offset #1".format(self.DISTANCE_OFFSET_DESCRIPTIONS[index])
                         if (random.randint(0, 7999) == 0):
                             logger.debug("SiteProfileManager::_get_matches:distance_offset #1: {user} and {other_user}, s is {s}, distance offset is {distance_offset} .".format(
                                 user=user,
@@ -251,37 +342,28 @@ class SiteProfileManager(BaseManager):
                                 distance_offset=distance_offset,
                             ))
                     else:
-                        distance_offset = self._get_distance_offset(index=10)
+                        distance_offset = distance_offsets[10]
                         try:
-                            if ((user.last_ip_address_used_raw_ipapi_results is not None) and (other_user.last_ip_address_used_raw_ipapi_results is not None)):
-                                if (
-                                    ("latitude" in user.last_ip_address_used_raw_ipapi_results) and
-                                    (user.last_ip_address_used_raw_ipapi_results["latitude"] is not None) and
-                                    ("longitude" in user.last_ip_address_used_raw_ipapi_results) and
-                                    (user.last_ip_address_used_raw_ipapi_results["longitude"] is not None) and
-                                    ("latitude" in other_user.last_ip_address_used_raw_ipapi_results) and
-                                    (other_user.last_ip_address_used_raw_ipapi_results["latitude"] is not None) and
-                                    ("longitude" in other_user.last_ip_address_used_raw_ipapi_results) and
-                                    (other_user.last_ip_address_used_raw_ipapi_results["longitude"] is not None)
-                                ):
-                                    user_latitude = float(user.last_ip_address_used_raw_ipapi_results["latitude"])
-                                    user_longitude = float(user.last_ip_address_used_raw_ipapi_results["longitude"])
-                                    other_user_latitude = float(other_user.last_ip_address_used_raw_ipapi_results["latitude"])
-                                    other_user_longitude = float(other_user.last_ip_address_used_raw_ipapi_results["longitude"])
-                                    distance_between_users = haversine(point1=(user_latitude, user_longitude), point2=(other_user_latitude, other_user_longitude), unit=Unit.KILOMETERS)
+                            if (user_coordinates is not None):
+                                if (other_users_coordinates is not None):
+                                    other_user_coordinates = other_users_coordinates[other_user.pk]
+                                else:
+                                    other_user_coordinates = get_coordinates_from_ipapi_results(raw_ipapi_results=other_user.last_ip_address_used_raw_ipapi_results)
+                                if (other_user_coordinates is not None):
+                                    distance_between_users = haversine(point1=user_coordinates, point2=other_user_coordinates, unit=Unit.KILOMETERS)
                                     if (distance_between_users < 60):
-                                        distance_offset = self._get_distance_offset(index=0)
+                                        distance_offset = distance_offsets[0]
                                     elif (distance_between_users < 300):
-                                        distance_offset = self._get_distance_offset(index=2)
+                                        distance_offset = distance_offsets[2]
                                     elif (distance_between_users < 1200):
-                                        distance_offset = self._get_distance_offset(index=4)
+                                        distance_offset = distance_offsets[4]
                                     elif (distance_between_users < 3000):
-                                        distance_offset = self._get_distance_offset(index=6)
+                                        distance_offset = distance_offsets[6]
                                     elif (distance_between_users < 6000):
-                                        distance_offset = self._get_distance_offset(index=8)
+                                        distance_offset = distance_offsets[8]
                                     else:
-                                        distance_offset = self._get_distance_offset(index=10)
-                                    other_user.speedy_match_profile._distance_between_users = distance_between_users
+                                        distance_offset = distance_offsets[10]
+                                    other_user_profile._distance_between_users = distance_between_users
                                     if (random.randint(0, 7999) == 0):
                                         logger.debug("SiteProfileManager::_get_matches:distance_offset #2:s is {s}, distance offset is {distance_offset}, The distance between {user} and {other_user} is {distance_between_users} km.".format(
                                             user=user,
@@ -297,56 +379,57 @@ class SiteProfileManager(BaseManager):
                                 e=str(e),
                                 registered_days_ago=(now() - user.date_created).days,
                             ))
-                            distance_offset = self._get_distance_offset(index=10)
-                    other_user.speedy_match_profile._user_last_visit_days_offset += distance_offset
-                if (other_user.speedy_match_profile.rank >= self.model.RANK_5):
-                    other_user.speedy_match_profile._user_last_visit_days_offset -= 1 * 30
-                if (other_user.speedy_match_profile._user_last_visit_days_offset < 0):
-                    other_user.speedy_match_profile._user_last_visit_days_offset = 0
-                profile_description = other_user.speedy_match_profile.profile_description
+                            distance_offset = distance_offsets[10]
+                    offset += distance_offset
+                if (rank >= self.model.RANK_5):
+                    offset -= 1 * 30
+                if (offset < 0):
+                    offset = 0
+                profile_description = other_user_profile.profile_description
                 if (string_is_not_empty(profile_description)):
                     profile_description_split = profile_description.split()
                 else:
                     profile_description_split = "".split()
-                match_description = other_user.speedy_match_profile.match_description
+                match_description = other_user_profile.match_description
                 if (string_is_not_empty(match_description)):
                     match_description_split = match_description.split()
                 else:
                     match_description_split = "".split()
                 if ((string_is_not_empty(profile_description)) and (len(profile_description) >= 20) and (len(profile_description_split) >= 10)):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                    offset += 0 * 30
                 else:
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 3 * 30
+                    offset += 3 * 30
                 if ((string_is_not_empty(match_description)) and (len(match_description) >= 20) and (len(match_description_split) >= 8)):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                    offset += 0 * 30
                 else:
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
+                    offset += 1 * 30
                 if ((string_is_not_empty(profile_description)) and (len(profile_description_split) > 0) and (len(profile_description_split) / len(set(profile_description_split)) < 2.5)):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                    offset += 0 * 30
                 else:
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 20 * 30
+                    offset += 20 * 30
                 if ((string_is_not_empty(match_description)) and (len(match_description_split) > 0) and (len(match_description_split) / len(set(match_description_split)) < 2.5)):
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 0 * 30
+                    offset += 0 * 30
                 else:
-                    other_user.speedy_match_profile._user_last_visit_days_offset += 20 * 30
-                other_user.speedy_match_profile._user_last_visit_days_offset += other_user.speedy_match_profile.profile_picture_months_offset * 30
-                # Generate a random number which changes every 4 hours, but doesn't change when reloading the page.
-                s = int(hashlib.sha384("$$$-{}-{}-{}-{}-{}-$$$".format(user.id, other_user.id, today.isoformat(), (datetime_now.hour // 4), "98-98a").encode('utf-8')).hexdigest()[-32:], 16) % 77
+                    offset += 20 * 30
+                offset += other_user_profile.profile_picture_months_offset * 30
+                s = get_random_number(other_user=other_user, salt="98-98a", modulo=77)
                 if (74 <= s < 77):  # 3/77
-                    other_user.speedy_match_profile._user_last_visit_days_offset -= 6 * 30
+                    offset -= 6 * 30
                 elif (71 <= s < 74):  # 3/77
-                    other_user.speedy_match_profile._user_last_visit_days_offset -= 2 * 30
+                    offset -= 2 * 30
                 else:  # 71/77
-                    if ((timezone_now - other_user.speedy_match_profile.last_visit).days < 5):
-                        other_user.speedy_match_profile._user_last_visit_days_offset -= 0 * 30
+                    if (last_visit_days < 5):
+                        offset -= 0 * 30
                     else:
                         if (48 <= s < 71):  # 23/77
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 1 * 30
+                            offset += 1 * 30
                         elif (25 <= s < 48):  # 23/77
-                            other_user.speedy_match_profile._user_last_visit_days_offset += 2 * 30
+                            offset += 2 * 30
                         else:  # 25/77
-                            other_user.speedy_match_profile._user_last_visit_days_offset -= 0 * 30
+                            offset -= 0 * 30
+                other_user_profile._user_last_visit_days_offset = offset
                 matches_list.append(other_user)
+                sort_keys.append((-(max([(last_visit_days + offset), 0]) // 40), rank, other_user_profile.last_visit))
         if (not (len(matches_list) == len(user_list))):
             if (((not (user.speedy_match_profile.is_active)) or (user.speedy_match_profile.not_allowed_to_use_speedy_match)) and (len(matches_list) == 0)):
                 pass
@@ -362,11 +445,13 @@ class SiteProfileManager(BaseManager):
                     number_of_users=len(user_list),
                     number_of_matches=len(matches_list),
                 ))
-        matches_list = sorted(matches_list, key=lambda u: (-(max([((timezone_now - u.speedy_match_profile.last_visit).days + u.speedy_match_profile._user_last_visit_days_offset), 0]) // 40), u.speedy_match_profile.rank, u.speedy_match_profile.last_visit), reverse=True)
+        # Sort by the precalculated sort keys. The sort is stable, so users with equal sort keys keep their order from the database.
+        matches_order = sorted(range(len(matches_list)), key=lambda i: sort_keys[i], reverse=True)
+        matches_list = [matches_list[i] for i in matches_order]
         matches_list = matches_list[:720]
-        # Save number of matches in this language in user's profile.
+        # Save number of matches in this language in user's profile. Update only this field, without calling save() - its post_save receivers would invalidate the matches which are being calculated (for example, when stale matches are refreshed in the background).
         user.speedy_match_profile.number_of_matches = len(matches_list)
-        user.speedy_match_profile.save()
+        self.model.objects.filter(pk=user.speedy_match_profile.pk).update(**{to_attribute(name='number_of_matches'): len(matches_list)})
         logger.debug("SiteProfileManager::_get_matches:end:user={user}, language_code={language_code}, months={months}, number_of_users={number_of_users}, number_of_matches={number_of_matches}, user_id_list={user_id_list}, distance_between_users_list={distance_between_users_list}".format(
             user=user,
             language_code=language_code,
@@ -407,16 +492,18 @@ class SiteProfileManager(BaseManager):
         blocked_users_ids = user.blocked_entities_ids
         blocking_users_ids = user.blocking_entities_ids
         qs = self._get_matching_users_queryset(user=user, from_list=from_list)
-        user_list = qs
+        user_list = list(qs)
+        ranks = self._get_ranks(
+            user=user,
+            other_users=user_list,
+            blocked_users_ids=blocked_users_ids,
+            blocking_users_ids=blocking_users_ids,
+        )
+        user_is_active = user.speedy_match_profile.is_active
         matches_list = []
-        for other_user in user_list:
-            other_user.speedy_match_profile.rank = self._get_rank(
-                user=user,
-                other_user=other_user,
-                blocked_users_ids=blocked_users_ids,
-                blocking_users_ids=blocking_users_ids,
-            )
-            if ((user.speedy_match_profile.is_active) and (other_user.speedy_match_profile.is_active) and (other_user.speedy_match_profile.rank > self.model.RANK_0)):
+        for other_user, rank in zip(user_list, ranks):
+            other_user.speedy_match_profile.rank = rank
+            if ((user_is_active) and (other_user.speedy_match_profile.is_active) and (rank > self.model.RANK_0)):
                 matches_list.append(other_user)
         if (not (len(matches_list) == len(user_list))):
             if (((not (user.speedy_match_profile.is_active)) or (user.speedy_match_profile.not_allowed_to_use_speedy_match)) and (len(matches_list) == 0)):
@@ -445,6 +532,32 @@ class SiteProfileManager(BaseManager):
             ))
         return matches_list
 
+    def _get_matches_from_candidate_index(self, user, from_list):
+        """
+        Same function as self.get_matches_from_list(), but filters and ranks the users from the candidate index, without a database query.
+
+        :param user: The user who is looking for matches.
+        :param from_list: A given list of users IDs.
+        :return: matching users, in the same order as from_list. Users are fetched from the database only when they are accessed.
+        """
+        candidates = candidate_index.get_matching_candidates(user=user, from_list=from_list)
+        ranks = self._get_candidates_ranks(user=user, candidates=candidates)
+        ranks_dict = {c.pk: rank for (c, rank) in zip(candidates, ranks) if (rank > self.model.RANK_0)}
+        users_ids = [pk for pk in from_list if (pk in ranks_dict)]
+        return LazyMatchesList(users_ids=users_ids, ranks=[ranks_dict[pk] for pk in users_ids])
+
+    def _update_matches_cache(self, user_pk, generation=None):
+        """
+        Calculate the matches of a user and save them in the cache. Used to refresh stale matches in the background.
+
+        :param user_pk: The pk of the user who is looking for matches.
+        :param generation: The generation of the stale matches. If the matches were busted (or replaced) while they were calculated, the calculated matches are not saved.
+        """
+        user = User.objects.get(pk=user_pk)
+        matches_list = self._get_matches(user=user)
+        matches_users_ids = [u.id for u in matches_list]
+        cache_manager.cache_set(key=cache_key(cache_type='matches', entity_pk=user.pk), value=matches_users_ids, timeout=django_settings.CACHE_SET_MATCHES_TIMEOUT, stale_timeout=django_settings.CACHE_SET_MATCHES_STALE_TIMEOUT, generation=generation)
+
     def get_matches(self, user):
         """
         Get matches from database.
@@ -460,38 +573,54 @@ class SiteProfileManager(BaseManager):
             language_code=language_code,
         ))
         matches_key = cache_key(cache_type='matches', entity_pk=user.pk)
-        matches_users_ids = cache_manager.cache_get(key=matches_key, sliding_timeout=django_settings.CACHE_GET_MATCHES_SLIDING_TIMEOUT)
+        # If the matches are stale, they are used and refreshed in the background.
+        matches_users_ids = cache_manager.cache_get(key=matches_key, sliding_timeout=django_settings.CACHE_GET_MATCHES_SLIDING_TIMEOUT, revalidate=partial(self._update_matches_cache, user_pk=user.pk))
         matches_list = []
+        lease_acquired = False
+        if (matches_users_ids is None):
+            lease_acquired = cache_manager.cache_acquire_lease(key=matches_key, lease_timeout=django_settings.CACHE_MATCHES_LEASE_TIMEOUT)
+            if (not (lease_acquired)):
+                # Another request is already calculating this user's matches. Wait for its result instead of calculating them again.
+                matches_users_ids = cache_manager.cache_wait_for_value(key=matches_key, wait_timeout=django_settings.CACHE_MATCHES_LEASE_WAIT_TIMEOUT)
         if (matches_users_ids is not None):
-            matches_list = self.get_matches_from_list(user=user, from_list=matches_users_ids)
-            matches_order = {u: i for i, u in enumerate(matches_users_ids)}
-            matches_list = sorted(matches_list, key=lambda u: matches_order[u.id])
-            if (not (len(matches_list) == len(matches_users_ids))):
+            if (django_settings.USE_MATCH_CANDIDATE_INDEX):
+                matches_list = self._get_matches_from_candidate_index(user=user, from_list=matches_users_ids)
+                matches_list_users_ids = matches_list.users_ids
+            else:
+                matches_list = self.get_matches_from_list(user=user, from_list=matches_users_ids)
+                matches_order = {u: i for i, u in enumerate(matches_users_ids)}
+                matches_list = sorted(matches_list, key=lambda u: matches_order[u.id])
+                matches_list_users_ids = [u.id for u in matches_list]
+            if (not (len(matches_list_users_ids) == len(matches_users_ids))):
                 # Some users are missing from the list. Call self._get_matches() instead.
                 logger.debug("SiteProfileManager::get_matches:matches are missing from matches_list, calling self._get_matches():user={user}, language_code={language_code}, len(matches_users_ids)={len_matches_users_ids}, len(matches_list)={len_matches_list}".format(
                     user=user,
                     language_code=language_code,
                     len_matches_users_ids=len(matches_users_ids),
-                    len_matches_list=len(matches_list),
+                    len_matches_list=len(matches_list_users_ids),
                 ))
                 bust_cache(cache_type='matches', entities_pks=[user.pk])
                 matches_users_ids = None
                 matches_list = []
             else:
-                if (not (matches_users_ids == [u.id for u in matches_list])):
+                if (not (matches_users_ids == matches_list_users_ids)):
                     # This is an error. Lists should be identical.
-                    logger.error('SiteProfileManager::get_matches:get inside "if (not (matches_users_ids == [u.id for u in matches_list])):", user={user}, language_code={language_code}, number_of_matches={number_of_matches}'.format(
+                    logger.error('SiteProfileManager::get_matches:get inside "if (not (matches_users_ids == matches_list_users_ids)):", user={user}, language_code={language_code}, number_of_matches={number_of_matches}'.format(
                         user=user,
                         language_code=language_code,
-                        number_of_matches=len(matches_list),
+                        number_of_matches=len(matches_list_users_ids),
                     ))
         if (matches_users_ids is not None):
             from_cache = "yes"
         else:
             from_cache = "no"
-            matches_list = self._get_matches(user=user)
-            matches_users_ids = [u.id for u in matches_list]
-            cache_manager.cache_set(key=matches_key, value=matches_users_ids, timeout=django_settings.CACHE_SET_MATCHES_TIMEOUT)
+            try:
+                matches_list = self._get_matches(user=user)
+                matches_users_ids = [u.id for u in matches_list]
+                cache_manager.cache_set(key=matches_key, value=matches_users_ids, timeout=django_settings.CACHE_SET_MATCHES_TIMEOUT, stale_timeout=django_settings.CACHE_SET_MATCHES_STALE_TIMEOUT)
+            finally:
+                if (lease_acquired):
+                    cache_manager.cache_release_lease(key=matches_key)
         logger.debug("SiteProfileManager::get_matches:end:user={user}, language_code={language_code}, number_of_matches={number_of_matches}, from_cache={from_cache}".format(
             user=user,
             language_code=language_code,
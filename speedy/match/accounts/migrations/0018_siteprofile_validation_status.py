@@ -0,0 +1,19 @@
+# Generated by Django 6.0.8 on 2026-10-18 12:00
+
+import speedy.match.accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match_accounts', '0017_siteprofile_activation_step_ar_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='siteprofile',
+            name='validation_status',
+            field=models.JSONField(default=speedy.match.accounts.models.SiteProfile.validation_status_default),
+        ),
+    ]
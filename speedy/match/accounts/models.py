@@ -56,6 +56,7 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
         profile_picture_months_offset (PositiveSmallIntegerField): Offset for profile picture months.
         not_allowed_to_use_speedy_match (BooleanField): Whether the user is allowed to use Speedy Match.
         likes_to_user_count (PositiveIntegerField): Count of likes to the user.
+        validation_status (JSONField): The result of the last validation of the profile in each language, and a fingerprint of the validated values.
     """
     LOCALIZABLE_FIELDS = ('profile_description', 'children', 'more_children', 'match_description')
 
@@ -80,6 +81,9 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
     )
     RANK_VALID_VALUES = [choice[0] for choice in RANK_CHOICES]
 
+    # Increase when the validators of the profile change, to validate all the profiles again.
+    VALIDATION_VERSION = 1
+
     _optimistic_locking_fields = ("active_languages", "not_allowed_to_use_speedy_match")
 
     @staticmethod
@@ -182,6 +186,16 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
         """
         return list()
 
+    @staticmethod
+    def validation_status_default():
+        """
+        Returns the default value for validation status.
+
+        Returns:
+            dict: An empty dictionary.
+        """
+        return dict()
+
     @staticmethod
     def get_rank_description(rank):
         """
@@ -272,6 +286,7 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
     profile_picture_months_offset = models.PositiveSmallIntegerField(default=5)  # If a face is detected, will be 0. Otherwise, will be 5 months.
     not_allowed_to_use_speedy_match = models.BooleanField(default=False)  # If set to True, user will have no matches.
     likes_to_user_count = models.PositiveIntegerField(default=0)
+    validation_status = models.JSONField(default=validation_status_default.__func__)
 
     objects = SiteProfileManager()
 
@@ -324,13 +339,11 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
             bool: True if the profile is active and valid, False otherwise.
         """
         if (self.is_active):
-            step, error_messages = self.validate_profile_and_activate(commit=False)
-            error = False
-            if (len(error_messages) > 0):
-                error = True
-            if (not (step == len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS))):
-                error = True
+            step = len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS)
+            # Same as validate_profile_and_activate(commit=False), but the validators run only if the validated values changed.
+            error = ((not (self._get_validation_step() == step)) or (self.not_allowed_to_use_speedy_match) or (not (self.user.has_confirmed_email)) or (step < self.activation_step))
             if (error):
+                step, error_messages = self.validate_profile_and_activate(commit=False)
                 logger.error("is_active_and_valid::user is active but not valid, step={step}, error_messages={error_messages}, self.user.pk={self_user_pk}, self.user.username={self_user_username}, self.user.slug={self_user_slug} (registered {registered_days_ago} days ago)".format(
                     step=step,
                     error_messages=error_messages,
@@ -510,20 +523,12 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
         Returns:
             tuple: The step and error messages.
         """
-        from speedy.match.accounts import utils
         language_code = get_language()
-        error_messages = []
-        for step in utils.get_steps_range():
-            fields = utils.get_step_fields_to_validate(step=step)
-            for field_name in fields:
-                try:
-                    utils.validate_field(field_name=field_name, user=self.user)
-                except ValidationError as e:
-                    error_messages.append(str(e))
-            if (len(error_messages) > 0):
-                if (commit):
-                    self._deactivate_language(step=step)
-                return step, error_messages
+        step, error_messages = self._validate_profile()
+        if (len(error_messages) > 0):
+            if (commit):
+                self._deactivate_language(step=step)
+            return step, error_messages
         # Check if the user is not allowed to use Speedy Match.
         if (self.not_allowed_to_use_speedy_match):
             step = len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS) - 1
@@ -545,6 +550,60 @@ class SiteProfile(OptimisticLockingModelMixin, SiteProfileBase):
             error_messages.append(_("Please confirm your email address."))
         return step, error_messages
 
+    def _validate_profile(self):
+        """
+        Runs the validators of all the steps in the current language, and saves the result in validation_status.
+
+        Returns:
+            tuple: The first step with errors (or the number of steps if there are no errors) and error messages.
+        """
+        from speedy.match.accounts import utils
+        fingerprint = utils.get_validated_values_fingerprint(user=self.user)
+        step, error_messages = len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS), []
+        for _step in utils.get_steps_range():
+            fields = utils.get_step_fields_to_validate(step=_step)
+            for field_name in fields:
+                try:
+                    utils.validate_field(field_name=field_name, user=self.user)
+                except ValidationError as e:
+                    error_messages.append(str(e))
+            if (len(error_messages) > 0):
+                step = _step
+                break
+        self._save_validation_status(step=step, fingerprint=fingerprint)
+        return step, error_messages
+
+    def _get_validation_step(self):
+        """
+        Returns the first step with errors in the current language (or the number of steps if there are no errors). The validators run only if the validated values changed since the last validation.
+
+        Returns:
+            int: The step.
+        """
+        from speedy.match.accounts import utils
+        validation_status = self.validation_status.get(get_language())
+        if ((validation_status is not None) and (validation_status["fingerprint"] == utils.get_validated_values_fingerprint(user=self.user))):
+            return validation_status["step"]
+        step, error_messages = self._validate_profile()
+        return step
+
+    def _save_validation_status(self, step, fingerprint):
+        """
+        Saves the result of the validation in the current language. Only the validation_status column is updated.
+
+        Args:
+            step (int): The first step with errors.
+            fingerprint (str): The fingerprint of the validated values.
+        """
+        language_code = get_language()
+        if (self.validation_status.get(language_code) == {"step": step, "fingerprint": fingerprint}):
+            return
+        validation_status = dict(self.validation_status)
+        validation_status[language_code] = {"step": step, "fingerprint": fingerprint}
+        self.validation_status = validation_status
+        if (not (self._state.adding)):
+            self.__class__.objects.filter(pk=self.pk).update(validation_status=validation_status)
+
     def call_after_verify_email_address(self):
         """
         Placeholder function to be called after verifying the email address.
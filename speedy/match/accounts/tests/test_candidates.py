@@ -0,0 +1,91 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from django.test import override_settings
+
+        from speedy.core.base.test.models import SiteTestCase
+        from speedy.core.base.test.decorators import only_on_speedy_match
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+        from speedy.match.accounts.candidates import MatchCandidateIndex, LazyMatchesList
+        from speedy.core.accounts.models import User
+
+
+        @only_on_speedy_match
+        class MatchCandidateIndexOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory(gender=User.GENDER_FEMALE)
+                self.user_2 = ActiveUserFactory(gender=User.GENDER_MALE)
+                self.user_3 = ActiveUserFactory(gender=User.GENDER_FEMALE)
+                self.user_4 = ActiveUserFactory(gender=User.GENDER_MALE)
+                self.user_5 = ActiveUserFactory(gender=User.GENDER_OTHER)
+
+            def test_get_matching_candidates_returns_same_users_as_matching_users_queryset(self):
+                self.user_4.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE, User.GENDER_MALE]
+                self.user_4.save_user_and_profile()
+                index = MatchCandidateIndex()
+                for user in [self.user_1, self.user_2, self.user_3, self.user_4, self.user_5]:
+                    candidates = index.get_matching_candidates(user=user)
+                    qs = SpeedyMatchSiteProfile.objects._get_matching_users_queryset(user=user)
+                    self.assertSetEqual(set1={c.pk for c in candidates}, set2={u.pk for u in qs})
+                candidates = index.get_matching_candidates(user=self.user_5)
+                self.assertSetEqual(set1={c.pk for c in candidates}, set2={self.user_1.pk, self.user_2.pk, self.user_3.pk})
+                candidates = index.get_matching_candidates(user=self.user_5, from_list=[self.user_1.pk, self.user_4.pk])
+                self.assertListEqual(list1=[c.pk for c in candidates], list2=[self.user_1.pk])
+
+            def test_incremental_refresh_updates_candidates(self):
+                with override_settings(MATCH_CANDIDATE_INDEX_REFRESH_INTERVAL=0, MATCH_CANDIDATE_INDEX_FULL_REFRESH_INTERVAL=60 * 60):
+                    index = MatchCandidateIndex()
+                    candidates = index.get_matching_candidates(user=self.user_5)
+                    self.assertIs(expr1=self.user_4.pk in {c.pk for c in candidates}, expr2=True)
+                    self.user_4.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE, User.GENDER_MALE]
+                    self.user_4.save_user_and_profile()
+                    candidates = index.get_matching_candidates(user=self.user_5)
+                    self.assertIs(expr1=self.user_4.pk in {c.pk for c in candidates}, expr2=False)
+                    self.user_4.speedy_match_profile.gender_to_match = User.GENDER_VALID_VALUES
+                    self.user_4.save_user_and_profile()
+                    candidates = index.get_matching_candidates(user=self.user_5)
+                    self.assertIs(expr1=self.user_4.pk in {c.pk for c in candidates}, expr2=True)
+
+            def test_cached_matches_are_fetched_only_when_accessed(self):
+                matches_list = SpeedyMatchSiteProfile.objects.get_matches(user=self.user_5)
+                self.assertEqual(first=len(matches_list), second=4)
+                matches_users_ids = [u.id for u in matches_list]
+                matches_list = SpeedyMatchSiteProfile.objects.get_matches(user=self.user_5)
+                self.assertIsInstance(obj=matches_list, cls=LazyMatchesList)
+                self.assertEqual(first=len(matches_list), second=4)
+                self.assertListEqual(list1=matches_list.users_ids, list2=matches_users_ids)
+                self.assertIs(expr1=self.user_4 in matches_list, expr2=True)
+                page = matches_list[1:3]
+                self.assertListEqual(list1=[u.id for u in page], list2=matches_users_ids[1:3])
+                self.assertListEqual(list1=[u.speedy_match_profile.rank for u in page], list2=[SpeedyMatchSiteProfile.RANK_5, SpeedyMatchSiteProfile.RANK_5])
+                self.assertEqual(first=matches_list[0].id, second=matches_users_ids[0])
+
+            def test_deactivated_users_are_dropped_before_len_and_slices(self):
+                matches_list = SpeedyMatchSiteProfile.objects.get_matches(user=self.user_5)
+                matches_users_ids = [u.id for u in matches_list]
+                self.assertEqual(first=len(matches_users_ids), second=4)
+                matches_list = LazyMatchesList(users_ids=matches_users_ids, ranks=[SpeedyMatchSiteProfile.RANK_5] * len(matches_users_ids))
+                deactivated_user = User.objects.get(pk=matches_users_ids[1])
+                deactivated_user.is_active = False
+                deactivated_user.save_user_and_profile()
+                self.assertEqual(first=len(matches_list), second=3)
+                self.assertListEqual(list1=[u.id for u in matches_list[0:3]], list2=[pk for pk in matches_users_ids if (not (pk == deactivated_user.pk))])
+                self.assertIs(expr1=deactivated_user in matches_list, expr2=False)
+
+            def test_incremental_refresh_updates_last_visit_written_behind(self):
+                from speedy.core.accounts.write_behind import visits_buffer
+                with override_settings(MATCH_CANDIDATE_INDEX_REFRESH_INTERVAL=0, MATCH_CANDIDATE_INDEX_FULL_REFRESH_INTERVAL=60 * 60, VISITS_WRITE_BEHIND_MAX_STALENESS=60 * 60):
+                    index = MatchCandidateIndex()
+                    index.refresh()
+                    old_last_visit = index._candidates[self.user_4.pk].last_visit
+                    self.user_4.speedy_match_profile.record_last_visit()
+                    visits_buffer.flush()
+                    index.refresh()
+                    self.assertGreater(a=index._candidates[self.user_4.pk].last_visit, b=old_last_visit)
+
+
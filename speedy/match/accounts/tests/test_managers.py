@@ -2,19 +2,25 @@ from django.conf import settings as django_settings
 
 if (django_settings.TESTS):
     if (django_settings.LOGIN_ENABLED):
+        import hashlib
         import random
         # from time import sleep
-        # from datetime import date
+        from datetime import date, datetime, timedelta
 
         # from dateutil.relativedelta import relativedelta
 
+        from django.test import override_settings
         from django.utils import formats
+        from django.utils.timezone import now
 
         from speedy.core.base.test.models import SiteTestCase
         from speedy.core.base.test.decorators import only_on_speedy_match
 
         from speedy.core.accounts.test.user_factories import ActiveUserFactory
 
+        from speedy.core.accounts.cache_helper import cache_key
+        from speedy.core.base import cache_manager
+        from speedy.core.base.utils import string_is_not_empty, to_attribute
         from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
         from speedy.core.accounts.models import User
         from speedy.core.blocks.models import Block
@@ -478,6 +484,32 @@ if (django_settings.TESTS):
                 self.assertEqual(first=len(matches_list), second=4)
                 self.assertIs(expr1=self.user_5 in matches_list, expr2=True)
 
+            def test_stale_matches_are_revalidated(self):
+                matches_key = cache_key(cache_type='matches', entity_pk=self.user_5.pk)
+                matches_list = SpeedyMatchSiteProfile.objects.get_matches(user=self.user_5)
+                matches_users_ids = [u.id for u in matches_list]
+                self.assertEqual(first=len(matches_users_ids), second=4)
+                # Stale matches with a different number of matches, the number of matches in the profile changes when they are refreshed.
+                cache_manager.cache_set(key=matches_key, value=matches_users_ids[:1], timeout=0, stale_timeout=60)
+                matches_list = SpeedyMatchSiteProfile.objects.get_matches(user=self.user_5)
+                self.assertListEqual(list1=[u.id for u in matches_list], list2=matches_users_ids[:1])
+                self.assertListEqual(list1=cache_manager.cache_get(key=matches_key), list2=matches_users_ids)
+                self.assertEqual(first=User.objects.get(pk=self.user_5.pk).speedy_match_profile.number_of_matches, second=4)
+
+            def test_get_ranks_returns_same_ranks_as_get_matching_rank(self):
+                """
+                Test that SpeedyMatchSiteProfile.objects._get_ranks() returns the same ranks as the per-candidate algorithm, SpeedyMatchSiteProfile._get_matching_rank(), for each user.
+                """
+                self.user_4.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE, User.GENDER_MALE]
+                self.user_4.save_user_and_profile()
+                Block.objects.block(blocker=self.user_5, blocked=self.user_2)
+                other_users = [self.user_1, self.user_2, self.user_3, self.user_4, self.user_5]
+                blocked_users_ids = self.user_5.blocked_entities_ids
+                blocking_users_ids = self.user_5.blocking_entities_ids
+                ranks = SpeedyMatchSiteProfile.objects._get_ranks(user=self.user_5, other_users=other_users, blocked_users_ids=blocked_users_ids, blocking_users_ids=blocking_users_ids)
+                self.assertListEqual(list1=ranks, list2=[self.user_5.speedy_match_profile._get_matching_rank(other_profile=other_user.speedy_match_profile) for other_user in other_users])
+                self.assertListEqual(list1=ranks, list2=[SpeedyMatchSiteProfile.RANK_5, SpeedyMatchSiteProfile.RANK_0, SpeedyMatchSiteProfile.RANK_5, SpeedyMatchSiteProfile.RANK_0, SpeedyMatchSiteProfile.RANK_0])
+
             def test_cannot_delete_site_profiles_with_queryset_delete(self):
                 with self.assertRaises(NotImplementedError) as cm:
                     SpeedyMatchSiteProfile.objects.delete()
@@ -493,3 +525,133 @@ if (django_settings.TESTS):
                 self.assertEqual(first=str(cm.exception), second="delete is not implemented.")
 
 
+        @only_on_speedy_match
+        @override_settings(USE_MATCH_CANDIDATE_INDEX=False, USE_DISTANCE_BETWEEN_USERS_FROM_IPAPI_RESULTS=False)
+        class ManagerGetMatchesOrderOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user = ActiveUserFactory(gender=User.GENDER_FEMALE)
+                smoking_statuses = User.SMOKING_STATUS_VALID_VALUES
+                self.user.speedy_match_profile.smoking_status_match = {str(smoking_status): (SpeedyMatchSiteProfile.RANK_5 if (smoking_status == smoking_statuses[0]) else SpeedyMatchSiteProfile.RANK_2) for smoking_status in smoking_statuses}
+                self.user.save_user_and_profile()
+                timezone_now = now()
+                self.other_users = [ActiveUserFactory() for i in range(16)]
+                for i, other_user in enumerate(self.other_users):
+                    # Users 0-5 visited at the same time and have the same rank, with nothing which adds an offset - they are equal, and must remain in the order of the database.
+                    if (i < 6):
+                        last_visit = timezone_now - timedelta(minutes=10)
+                        date_created = timezone_now
+                        smoking_status = smoking_statuses[0]
+                    else:
+                        last_visit = timezone_now - timedelta(days=[1, 7, 12, 25, 40, 90, 150, 200, 200, 400][i - 6])
+                        date_created = timezone_now - timedelta(days=500)
+                        smoking_status = smoking_statuses[i % len(smoking_statuses)]
+                    User.objects.filter(pk=other_user.pk).update(date_created=date_created, smoking_status=smoking_status)
+                    profile_values = {
+                        'last_visit': last_visit,
+                        'likes_to_user_count': [0, 3, 10][i % 3],
+                    }
+                    if (i in [8, 11]):
+                        profile_values[to_attribute(name='profile_description')] = ""
+                    if (i in [9, 11]):
+                        profile_values[to_attribute(name='match_description')] = "One one one one one one one one."
+                    if (i == 13):
+                        profile_values['profile_picture_months_offset'] = 5
+                    SpeedyMatchSiteProfile.objects.filter(user=other_user).update(**profile_values)
+
+            def get_matches_one_by_one(self, user):
+                """
+                The matches of the user, calculated by the algorithm which checked each candidate separately (before the candidates were checked in one batch).
+                """
+                timezone_now = now()
+                datetime_now = datetime.now()
+                today = date.today()
+
+                def get_random_number(other_user, salt, modulo):
+                    return int(hashlib.sha384("$$$-{}-{}-{}-{}-{}-$$$".format(user.id, other_user.id, today.isoformat(), (datetime_now.hour // 4), salt).encode('utf-8')).hexdigest()[-32:], 16) % modulo
+
+                def description_is_valid(description, min_number_of_words):
+                    return ((string_is_not_empty(description)) and (len(description) >= 20) and (len(description.split()) >= min_number_of_words))
+
+                def description_is_not_repetitive(description):
+                    return ((string_is_not_empty(description)) and (len(description.split()) > 0) and (len(description.split()) / len(set(description.split())) < 2.5))
+
+                _user_list = list(SpeedyMatchSiteProfile.objects._get_matching_users_queryset(user=user)[:2400])
+                for m in range(4, 28, 4):
+                    user_list = [u for u in _user_list if ((timezone_now - u.speedy_match_profile.last_visit).days <= m * 30)]
+                    if ((m == 24) or (len(user_list) >= 1080)):
+                        break
+                matches_list = []
+                for other_user in user_list:
+                    other_profile = other_user.speedy_match_profile
+                    rank = user.speedy_match_profile.get_matching_rank(other_profile=other_profile)
+                    if (not ((user.speedy_match_profile.is_active) and (other_profile.is_active) and (rank > SpeedyMatchSiteProfile.RANK_0))):
+                        continue
+                    last_visit_days = (timezone_now - other_profile.last_visit).days
+                    offset = 0
+                    if (last_visit_days >= 180):
+                        offset += 6 * 30
+                    if (not (((timezone_now - other_user.date_created).days < 15) or (last_visit_days < 5))):
+                        if (not ((rank >= SpeedyMatchSiteProfile.RANK_5) and (last_visit_days < 10))):
+                            if (other_profile.likes_to_user_count >= 10):
+                                offset += 0
+                            elif (other_profile.likes_to_user_count >= 3):
+                                offset += 30
+                            else:
+                                offset += 80
+                        if (rank < SpeedyMatchSiteProfile.RANK_5):
+                            if (other_user.speedy_net_profile.all_friends_count < 20):
+                                offset += 30
+                            if (not (((120 if (other_user.get_age() >= 18) else 50) <= other_profile.height <= 235))):
+                                offset += 30
+                    if ((last_visit_days >= 10) and (not ((rank >= SpeedyMatchSiteProfile.RANK_5) and (last_visit_days < 20)))):
+                        s = get_random_number(other_user=other_user, salt="97-97a", modulo=12)
+                        if (5 <= s < 9):
+                            offset += 30
+                        elif (9 <= s < 12):
+                            offset += 60
+                    if (rank >= SpeedyMatchSiteProfile.RANK_5):
+                        offset -= 30
+                    offset = max([offset, 0])
+                    if (not (description_is_valid(description=other_profile.profile_description, min_number_of_words=10))):
+                        offset += 3 * 30
+                    if (not (description_is_valid(description=other_profile.match_description, min_number_of_words=8))):
+                        offset += 1 * 30
+                    if (not (description_is_not_repetitive(description=other_profile.profile_description))):
+                        offset += 20 * 30
+                    if (not (description_is_not_repetitive(description=other_profile.match_description))):
+                        offset += 20 * 30
+                    offset += other_profile.profile_picture_months_offset * 30
+                    s = get_random_number(other_user=other_user, salt="98-98a", modulo=77)
+                    if (74 <= s < 77):
+                        offset -= 6 * 30
+                    elif (71 <= s < 74):
+                        offset -= 2 * 30
+                    elif (last_visit_days >= 5):
+                        if (48 <= s < 71):
+                            offset += 1 * 30
+                        elif (25 <= s < 48):
+                            offset += 2 * 30
+                    other_profile._user_last_visit_days_offset = offset
+                    matches_list.append(other_user)
+                matches_list = sorted(matches_list, key=lambda u: (-(max([((timezone_now - u.speedy_match_profile.last_visit).days + u.speedy_match_profile._user_last_visit_days_offset), 0]) // 40), u.speedy_match_profile.rank, u.speedy_match_profile.last_visit), reverse=True)
+                return matches_list[:720]
+
+            def test_get_matches_returns_same_matches_as_checking_each_candidate(self):
+                """
+                Test that SpeedyMatchSiteProfile.objects._get_matches() returns the same matches, in the same order, as the algorithm which checked each candidate separately - including users with equal sort keys, which the stable sort keeps in the order of the database (by last visit).
+                """
+                user = User.objects.get(pk=self.user.pk)
+                expected_matches_list = self.get_matches_one_by_one(user=user)
+                user = User.objects.get(pk=self.user.pk)
+                matches_list = SpeedyMatchSiteProfile.objects._get_matches(user=user)
+                self.assertEqual(first=len(expected_matches_list), second=16)
+                self.assertListEqual(list1=[u.pk for u in matches_list], list2=[u.pk for u in expected_matches_list])
+                self.assertListEqual(list1=[u.speedy_match_profile.rank for u in matches_list], list2=[u.speedy_match_profile.rank for u in expected_matches_list])
+                self.assertListEqual(list1=[u.speedy_match_profile._user_last_visit_days_offset for u in matches_list], list2=[u.speedy_match_profile._user_last_visit_days_offset for u in expected_matches_list])
+                # Users 0-5 are equal, and are the first matches.
+                self.assertSetEqual(set1={u.pk for u in matches_list[:6]}, set2={u.pk for u in self.other_users[:6]})
+                self.assertEqual(first=len({u.speedy_match_profile.last_visit for u in matches_list[:6]}), second=1)
+                self.assertEqual(first=len({u.speedy_match_profile.rank for u in matches_list[:6]}), second=1)
+
+
@@ -0,0 +1,60 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from speedy.core.base.test.models import SiteTestCase
+        from speedy.core.base.test.decorators import only_on_speedy_match
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.core.accounts.cache_helper import cache_key
+        from speedy.core.accounts.models import User
+        from speedy.core.base import cache_manager
+        from speedy.match.accounts.management.commands.precompute_matches import precompute_matches, RESULT_CALCULATED, RESULT_SKIPPED, RESULT_FAILED
+
+
+        @only_on_speedy_match
+        class PrecomputeMatchesOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user_1 = ActiveUserFactory(gender=User.GENDER_FEMALE)
+                self.user_2 = ActiveUserFactory(gender=User.GENDER_MALE)
+                self.user_3 = ActiveUserFactory(gender=User.GENDER_OTHER)
+                cache_manager.cache_delete_many(keys=[cache_key(cache_type='matches', entity_pk=user.pk) for user in [self.user_1, self.user_2, self.user_3]])
+
+            def test_dry_run_calculates_matches_without_saving_them(self):
+                out = StringIO()
+                call_command('precompute_matches', '--languages', 'en', '--processes', '0', '--max-users-per-second', '0', '--dry-run', stdout=out)
+                report = out.getvalue()
+                self.assertIn(member="dry_run=True", container=report)
+                self.assertIn(member="number_of_users=3", container=report)
+                self.assertIn(member="number_of_calculated_users=3", container=report)
+                self.assertIn(member="number_of_skipped_users=0", container=report)
+                self.assertIn(member="number_of_failed_users=0", container=report)
+                for user in [self.user_1, self.user_2, self.user_3]:
+                    self.assertIsNone(obj=cache_manager.cache_get(key=cache_key(cache_type='matches', entity_pk=user.pk)))
+
+            def test_dry_run_doesnt_invalidate_cached_matches(self):
+                matches_key = cache_key(cache_type='matches', entity_pk=self.user_1.pk)
+                cache_manager.cache_set(key=matches_key, value=[self.user_2.pk], timeout=60)
+                results = precompute_matches(language_code='en', users_pks=[self.user_1.pk], dry_run=True, force=True)
+                self.assertListEqual(list1=[(user_pk, result) for (user_pk, result, seconds) in results], list2=[(self.user_1.pk, RESULT_CALCULATED)])
+                self.assertListEqual(list1=cache_manager.cache_get(key=matches_key), list2=[self.user_2.pk])
+
+            def test_stale_matches_are_not_skipped(self):
+                cache_manager.cache_set(key=cache_key(cache_type='matches', entity_pk=self.user_1.pk), value=[self.user_2.pk], timeout=60)
+                cache_manager.cache_set(key=cache_key(cache_type='matches', entity_pk=self.user_2.pk), value=[self.user_1.pk], timeout=0, stale_timeout=60)
+                results = precompute_matches(language_code='en', users_pks=[self.user_1.pk, self.user_2.pk], dry_run=True, force=False)
+                self.assertListEqual(list1=[(user_pk, result) for (user_pk, result, seconds) in results], list2=[(self.user_1.pk, RESULT_SKIPPED), (self.user_2.pk, RESULT_CALCULATED)])
+
+            def test_failed_users_are_not_counted_as_skipped(self):
+                deleted_user_pk = self.user_3.pk
+                self.user_3.delete()
+                results = precompute_matches(language_code='en', users_pks=[self.user_1.pk, deleted_user_pk], dry_run=True, force=True)
+                self.assertListEqual(list1=[(user_pk, result) for (user_pk, result, seconds) in results], list2=[(self.user_1.pk, RESULT_CALCULATED), (deleted_user_pk, RESULT_FAILED)])
+
+
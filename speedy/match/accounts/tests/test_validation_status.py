@@ -0,0 +1,49 @@
+from django.conf import settings as django_settings
+
+if (django_settings.TESTS):
+    if (django_settings.LOGIN_ENABLED):
+        from unittest import mock
+
+        from speedy.core.base.test.models import SiteTestCase
+        from speedy.core.base.test.decorators import only_on_speedy_match
+
+        from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+        from speedy.match.accounts import utils
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+        from speedy.core.accounts.models import User
+
+
+        @only_on_speedy_match
+        class SpeedyMatchSiteProfileValidationStatusOnlyEnglishTestCase(SiteTestCase):
+            def set_up(self):
+                super().set_up()
+                self.user = ActiveUserFactory()
+                self.number_of_steps = len(SpeedyMatchSiteProfile.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS)
+
+            def get_user(self):
+                return User.objects.get(pk=self.user.pk)
+
+            def test_validation_status_is_saved(self):
+                user = self.get_user()
+                self.assertIs(expr1=user.speedy_match_profile.is_active_and_valid, expr2=True)
+                validation_status = self.get_user().speedy_match_profile.validation_status
+                self.assertEqual(first=validation_status["en"]["step"], second=self.number_of_steps)
+                self.assertEqual(first=validation_status["en"]["fingerprint"], second=utils.get_validated_values_fingerprint(user=user))
+
+            def test_validators_dont_run_if_validated_values_didnt_change(self):
+                self.assertIs(expr1=self.get_user().speedy_match_profile.is_active_and_valid, expr2=True)
+                with mock.patch.object(target=utils, attribute='validate_field', wraps=utils.validate_field) as mocked_validate_field:
+                    self.assertIs(expr1=self.get_user().speedy_match_profile.is_active_and_valid, expr2=True)
+                    self.assertEqual(first=mocked_validate_field.call_count, second=0)
+
+            def test_validators_run_if_validated_value_changed(self):
+                self.assertIs(expr1=self.get_user().speedy_match_profile.is_active_and_valid, expr2=True)
+                user = self.get_user()
+                user.speedy_match_profile.height = 1
+                with mock.patch.object(target=utils, attribute='validate_field', wraps=utils.validate_field) as mocked_validate_field:
+                    self.assertIs(expr1=user.speedy_match_profile.is_active_and_valid, expr2=False)
+                    self.assertGreater(a=mocked_validate_field.call_count, b=0)
+                self.assertEqual(first=self.get_user().speedy_match_profile.validation_status["en"]["step"], second=3)
+
+
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from datetime import timedelta
 
 from django.utils import formats
@@ -71,6 +73,22 @@ def validate_field(field_name, user):
         raise Exception("Unexpected: field_name={}".format(field_name))
 
 
+def get_validated_values_fingerprint(user):
+    """
+    Return a fingerprint of all the values validated by validate_field in the current language, and the validation version. If the fingerprint didn't change, the result of the validation didn't change either.
+    """
+    values = {'version': SpeedyMatchSiteProfile.VALIDATION_VERSION}
+    for step in get_steps_range():
+        for field_name in get_step_form_fields(step=step):
+            if (field_name in ['profile_picture']):
+                values[field_name] = user.photo_id
+            elif (hasattr(SpeedyMatchSiteProfile, field_name)):
+                values[field_name] = getattr(user.speedy_match_profile, field_name)
+            else:
+                values[field_name] = getattr(user, field_name)
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
 def get_total_number_of_active_members_text():
     total_number_of_active_members_in_the_last_four_months = User.objects.active(
         speedy_match_site_profile__height__range=(SpeedyMatchSiteProfile.settings.MIN_HEIGHT_TO_MATCH, SpeedyMatchSiteProfile.settings.MAX_HEIGHT_TO_MATCH),
@@ -1,11 +1,14 @@
 from datetime import timedelta, datetime, timezone, date
+from functools import partial
 
+from django.conf import settings as django_settings
 from django.utils import formats
 from django.utils.timezone import now
 from django.utils.translation import get_language, gettext_lazy as _
 from django.views import generic
 from django.db.models import Count, F
 
+from speedy.core.base import cache_manager
 from speedy.core.base.utils import get_age_ranges_match, to_attribute
 from speedy.core.admin.mixins import OnlyAdminMixin
 from speedy.core.accounts.utils import get_site_profile_model
@@ -39,7 +42,7 @@ class AdminMatchesListView(OnlyAdminMixin, generic.ListView):
             raise NotImplementedError("Invalid only_current_language and any_language.")
         return filter_dict
 
-    def get_total_number_of_active_members_text(self):
+    def _get_total_number_of_active_members_text(self, age_interval):
         default_filter_dict = self.get_default_filter_dict()
         total_number_of_active_members = User.objects.active(
             **default_filter_dict,
@@ -305,9 +308,6 @@ class AdminMatchesListView(OnlyAdminMixin, generic.ListView):
                 total_number_of_active_members_registered_in_year=formats.number_format(value=total_number_of_active_members_registered_in_year),
                 year=year,
             )
-        age_interval = 20
-        if (self.request.GET.get('age_interval')):
-            age_interval = int(self.request.GET.get('age_interval'))
         total_number_of_active_members_text += "\n"
         for age in range(SpeedyMatchSiteProfile.settings.MIN_AGE_TO_MATCH_ALLOWED, SpeedyMatchSiteProfile.settings.MAX_AGE_TO_MATCH_ALLOWED + 20, age_interval):
             age_ranges = get_age_ranges_match(min_age=age, max_age=age + (age_interval - 1))
@@ -498,6 +498,22 @@ class AdminMatchesListView(OnlyAdminMixin, generic.ListView):
                 total_number_of_active_members_text += '</span>'
         return total_number_of_active_members_text
 
+    def get_total_number_of_active_members_text(self):
+        age_interval = 20
+        if (self.request.GET.get('age_interval')):
+            age_interval = int(self.request.GET.get('age_interval'))
+        # These statistics take many queries. If they are stale, they are displayed and refreshed in the background.
+        key = 'speedy-match-admin-total-number-of-active-members-text-{view}-{age_interval}'.format(
+            view=self.__class__.__name__,
+            age_interval=age_interval,
+        )
+        return cache_manager.cache_get_or_revalidate(
+            key=key,
+            calculate=partial(self._get_total_number_of_active_members_text, age_interval=age_interval),
+            timeout=django_settings.CACHE_SET_ADMIN_STATISTICS_TIMEOUT,
+            stale_timeout=django_settings.CACHE_SET_ADMIN_STATISTICS_STALE_TIMEOUT,
+        )
+
     def get_queryset(self):
         SiteProfile = get_site_profile_model()
         filter_dict = self.get_default_filter_dict()
@@ -52,7 +52,7 @@ class UserLike(TimeStampedModel):
 @receiver(signal=models.signals.post_save, sender=UserLike)
 def mail_user_on_new_like(sender, instance: UserLike, created, **kwargs):
     """
-    Sends an email notification to the user when they receive a new like.
+    Queues an email notification to the user when they receive a new like. New likes are combined into one email.
 
     Args:
         sender (type): The model class that sent the signal.
@@ -63,9 +63,9 @@ def mail_user_on_new_like(sender, instance: UserLike, created, **kwargs):
     if (created):
         user = instance.to_user
         if ((user.is_active) and (user.speedy_match_profile.notify_on_like == User.NOTIFICATIONS_ON)):
-            user.mail_user(template_name_prefix='email/likes/like', context={
+            user.queue_mail(template_name_prefix='email/likes/like', context={
                 'like': instance,
-            })
+            }, coalesce_key='likes')
 
 
 @receiver(signal=models.signals.post_save, sender=UserLike)
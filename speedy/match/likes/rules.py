@@ -3,17 +3,17 @@ from rules import predicate, add_perm, is_authenticated
 from speedy.core.accounts.base_rules import is_self
 from speedy.core.blocks.rules import there_is_block
 from speedy.core.accounts.models import User
-from .models import UserLike
+from speedy.core.profiles.relationships import get_relationship
 
 
 @predicate
 def you_like_user(user, other_user):
-    return UserLike.objects.filter(from_user=user, to_user=other_user).exists()
+    return get_relationship(user=user, other_user=other_user).you_like_user
 
 
 @predicate
 def user_likes_you(user, other_user):
-    return UserLike.objects.filter(from_user=other_user, to_user=user).exists()
+    return get_relationship(user=user, other_user=other_user).user_likes_you
 
 
 @predicate
@@ -6,6 +6,7 @@ if (django_settings.TESTS):
 
         from django.test import override_settings
         from django.core import mail
+        from django.core.management import call_command
 
         from speedy.core.base.test.mixins import TestCaseMixin
         from speedy.core.base.test.models import SiteTestCase
@@ -270,6 +271,8 @@ if (django_settings.TESTS):
                 self.assertEqual(first=self.user_1.speedy_match_profile.notify_on_like, second=User.NOTIFICATIONS_ON)
                 self.assertEqual(first=self.user_2.speedy_match_profile.notify_on_like, second=User.NOTIFICATIONS_ON)
                 UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+                self.assertEqual(first=len(mail.outbox), second=0)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=1)
                 self.assertEqual(first=mail.outbox[0].subject, second=self._someone_likes_you_on_speedy_match_subject_dict_by_gender[self.user_2.get_gender()])
 
@@ -303,6 +306,7 @@ if (django_settings.TESTS):
                 self.assertEqual(first=self.user_1.speedy_match_profile.notify_on_like, second=User.NOTIFICATIONS_OFF)
                 self.assertEqual(first=self.user_2.speedy_match_profile.notify_on_like, second=User.NOTIFICATIONS_ON)
                 UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=0)
 
 
@@ -312,6 +316,13 @@ if (django_settings.TESTS):
                 super().validate_all_values()
                 self.assertEqual(first=self.language_code, second='en')
 
+            def test_user_gets_one_email_with_number_of_likes(self):
+                for i in range(3):
+                    UserLike.objects.add_like(from_user=ActiveUserFactory(), to_user=self.user_1)
+                call_command('send_queued_mails')
+                self.assertEqual(first=len(mail.outbox), second=1)
+                self.assertIn(member="You have 3 new likes.", container=mail.outbox[0].body)
+
 
         @only_on_speedy_match
         @override_settings(LANGUAGE_CODE='fr')
@@ -7,6 +7,7 @@ if (django_settings.TESTS):
 
         from django.test import override_settings
         from django.core import mail
+        from django.core.management import call_command
 
         from speedy.core.base.test import tests_settings
         from speedy.core.base.test.mixins import TestCaseMixin
@@ -64,6 +65,8 @@ if (django_settings.TESTS):
                 like = UserLike.objects.first()
                 self.assertEqual(first=like.from_user.id, second=self.user_1.id)
                 self.assertEqual(first=like.to_user.id, second=self.user_2.id)
+                self.assertEqual(first=len(mail.outbox), second=0)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=1)
                 self.assertEqual(first=mail.outbox[0].subject, second=self._someone_likes_you_on_speedy_match_subject_dict_by_gender[self.user_1.get_gender()])
 
@@ -104,6 +107,7 @@ if (django_settings.TESTS):
                 like = UserLike.objects.first()
                 self.assertEqual(first=like.from_user.id, second=self.user_1.id)
                 self.assertEqual(first=like.to_user.id, second=self.user_2.id)
+                call_command('send_queued_mails')
                 self.assertEqual(first=len(mail.outbox), second=0)
 
             def test_user_cannot_like_self(self):